@@ -2,9 +2,7 @@ import os
 import sys
 import time
 import logging
-import io
 import json
-import tempfile
 import ctypes
 import subprocess
 from pathlib import Path
@@ -31,12 +29,72 @@ from decoder.utils import (
     format_time_span,
     format_bytes,
     install_verbosity_level,
+    OrderedCompletions,
     log_final,
     FINAL_SUMMARY,
 )
-from decoder.sending import send_decoded, normalize_dbc_entries
+from decoder.sending import (
+    SEND_ENGINES,
+    SEND_SINKS,
+    IngestWatermark,
+    SendResult,
+    configure_send_engine,
+    configure_send_sink,
+    decoded_has_channels,
+    normalize_dbc_entries,
+    probe_decoded_span,
+    send_decoded,
+    send_failed,
+)
+from decoder.compression import (
+    COMPRESSION_ENCODINGS,
+    configure_compression,
+    format_compression_summary,
+)
+from decoder.vm_client import format_vm_client_summary
+from decoder.rate_control import format_rate_control_summary
+from decoder.deadband import configure_deadband, format_deadband_summary
+from decoder.rollups import configure_rollups, format_rollup_summary
+from decoder.coalescer import configure_coalesce
+from decoder.backfill import configure_backfill, format_backfill_summary
+from decoder.dbc_cache import SignalRules
+from decoder.ledger import (
+    configure_ledger,
+    format_ledger_summary,
+    get_ledger,
+    local_entry,
+    s3_entry,
+)
+from decoder.spool import (
+    configure_spool,
+    format_spool_summary,
+    get_spool,
+    replay_spool_if_online,
+)
+from decoder.decode_pool import (
+    DECODE_TRANSPORTS,
+    DecodeBatch,
+    configure_decode_pool,
+    decode_pool_processes,
+    format_decode_pool_summary,
+    iter_decoded_batches,
+)
+from decoder.s3_pipeline import (
+    S3StreamingPipeline,
+    discard_mdf_source,
+    download_s3_mdf_source,
+    open_mdf_source,
+)
 from decoder.config import (
     LOG_FORMAT,
+    S3_PIPELINE_DECODE_WORKERS,
+    S3_PIPELINE_DOWNLOAD_WORKERS,
+    S3_PIPELINE_SEND_WORKERS,
+    INGEST_LEDGER_PATH,
+    S3_STREAMING_MAX_ACTIVE_FILES,
+    VM_BACKFILL_STEP_SECONDS,
+    VM_SEND_ENGINE,
+    VM_SEND_SINK,
     server_vm_b3sr,
     server_vm_test_dump,
 )
@@ -50,6 +108,8 @@ CSVContent = tuple[Path, datetime]
 
 B3SR_JOB = "B3SR"
 DBC_FOLDER_OVERRIDE: str | None = None
+# Set from --exclude; pruned from the DBC before decoding.
+SIGNAL_RULES = SignalRules()
 
 canedge_folder = Path.joinpath(
     get_windows_home_path(),
@@ -90,6 +150,11 @@ def get_dbc_file_path(dbc_folder: str | None = None) -> Path:
     return resolve_dbc_folder(dbc_folder).joinpath("b3sr_base.dbc")
 
 
+def skip_signal(name: str) -> bool:
+    # Excluded multiplexors are still decoded, they are dropped here.
+    return SIGNAL_RULES.skips(name)
+
+
 def send_files_to_victoriametrics(
     server: str,
     files: list[CSVContent],
@@ -130,9 +195,51 @@ def send_files_to_victoriametrics(
         stack_size = 1
         logging.warning(" ⚠️ stack_size cannot be less than 1, setting to 1.")
 
-    can_dbc_files = normalize_dbc_entries([dbc_file])
+    can_dbc_files = normalize_dbc_entries([dbc_file], SIGNAL_RULES)
+
+    ledger = get_ledger()
+    if ledger is not None:
+        ledger.use_dbc_set(B3SR_JOB, can_dbc_files)
+        files = [
+            item
+            for item in files
+            if not ledger.is_ingested(local_entry(item[0]), B3SR_JOB)
+        ]
 
     total_files = len(files)
+    if decode_pool_processes() > 0:
+        # Decode in worker processes and send here, one batch behind them.
+        batches: list[DecodeBatch] = []
+        for batch_idx in range(0, total_files, stack_size):
+            batch_files = [
+                f for f, d in files[batch_idx : batch_idx + stack_size]
+            ]
+            stack_msg = f"[{batch_idx}..{batch_idx + len(batch_files)} of {total_files}]"
+            batches.append(
+                ((stack_msg, batch_files), batch_files, can_dbc_files)
+            )
+
+        for (stack_msg, batch_files), decoded in iter_decoded_batches(batches):
+            if decoded is None:
+                logging.warning(
+                    f" ⚠️ {stack_msg} No signals decoded with DBC {shortpath(dbc_file)}"
+                )
+                continue
+            span = probe_decoded_span(decoded) if ledger is not None else None
+            result = send_decoded(
+                decoded=decoded,
+                server=server,
+                job=B3SR_JOB,
+                skip_signal_fn=skip_signal,
+                skip_signal_range_check=skip_signal_range_check,
+                batch_size=max_batch_size,
+            )
+            if ledger is not None:
+                ledger.record_files(batch_files, B3SR_JOB, result, span)
+            for s, v in result.items():
+                sent_stats[s] = sent_stats.get(s, 0) + v
+        return sent_stats
+
     if stack_size == 1:
         for i, (f, d) in enumerate(files):
             count_str = f"[{i+1} of {total_files}]"
@@ -154,7 +261,7 @@ def send_files_to_victoriametrics(
                         f" ✅ {count_str} Decoded file {shortpath(f)} in {get_time_str(start)}"
                     )
 
-                    if not list(decoded.iter_channels()):
+                    if not decoded_has_channels(decoded):
                         logging.warning(
                             f" ⚠️ {count_str} No signals found in file {shortpath(f)} after decoding with DBC {shortpath(dbc_file)}"
                         )
@@ -164,10 +271,14 @@ def send_files_to_victoriametrics(
                             decoded=decoded,
                             server=server,
                             job=B3SR_JOB,
-                            skip_signal_fn=None,
+                            skip_signal_fn=skip_signal,
                             skip_signal_range_check=skip_signal_range_check,
                             batch_size=max_batch_size,
                         )
+                        if ledger is not None:
+                            ledger.record_files(
+                                [f], B3SR_JOB, result, probe_decoded_span(decoded)
+                            )
 
                         for s, v in result.items():
                             sent_stats[s] = sent_stats.get(s, 0) + v
@@ -209,7 +320,7 @@ def send_files_to_victoriametrics(
                         f" ✅ {stack_msg} Decoded stacked MDF in {get_time_str(start)}"
                     )
 
-                    if not list(decoded.iter_channels()):
+                    if not decoded_has_channels(decoded):
                         logging.warning(
                             f" ⚠️ {stack_msg} No signals found in stacked MDF after decoding with DBC {shortpath(dbc_file)}"
                         )
@@ -219,10 +330,14 @@ def send_files_to_victoriametrics(
                             decoded=decoded,
                             server=server,
                             job=B3SR_JOB,
-                            skip_signal_fn=None,
+                            skip_signal_fn=skip_signal,
                             skip_signal_range_check=skip_signal_range_check,
                             batch_size=max_batch_size,
                         )
+                        if ledger is not None:
+                            ledger.record_files(
+                                files, B3SR_JOB, result, probe_decoded_span(decoded)
+                            )
 
                         for s, v in result.items():
                             sent_stats[s] = sent_stats.get(s, 0) + v
@@ -254,9 +369,12 @@ def main_post_s3_streaming_to_victoriametrics(
     streaming_strategy: Literal["auto", "memory", "tempfile"] = "auto",
     memory_fraction: float = 0.35,
     decode_overhead_factor: float = 2.5,
-    max_active_files: int = 1,
+    max_active_files: int = S3_STREAMING_MAX_ACTIVE_FILES,
     max_batch_size: int = 10_000,
     skip_signal_range_check: bool = False,
+    download_workers: int = S3_PIPELINE_DOWNLOAD_WORKERS,
+    decode_workers: int = S3_PIPELINE_DECODE_WORKERS,
+    send_workers: int = S3_PIPELINE_SEND_WORKERS,
     posted_after: datetime | None = None,
     cursor_timestamp: str = "",
     cursor_key: str = "",
@@ -317,11 +435,23 @@ def main_post_s3_streaming_to_victoriametrics(
         reverse=newest_first,
     )
 
-    dbc_files = normalize_dbc_entries([get_dbc_file_path()])
+    dbc_files = normalize_dbc_entries([get_dbc_file_path()], SIGNAL_RULES)
     if not dbc_files:
         logging.error("❌ B3SR DBC files could not be normalized.")
         return {}
 
+    ledger = get_ledger()
+    if ledger is not None:
+        ledger.use_dbc_set(B3SR_JOB, dbc_files)
+        s3_info_list = [
+            item
+            for item in s3_info_list
+            if not ledger.is_ingested(s3_entry(s3_bucket, item), B3SR_JOB)
+        ]
+        if not s3_info_list:
+            logging.warning("⚠️ All B3SR S3 files are already in the ledger.")
+            return {}
+
     selected_strategy, profile = _select_s3_streaming_strategy(
         s3_info_list=s3_info_list,
         requested_strategy=streaming_strategy,
@@ -358,7 +488,8 @@ def main_post_s3_streaming_to_victoriametrics(
             )
             exit(1)
 
-    s3c = create_s3_client(max_pool_connections=max(1, max_active_files))
+    replay_spool_if_online(server)
+    s3c = create_s3_client(max_pool_connections=max(1, download_workers))
     total_counts: dict[str, int] = {}
     span_start: datetime | None = None
     span_end: datetime | None = None
@@ -366,59 +497,81 @@ def main_post_s3_streaming_to_victoriametrics(
     cursor_last_key = ""
     total = len(s3_info_list)
 
-    for idx, item in enumerate(s3_info_list, start=1):
+    def time_order(item: dict) -> tuple[datetime, str]:
+        return (
+            item.get("Timestamp", datetime.min.replace(tzinfo=timezone.utc)),
+            item["Key"],
+        )
+
+    # Files finish in any order; each device's watermark and the cursor move
+    # over them oldest first, and the cursor stops before the first file that
+    # was not fully sent so the next run resumes there.
+    oldest_first = sorted(s3_info_list, key=time_order)
+    cursor = OrderedCompletions(time_order(item) for item in oldest_first)
+    device_keys: dict[str, list[str]] = {}
+    for item in oldest_first:
+        device = _device_from_s3_key(item["Key"])
+        if device is not None:
+            device_keys.setdefault(device, []).append(item["Key"])
+    watermarks = {
+        device: IngestWatermark(server, B3SR_JOB, device, keys)
+        for device, keys in device_keys.items()
+    }
+
+    def download(entry):
+        return download_s3_mdf_source(
+            bucket_name=s3_bucket,
+            key=entry[1]["Key"],
+            strategy=selected_strategy,
+            s3_client=s3c,
+        )
+
+    def decode(entry, source):
+        try:
+            with open_mdf_source(source) as mdf:
+                return _decode_b3sr_mdf(mdf=mdf, dbc_files=dbc_files)
+        finally:
+            discard_mdf_source(source)
+
+    def send(entry, decoded):
+        span = probe_decoded_span(decoded) if ledger is not None else None
+        counts = _send_b3sr_decoded(
+            decoded=decoded,
+            server=server,
+            skip_signal_range_check=skip_signal_range_check,
+            max_batch_size=max_batch_size,
+            device=_device_from_s3_key(entry[1]["Key"]),
+        )
+        if ledger is not None:
+            ledger.record(s3_entry(s3_bucket, entry[1]), B3SR_JOB, counts, span)
+        return counts
+
+    pipeline = S3StreamingPipeline(
+        download=download,
+        decode=decode,
+        send=send,
+        max_active_files=max_active_files,
+        download_workers=download_workers,
+        decode_workers=decode_workers,
+        send_workers=send_workers,
+        discard=discard_mdf_source,
+        label=lambda entry: f"[{entry[0]} of {total}] {entry[1]['Key']}",
+    )
+    for done in pipeline.run(enumerate(s3_info_list, start=1)):
+        idx, item = done.item
         key = item["Key"]
         count_str = f"[{idx} of {total}]"
-        start_ts_single = time.time()
-        result: dict[str, int] = {}
-
-        if selected_strategy == "memory":
-            blob = download_file_bytes_from_s3(
-                bucket_name=s3_bucket,
-                key=key,
-                s3_client=s3c,
-            )
-            if blob is None:
-                continue
-            try:
-                with MDF(io.BytesIO(blob)) as mdf:
-                    result = _decode_and_send_b3sr_mdf(
-                        mdf=mdf,
-                        server=server,
-                        dbc_files=dbc_files,
-                        skip_signal_range_check=skip_signal_range_check,
-                        max_batch_size=max_batch_size,
-                    )
-            except Exception as e:
-                logging.error(f"❌ {count_str} Error processing in memory {key}: {e}")
-            del blob
-        else:
-            tmp_path: Path | None = None
-            try:
-                with tempfile.NamedTemporaryFile(suffix=".mf4", delete=False) as tmp_file:
-                    tmp_path = Path(tmp_file.name)
-                ok = download_file_to_path_from_s3(
-                    bucket_name=s3_bucket,
-                    key=key,
-                    local_path=tmp_path,
-                    s3_client=s3c,
-                )
-                if not ok:
-                    continue
-                with MDF(tmp_path) as mdf:
-                    result = _decode_and_send_b3sr_mdf(
-                        mdf=mdf,
-                        server=server,
-                        dbc_files=dbc_files,
-                        skip_signal_range_check=skip_signal_range_check,
-                        max_batch_size=max_batch_size,
-                    )
-            except Exception as e:
-                logging.error(f"❌ {count_str} Error processing temp file {key}: {e}")
-            finally:
-                if tmp_path and tmp_path.exists():
-                    tmp_path.unlink()
-
+        device = _device_from_s3_key(key)
+        if device is not None:
+            watermarks[device].finish(key, done.value if done.ok else None)
+        sent_ok = done.ok and not send_failed(done.value)
+        if cursor.finish(time_order(item), sent_ok):
+            cursor_last_ts, cursor_last_key = cursor.last
+        if not done.ok:
+            logging.error(f"❌ {count_str} failed to stream {shortpath(Path(key))}")
+            continue
+
+        result: SendResult = done.value
         sent = sum(result.values())
         item_ts = item.get("Timestamp")
         if isinstance(item_ts, datetime):
@@ -426,16 +579,14 @@ def main_post_s3_streaming_to_victoriametrics(
                 span_start = item_ts
             if span_end is None or item_ts > span_end:
                 span_end = item_ts
-            if (
-                cursor_last_ts is None
-                or item_ts > cursor_last_ts
-                or (item_ts == cursor_last_ts and key > cursor_last_key)
-            ):
-                cursor_last_ts = item_ts
-                cursor_last_key = key
-        logging.info(
-            f"✅ {count_str} streamed {shortpath(Path(key))} in {get_time_str(start_ts_single)} ({convert_to_eng(sent)} samples)"
-        )
+        if send_failed(result):
+            logging.warning(
+                f"⚠️ {count_str} streamed {shortpath(Path(key))} with {result.failures} failed batches, the cursor stays before it."
+            )
+        else:
+            logging.info(
+                f"✅ {count_str} streamed {shortpath(Path(key))} in {get_time_str(done.started)} ({convert_to_eng(sent)} samples)"
+            )
         for signal_name, count in result.items():
             total_counts[signal_name] = total_counts.get(signal_name, 0) + count
 
@@ -454,6 +605,36 @@ def main_post_s3_streaming_to_victoriametrics(
     )
     if backfill_span:
         log_final("   ↳ backfill span %s", backfill_span)
+    pipeline_summary = pipeline.format_summary()
+    if pipeline_summary:
+        log_final("   ↳ pipeline %s", pipeline_summary)
+    compression_summary = format_compression_summary()
+    if compression_summary:
+        log_final("   ↳ compression %s", compression_summary)
+    connection_summary = format_vm_client_summary()
+    if connection_summary:
+        log_final("   ↳ connections %s", connection_summary)
+    rate_summary = format_rate_control_summary()
+    if rate_summary:
+        log_final("   ↳ rate control %s", rate_summary)
+    deadband_summary = format_deadband_summary()
+    if deadband_summary:
+        log_final("   ↳ deadband %s", deadband_summary)
+    rollup_summary = format_rollup_summary()
+    if rollup_summary:
+        log_final("   ↳ rollups %s", rollup_summary)
+    backfill_summary = format_backfill_summary()
+    if backfill_summary:
+        log_final("   ↳ gap backfill %s", backfill_summary)
+    ledger_summary = format_ledger_summary()
+    if ledger_summary:
+        log_final("   ↳ ledger %s", ledger_summary)
+    spool = get_spool()
+    if spool is not None and spool.spooled:
+        replay_spool_if_online(server)
+    spool_summary = format_spool_summary()
+    if spool_summary:
+        log_final("   ↳ spool %s", spool_summary)
     if cursor_out.strip():
         Path(cursor_out).write_text(
             json.dumps(
@@ -552,6 +733,7 @@ def main_post_to_victoriametrics(
         logging.error(f" -> ❌ {server} not available. Exiting...")
         exit(1)
 
+    replay_spool_if_online(server)
     logging.info(f" -> ✅ {server} is online. Sending files...")
     total_counts = send_files_to_victoriametrics(
         server=server,
@@ -573,6 +755,36 @@ def main_post_to_victoriametrics(
     )
     if backfill_span:
         log_final("   ↳ backfill span %s", backfill_span)
+    decode_pool_summary = format_decode_pool_summary()
+    if decode_pool_summary:
+        log_final("   ↳ decode pool %s", decode_pool_summary)
+    compression_summary = format_compression_summary()
+    if compression_summary:
+        log_final("   ↳ compression %s", compression_summary)
+    connection_summary = format_vm_client_summary()
+    if connection_summary:
+        log_final("   ↳ connections %s", connection_summary)
+    rate_summary = format_rate_control_summary()
+    if rate_summary:
+        log_final("   ↳ rate control %s", rate_summary)
+    deadband_summary = format_deadband_summary()
+    if deadband_summary:
+        log_final("   ↳ deadband %s", deadband_summary)
+    rollup_summary = format_rollup_summary()
+    if rollup_summary:
+        log_final("   ↳ rollups %s", rollup_summary)
+    backfill_summary = format_backfill_summary()
+    if backfill_summary:
+        log_final("   ↳ gap backfill %s", backfill_summary)
+    ledger_summary = format_ledger_summary()
+    if ledger_summary:
+        log_final("   ↳ ledger %s", ledger_summary)
+    spool = get_spool()
+    if spool is not None and spool.spooled:
+        replay_spool_if_online(server)
+    spool_summary = format_spool_summary()
+    if spool_summary:
+        log_final("   ↳ spool %s", spool_summary)
 
 
 def _get_available_ram_bytes() -> int | None:
@@ -671,27 +883,40 @@ def _select_s3_streaming_strategy(
     return selected, profile
 
 
-def _decode_and_send_b3sr_mdf(
-    mdf: MDF,
-    server: str,
-    dbc_files: list[DbcFileType],
-    skip_signal_range_check: bool,
-    max_batch_size: int,
-) -> dict[str, int]:
-    decoded = mdf.extract_bus_logging(
+def _decode_b3sr_mdf(mdf: MDF, dbc_files: list[DbcFileType]) -> MDF:
+    return mdf.extract_bus_logging(
         database_files={"CAN": dbc_files},
         ignore_value2text_conversion=True,
     )
-    if not list(decoded.iter_channels()):
-        return {}
-    return send_decoded(
-        decoded=decoded,
-        server=server,
-        job=B3SR_JOB,
-        skip_signal_fn=None,
-        skip_signal_range_check=skip_signal_range_check,
-        batch_size=max_batch_size,
-    )
+
+
+def _device_from_s3_key(key: str) -> str | None:
+    # CANedge keys start with the logger's device ID: <device>/<session>/...
+    device, sep, _ = key.partition("/")
+    return device if sep and device else None
+
+
+def _send_b3sr_decoded(
+    decoded: MDF,
+    server: str,
+    skip_signal_range_check: bool,
+    max_batch_size: int,
+    device: str | None = None,
+) -> SendResult:
+    try:
+        if not decoded_has_channels(decoded):
+            return SendResult()
+        return send_decoded(
+            decoded=decoded,
+            server=server,
+            job=B3SR_JOB,
+            device=device,
+            skip_signal_fn=skip_signal,
+            skip_signal_range_check=skip_signal_range_check,
+            batch_size=max_batch_size,
+        )
+    finally:
+        decoded.close()
 
 
 def _parse_cursor_timestamp(raw: str) -> datetime | None:
@@ -815,8 +1040,20 @@ if __name__ == "__main__":
     parser.add_argument(
         "--max-active-files",
         type=int,
-        default=1,
-        help="Max S3 objects to consider in preflight memory estimate.",
+        default=S3_STREAMING_MAX_ACTIVE_FILES,
+        help="Max S3 objects in the streaming pipeline (and RAM estimate).",
+    )
+    parser.add_argument(
+        "--pipeline-workers",
+        type=int,
+        nargs=3,
+        metavar=("DOWNLOAD", "DECODE", "SEND"),
+        default=[
+            S3_PIPELINE_DOWNLOAD_WORKERS,
+            S3_PIPELINE_DECODE_WORKERS,
+            S3_PIPELINE_SEND_WORKERS,
+        ],
+        help="Worker threads per S3 streaming pipeline stage.",
     )
     parser.add_argument(
         "--skip-signal-range-check",
@@ -834,6 +1071,148 @@ if __name__ == "__main__":
         default="",
         help="DBC folder path, or 'old'/'compatibility' for workstation lookup. Defaults to decoder/B3SR/dbc.",
     )
+    parser.add_argument(
+        "--exclude",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Signal or message names to leave out (space or comma separated). They are pruned from the DBC, so they are never decoded.",
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=list(COMPRESSION_ENCODINGS),
+        default=None,
+        help=(
+            "Content-Encoding for VictoriaMetrics import requests "
+            "(default from decoder.config.VM_COMPRESSION)."
+        ),
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        default=None,
+        help=(
+            "Compression level for --compression, or for the encodings of "
+            "decoder.config.VM_COMPRESSION without it (gzip 1-9, zstd 1-22)."
+        ),
+    )
+    parser.add_argument(
+        "--send-engine",
+        type=str,
+        choices=list(SEND_ENGINES),
+        default=None,
+        help=(
+            "threads: one blocking request per sender thread, async: one event "
+            "loop with many requests in flight (default from decoder.config.VM_SEND_ENGINE)."
+        ),
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Concurrent import requests of the async send engine.",
+    )
+    parser.add_argument(
+        "--sink",
+        type=str,
+        choices=list(SEND_SINKS),
+        default=None,
+        help=(
+            "json: one JSON line series per signal, influx: one line-protocol "
+            "line per CAN message and timestamp, which needs VictoriaMetrics "
+            "to run with -influxSkipMeasurement (checked, else json is used; "
+            "default from decoder.config.VM_SEND_SINK)."
+        ),
+    )
+    parser.add_argument(
+        "--coalesce",
+        action="store_true",
+        help=(
+            "Pack the JSON lines of many signals into shared import requests "
+            "(budgets from decoder.config.VM_COALESCE_*; threads engine, json "
+            "sink only)."
+        ),
+    )
+    parser.add_argument(
+        "--deadband",
+        action="store_true",
+        help=(
+            "Only send samples outside the per-signal deadband, plus first/last "
+            "and heartbeat samples (rules from decoder.config.VM_DEADBAND_JOBS "
+            "and DBC VMDeadband/VMHeartbeat attributes)."
+        ),
+    )
+    parser.add_argument(
+        "--decode-processes",
+        type=int,
+        default=None,
+        help=(
+            "Stack and decode local file batches in this many worker "
+            "processes (default decoder.config.DECODE_PROCESSES, 0 = in-process)."
+        ),
+    )
+    parser.add_argument(
+        "--decode-worker-memory-mb",
+        type=int,
+        default=None,
+        help="Address space limit per decode worker process in MiB (not on Windows).",
+    )
+    parser.add_argument(
+        "--decode-transport",
+        type=str,
+        choices=list(DECODE_TRANSPORTS),
+        default=None,
+        help=(
+            "How decode workers hand batches back: shared memory or temp MF4 "
+            "(default decoder.config.DECODE_TRANSPORT)."
+        ),
+    )
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help=(
+            "Also write min/max/avg/last rollup series at "
+            "decoder.config.VM_ROLLUP_RESOLUTIONS for long-range panels."
+        ),
+    )
+    parser.add_argument(
+        "--backfill-gaps",
+        type=int,
+        nargs="?",
+        const=VM_BACKFILL_STEP_SECONDS,
+        default=None,
+        metavar="STEP_SECONDS",
+        help=(
+            "Send only the samples in holes of the VM data, found per series "
+            "with coverage queries at this step (default "
+            "decoder.config.VM_BACKFILL_STEP_SECONDS)."
+        ),
+    )
+    parser.add_argument(
+        "--ledger",
+        type=Path,
+        nargs="?",
+        const=INGEST_LEDGER_PATH,
+        default=None,
+        metavar="PATH",
+        help=(
+            "Skip files already sent with the current DBC set according to "
+            "the SQLite ingest ledger, and record the ones sent now (default "
+            "decoder.config.INGEST_LEDGER_PATH)."
+        ),
+    )
+    parser.add_argument(
+        "--spool-dir",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help=(
+            "Directory of the spool that keeps failed import batches for "
+            "replay (default decoder.config.VM_SPOOL_DIR). Put it outside the "
+            "release tree so spooled batches survive deploys."
+        ),
+    )
     parser.add_argument(
         "--verbosity",
         type=str,
@@ -865,7 +1244,46 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
     DBC_FOLDER_OVERRIDE = args.dbc_folder
+    excluded = [
+        name for raw in args.exclude for name in re.split(r"[\s,]+", raw) if name
+    ]
+    if excluded:
+        SIGNAL_RULES = SignalRules(
+            exclude_signals=excluded, exclude_messages=excluded
+        )
+        logging.info(f"🚫 Excluding before decoding: {', '.join(excluded)}")
     install_verbosity_level(args.verbosity)
+    if args.compression is not None or args.compression_level is not None:
+        try:
+            configure_compression(args.compression, args.compression_level)
+        except ValueError as e:
+            parser.error(f"--compression-level needs --compression: {e}.")
+    send_engine = args.send_engine or VM_SEND_ENGINE
+    if args.max_in_flight is not None and send_engine != "async":
+        parser.error("--max-in-flight only applies to --send-engine async.")
+    if args.send_engine is not None or args.max_in_flight is not None:
+        configure_send_engine(send_engine, args.max_in_flight)
+    if args.sink is not None:
+        configure_send_sink(args.sink)
+    if args.coalesce:
+        if send_engine != "threads":
+            parser.error("--coalesce only applies to --send-engine threads.")
+        if (args.sink or VM_SEND_SINK) != "json":
+            parser.error("--coalesce only applies to --sink json.")
+        configure_coalesce()
+    if args.rollups:
+        configure_rollups()
+    if args.backfill_gaps:
+        configure_backfill(args.backfill_gaps)
+    if args.ledger is not None:
+        configure_ledger(args.ledger)
+    if args.spool_dir is not None:
+        configure_spool(args.spool_dir)
+    configure_decode_pool(
+        args.decode_processes, args.decode_worker_memory_mb, args.decode_transport
+    )
+    if args.deadband:
+        configure_deadband(dbc_files=[get_dbc_file_path()])
     skip_signal_range_check = args.backfill or args.skip_signal_range_check
 
     server = server_vm_test_dump if args.test else args.server
@@ -891,6 +1309,9 @@ if __name__ == "__main__":
             memory_fraction=args.memory_fraction,
             decode_overhead_factor=args.decode_overhead_factor,
             max_active_files=args.max_active_files,
+            download_workers=args.pipeline_workers[0],
+            decode_workers=args.pipeline_workers[1],
+            send_workers=args.pipeline_workers[2],
             skip_signal_range_check=skip_signal_range_check,
             cursor_timestamp=args.cursor_ts,
             cursor_key=args.cursor_key,
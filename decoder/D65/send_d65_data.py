@@ -3,13 +3,10 @@ import sys
 import time
 import logging
 import argparse
-import io
 import json
-import tempfile
 import re
 import ctypes
 import subprocess
-from copy import deepcopy
 from pathlib import Path
 
 from datetime import datetime, timedelta, timezone
@@ -22,7 +19,6 @@ from threading import Lock
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Literal, Iterable, Any
 from canmatrix import CanMatrix
-from canmatrix import formats as canmatrix_formats
 
 if __name__ == "__main__":
     sys.path.append(str(Path(__file__).parent.parent.parent))
@@ -36,14 +32,74 @@ from decoder.utils import (
     format_time_span,
     format_bytes,
     install_verbosity_level,
+    OrderedCompletions,
     log_summary,
     log_final,
     SUMMARY,
     FINAL_SUMMARY,
 )
-from decoder.sending import send_decoded, normalize_dbc_entries
+from decoder.sending import (
+    SEND_ENGINES,
+    SEND_SINKS,
+    IngestWatermark,
+    SendResult,
+    configure_send_engine,
+    configure_send_sink,
+    decoded_has_channels,
+    normalize_dbc_entries,
+    probe_decoded_span,
+    send_decoded,
+    send_failed,
+)
+from decoder.compression import (
+    COMPRESSION_ENCODINGS,
+    configure_compression,
+    format_compression_summary,
+)
+from decoder.vm_client import format_vm_client_summary
+from decoder.rate_control import format_rate_control_summary
+from decoder.deadband import configure_deadband, format_deadband_summary
+from decoder.rollups import configure_rollups, format_rollup_summary
+from decoder.coalescer import configure_coalesce
+from decoder.backfill import configure_backfill, format_backfill_summary
+from decoder.dbc_cache import SignalRules, load_can_matrices, prune_can_matrix
+from decoder.ledger import (
+    configure_ledger,
+    format_ledger_summary,
+    get_ledger,
+    local_entry,
+    s3_entry,
+)
+from decoder.spool import (
+    configure_spool,
+    format_spool_summary,
+    get_spool,
+    replay_spool_if_online,
+)
+from decoder.decode_pool import (
+    DECODE_TRANSPORTS,
+    DecodeBatch,
+    configure_decode_pool,
+    decode_pool_processes,
+    format_decode_pool_summary,
+    iter_decoded_batches,
+)
+from decoder.s3_pipeline import (
+    S3StreamingPipeline,
+    discard_mdf_source,
+    download_s3_mdf_source,
+    open_mdf_source,
+)
 from decoder.config import (
     LOG_FORMAT,
+    S3_PIPELINE_DECODE_WORKERS,
+    S3_PIPELINE_DOWNLOAD_WORKERS,
+    S3_PIPELINE_SEND_WORKERS,
+    INGEST_LEDGER_PATH,
+    S3_STREAMING_MAX_ACTIVE_FILES,
+    VM_BACKFILL_STEP_SECONDS,
+    VM_SEND_ENGINE,
+    VM_SEND_SINK,
     server_vm_d65,
     server_vm_test_dump,
     server_vm_localhost,
@@ -87,28 +143,29 @@ def upper_or_lower(p: Path) -> Literal["Upper", "Lower"] | None:
         return None
 
 
-def skip_signal(name: str) -> bool:
-    SIGNALS_TO_SKIP = [
+def d65_device(job: Literal["Upper", "Lower"]) -> str:
+    """
+    Logger MAC of a D65 job, the `device` of its ingest watermark.
+    """
+    return MAC_UPPER if job == "Upper" else MAC_LOWER
+
+
+# Pruned from the DBCs before decoding (see normalize_dbc_entries()).
+D65_SIGNAL_RULES = SignalRules(
+    exclude_signals=[
         "NSerial",
         "NChecksum",
         "NMultiplexer",
         "S2C_sp_param_id",
-        "C2S_fp_param_id"
-    ]
-
-    if name in SIGNALS_TO_SKIP:
-        return True
-
-    if "mux" in name.lower():
-        return True
-
-    if "nmultiplexer" in name.lower():
-        return True
+        "C2S_fp_param_id",
+    ],
+    exclude_substrings=["mux", "nmultiplexer", "crc"],
+)
 
-    if "crc" in name.lower():
-        return True
 
-    return False
+def skip_signal(name: str) -> bool:
+    # Excluded multiplexors are still decoded, they are dropped here.
+    return D65_SIGNAL_RULES.skips(name)
 
 
 def resolve_dbc_folder(dbc_folder: str | None = None) -> Path:
@@ -222,7 +279,7 @@ def _load_can_matrices_from_dbc(source_dbc: Path) -> list[CanMatrix]:
         logging.warning(f"⚠️ DBC not found: {source_dbc}")
         return []
 
-    loaded = canmatrix_formats.loadp(str(source_dbc))
+    loaded = load_can_matrices(source_dbc)
     if isinstance(loaded, dict):
         return [m for m in loaded.values() if isinstance(m, CanMatrix)]
 
@@ -247,33 +304,24 @@ def build_context_canmatrix_for_signals(
     if not matrices:
         return [], set(), set(), 0
 
+    rules = SignalRules(include_signals=signals, include_messages=messages)
     matched_signals: set[str] = set()
     matched_messages: set[str] = set()
     selected_frame_count = 0
     filtered_matrices: list[CanMatrix] = []
 
     for matrix in matrices:
-        filtered = deepcopy(matrix)
-
-        for frame in list(filtered.frames):
-            frame_name = frame.name or ""
-            message_match = (
-                frame_name.lower() in messages if frame_name else False
-            )
-            frame_signal_matches = {
+        # Each load returns fresh matrices, so they are pruned in place.
+        filtered = prune_can_matrix(matrix, rules)
+        for frame in filtered.frames:
+            if frame.name and frame.name.lower() in rules.include_messages:
+                matched_messages.add(frame.name)
+            matched_signals.update(
                 sig.name
                 for sig in frame.signals
-                if sig.name and sig.name.lower() in signals
-            }
-
-            if not message_match and not frame_signal_matches:
-                filtered.remove_frame(frame)
-                continue
-
-            if message_match:
-                matched_messages.add(frame_name)
-            matched_signals.update(frame_signal_matches)
-            selected_frame_count += 1
+                if sig.name and sig.name.lower() in rules.include_signals
+            )
+        selected_frame_count += len(filtered.frames)
 
         if filtered.frames:
             filtered_matrices.append(filtered)
@@ -484,12 +532,22 @@ def send_files_to_victoriametrics(
             dbc_files["Lower"] = dbc_files_override["Lower"]
 
     upper_dbc_files: list[DbcFileType] = normalize_dbc_entries(
-        dbc_files["Upper"]
+        dbc_files["Upper"], D65_SIGNAL_RULES
     )
     lower_dbc_files: list[DbcFileType] = normalize_dbc_entries(
-        dbc_files["Lower"]
+        dbc_files["Lower"], D65_SIGNAL_RULES
     )
 
+    ledger = get_ledger()
+    if ledger is not None:
+        ledger.use_dbc_set("Upper", upper_dbc_files)
+        ledger.use_dbc_set("Lower", lower_dbc_files)
+        files = [
+            item
+            for item in files
+            if not ledger.is_ingested(local_entry(item[0]), item[1])
+        ]
+
     if len(upper_dbc_files) == 0:
         start_count = len(files)
         files = filter_by_job(files, "Lower")
@@ -509,14 +567,82 @@ def send_files_to_victoriametrics(
         stack_size = 1
         logging.warning("⚠️ concat_size must be at least 1. Setting to 1.")
 
+    # Oldest first, so the ingest watermarks move over whole stacks in order.
+    files = sorted(files, key=lambda x: x[2])
     total_upper_counts: dict[str, int] = {}
     total_lower_counts: dict[str, int] = {}
     total_files = len(files)
 
+    def job_watermarks(
+        keys: list[tuple[Any, str]],
+    ) -> dict[str, IngestWatermark]:
+        # keys are (file or stack, job) pairs, oldest first.
+        return {
+            job: IngestWatermark(
+                server,
+                job,
+                d65_device(job),
+                [key for key, k in keys if k == job],
+            )
+            for job in ("Upper", "Lower")
+        }
+
+    if decode_pool_processes() > 0:
+        # Decode in worker processes and send here, one batch behind them.
+        batches: list[DecodeBatch] = []
+        for batch_idx in range(0, total_files, stack_size):
+            batch_files = files[batch_idx : batch_idx + stack_size]
+            for job, dbc in (
+                ("Upper", upper_dbc_files),
+                ("Lower", lower_dbc_files),
+            ):
+                job_tuples = sorted(
+                    (item for item in batch_files if item[1] == job),
+                    key=lambda x: x[2],
+                )
+                if not job_tuples:
+                    continue
+                stack_msg = f"[{job} ({len(job_tuples)}/{len(batch_files)}) in {batch_idx + 1}-{batch_idx + len(batch_files)} of {total_files}]"
+                job_files = [file for file, _, _ in job_tuples]
+                batches.append(
+                    ((len(batches), job, stack_msg, job_files), job_files, dbc)
+                )
+        watermarks = job_watermarks([(tag[0], tag[1]) for tag, _, _ in batches])
+
+        for (index, job, stack_msg, job_files), decoded in iter_decoded_batches(
+            batches
+        ):
+            if decoded is None:
+                logging.warning(
+                    f"⚠️ No signals decoded for {stack_msg}, skipping sending."
+                )
+                # Empty and failed batches both come back as None.
+                watermarks[job].finish(index, None)
+                continue
+            span = probe_decoded_span(decoded) if ledger is not None else None
+            result = send_decoded(
+                decoded=decoded,
+                server=server,
+                job=job,
+                device=d65_device(job),
+                skip_signal_fn=skip_signal,
+                skip_signal_range_check=skip_signal_range_check or stack_size > 1,
+                batch_size=max_batch_size,
+            )
+            if ledger is not None:
+                ledger.record_files(job_files, job, result, span)
+            watermarks[job].finish(index, result)
+            totals = total_upper_counts if job == "Upper" else total_lower_counts
+            for s, v in result.items():
+                totals[s] = totals.get(s, 0) + v
+        return total_lower_counts, total_upper_counts
+
     if stack_size == 1:
+        watermarks = job_watermarks([(f, k) for f, k, _ in files])
 
         for i, (f, k, _) in enumerate(files):
             count_str = f"[{i} of {total_files}]"
+            result: SendResult | None = None
             try:
                 mdf = MDF(f)
 
@@ -542,19 +668,25 @@ def send_files_to_victoriametrics(
                             f" ✅ {count_str} Decoded file {shortpath(f)} in {get_time_str(start)}"
                         )
 
-                        if not list(decoded.iter_channels()):
+                        if not decoded_has_channels(decoded):
                             logging.warning(
                                 f"⚠️ No signals found in file {shortpath(f)}, skipping sending."
                             )
+                            result = SendResult()
                         else:
                             result = send_decoded(
                                 decoded=decoded,
                                 server=server,
                                 job=k,
+                                device=d65_device(k),
                                 skip_signal_fn=skip_signal,
                                 skip_signal_range_check=skip_signal_range_check,
                                 batch_size=max_batch_size,
                             )
+                            if ledger is not None:
+                                ledger.record_files(
+                                    [f], k, result, probe_decoded_span(decoded)
+                                )
 
                             for s, v in result.items():
                                 if k == "Upper":
@@ -572,15 +704,19 @@ def send_files_to_victoriametrics(
             except Exception as e:
                 logging.error(f"❌ Error reading file {shortpath(f)}: {e}")
                 continue
+            finally:
+                if k in watermarks:
+                    watermarks[k].finish(f, result)
     else:
 
         def batch(lst, n):
             for i in range(0, len(lst), n):
                 yield i, lst[i : i + n]
 
-        def process_batch(files, dbc_files, job, stack_msg):
+        def process_batch(files, dbc_files, job, stack_msg, key):
             logging.debug(f" ⏳ {stack_msg}: Stacking {len(files)} files ...")
             start = time.time()
+            result: SendResult | None = None
             try:
                 mdf = MDF().stack(files)
                 logging.debug(
@@ -597,19 +733,25 @@ def send_files_to_victoriametrics(
                     logging.debug(
                         f" ✅ {stack_msg}: Decoded stacked files in {get_time_str(start)}"
                     )
-                    if not list(decoded.iter_channels()):
+                    if not decoded_has_channels(decoded):
                         logging.warning(
                             f"⚠️ No signals found in stacked files {stack_msg}, skipping sending."
                         )
+                        result = SendResult()
                     else:
                         result = send_decoded(
                             decoded=decoded,
                             server=server,
                             job=job,
+                            device=d65_device(job),
                             skip_signal_fn=skip_signal,
                             skip_signal_range_check=True,
                             batch_size=max_batch_size,
                         )
+                        if ledger is not None:
+                            ledger.record_files(
+                                files, job, result, probe_decoded_span(decoded)
+                            )
 
                         for s, v in result.items():
                             if job == "Upper":
@@ -627,7 +769,16 @@ def send_files_to_victoriametrics(
                     )
             except Exception as e:
                 logging.error(f"❌ Error stacking files {stack_msg}: {e}")
+            watermarks[job].finish(key, result)
 
+        watermarks = job_watermarks(
+            [
+                ((batch_idx, job), job)
+                for batch_idx, batch_files in batch(files, stack_size)
+                for job in ("Upper", "Lower")
+                if any(item[1] == job for item in batch_files)
+            ]
+        )
         for batch_idx, batch_files in batch(files, stack_size):
             upper_tuples = [item for item in batch_files if item[1] == "Upper"]
             upper_tuples.sort(key=lambda x: x[2])  # Sort by start time
@@ -646,6 +797,7 @@ def send_files_to_victoriametrics(
                     upper_dbc_files,
                     "Upper",
                     f"[Upper ({len(upper_files)}/{len(batch_files)}) in {start_idx}-{end_idx} of {total_files}]",
+                    (batch_idx, "Upper"),
                 )
             if len(lower_files) > 0:
                 process_batch(
@@ -653,6 +805,7 @@ def send_files_to_victoriametrics(
                     lower_dbc_files,
                     "Lower",
                     f"[Lower ({len(lower_files)}/{len(batch_files)}) in {start_idx}-{end_idx} of {total_files}]",
+                    (batch_idx, "Lower"),
                 )
 
     return total_lower_counts, total_upper_counts
@@ -931,45 +1084,46 @@ def _is_after_cursor(
     return item_key > cursor_key
 
 
-def _decode_and_send_d65_mdf(
+def _decode_d65_mdf(
     mdf: MDF,
     job: Literal["Upper", "Lower"],
-    server: str,
     upper_dbc_files: list[DbcFileType],
     lower_dbc_files: list[DbcFileType],
-    skip_signal_range_check: bool,
-    max_batch_size: int,
-) -> tuple[dict[str, int], datetime | None, datetime | None]:
+) -> tuple[MDF | None, datetime | None, datetime | None]:
     dbc_files = upper_dbc_files if job == "Upper" else lower_dbc_files
     decoded = mdf.extract_bus_logging(
         database_files={"CAN": dbc_files},
         ignore_value2text_conversion=True,
     )
-    channels = list(decoded.iter_channels())
-    if not channels:
-        return {}, None, None
+    if not decoded_has_channels(decoded):
+        decoded.close()
+        return None, None, None
 
-    span_start: datetime | None = None
-    span_end: datetime | None = None
-    for signal in channels:
-        if len(signal.timestamps) < 1:
-            continue
-        sig_start = decoded.start_time + timedelta(seconds=signal.timestamps[0])
-        sig_end = decoded.start_time + timedelta(seconds=signal.timestamps[-1])
-        if span_start is None or sig_start < span_start:
-            span_start = sig_start
-        if span_end is None or sig_end > span_end:
-            span_end = sig_end
-
-    counts = send_decoded(
-        decoded=decoded,
-        server=server,
-        job=job,
-        skip_signal_fn=skip_signal,
-        skip_signal_range_check=skip_signal_range_check,
-        batch_size=max_batch_size,
-    )
-    return counts, span_start, span_end
+    span_start, span_end = probe_decoded_span(decoded) or (None, None)
+    return decoded, span_start, span_end
+
+
+def _send_d65_decoded(
+    decoded: MDF | None,
+    job: Literal["Upper", "Lower"],
+    server: str,
+    skip_signal_range_check: bool,
+    max_batch_size: int,
+) -> SendResult:
+    if decoded is None:
+        return SendResult()
+    try:
+        return send_decoded(
+            decoded=decoded,
+            server=server,
+            job=job,
+            device=d65_device(job),
+            skip_signal_fn=skip_signal,
+            skip_signal_range_check=skip_signal_range_check,
+            batch_size=max_batch_size,
+        )
+    finally:
+        decoded.close()
 
 
 def main_post_s3_streaming_to_victoriametrics(
@@ -982,9 +1136,12 @@ def main_post_s3_streaming_to_victoriametrics(
     streaming_strategy: Literal["auto", "memory", "tempfile"] = "auto",
     memory_fraction: float = 0.35,
     decode_overhead_factor: float = 2.5,
-    max_active_files: int = 1,
+    max_active_files: int = S3_STREAMING_MAX_ACTIVE_FILES,
     max_batch_size: int = 10_000,
     skip_signal_range_check: bool = False,
+    download_workers: int = S3_PIPELINE_DOWNLOAD_WORKERS,
+    decode_workers: int = S3_PIPELINE_DECODE_WORKERS,
+    send_workers: int = S3_PIPELINE_SEND_WORKERS,
     **kwargs,
 ) -> tuple[dict[str, int], dict[str, int]]:
     cursor_timestamp = _parse_cursor_timestamp(kwargs.get("cursor_timestamp", ""))
@@ -1053,8 +1210,28 @@ def main_post_s3_streaming_to_victoriametrics(
         if "Lower" in dbc_files_override:
             dbc_files["Lower"] = dbc_files_override["Lower"]
 
-    upper_dbc_files = normalize_dbc_entries(dbc_files["Upper"])
-    lower_dbc_files = normalize_dbc_entries(dbc_files["Lower"])
+    upper_dbc_files = normalize_dbc_entries(
+        dbc_files["Upper"], D65_SIGNAL_RULES
+    )
+    lower_dbc_files = normalize_dbc_entries(
+        dbc_files["Lower"], D65_SIGNAL_RULES
+    )
+
+    bucket = EESBuckets.S3_BUCKET_D65.value[0]
+    ledger = get_ledger()
+    if ledger is not None:
+        ledger.use_dbc_set("Upper", upper_dbc_files)
+        ledger.use_dbc_set("Lower", lower_dbc_files)
+        s3_info_list = [
+            item
+            for item in s3_info_list
+            if not ledger.is_ingested(
+                s3_entry(bucket, item), _key_segment_from_s3_key(item["Key"])
+            )
+        ]
+        if not s3_info_list:
+            logging.warning("⚠️ All S3 files are already in the ledger.")
+            return {}, {}
 
     selected_strategy, profile = _select_s3_streaming_strategy(
         s3_info_list=s3_info_list,
@@ -1092,7 +1269,8 @@ def main_post_s3_streaming_to_victoriametrics(
             )
             exit(1)
 
-    s3c = create_s3_client(max_pool_connections=max(1, max_active_files))
+    replay_spool_if_online(server)
+    s3c = create_s3_client(max_pool_connections=max(1, download_workers))
     total_upper_counts: dict[str, int] = {}
     total_lower_counts: dict[str, int] = {}
     span_start: datetime | None = None
@@ -1102,87 +1280,110 @@ def main_post_s3_streaming_to_victoriametrics(
     total = len(s3_info_list)
     all_start_ts = time.time()
 
+    work: list[tuple[int, dict, Literal["Upper", "Lower"]]] = []
     for idx, item in enumerate(s3_info_list, start=1):
-        key = item["Key"]
-        job = _key_segment_from_s3_key(key)
-        if job is None:
-            continue
+        job = _key_segment_from_s3_key(item["Key"])
+        if job is not None:
+            work.append((idx, item, job))
+
+    def time_order(entry) -> tuple[datetime, str]:
+        return (
+            entry[1].get("Timestamp", datetime.min.replace(tzinfo=timezone.utc)),
+            entry[1]["Key"],
+        )
+
+    # Files finish in any order; the watermarks and the cursor move over
+    # them oldest first, and the cursor stops before the first file that
+    # was not fully sent so the next run resumes there.
+    oldest_first = sorted(work, key=time_order)
+    cursor = OrderedCompletions(time_order(entry) for entry in oldest_first)
+    watermarks = {
+        job: IngestWatermark(
+            server,
+            job,
+            d65_device(job),
+            [item["Key"] for _, item, k in oldest_first if k == job],
+        )
+        for job in ("Upper", "Lower")
+    }
 
+    def download(entry):
+        return download_s3_mdf_source(
+            bucket_name=EESBuckets.S3_BUCKET_D65,
+            key=entry[1]["Key"],
+            strategy=selected_strategy,
+            s3_client=s3c,
+        )
+
+    def decode(entry, source):
+        try:
+            with open_mdf_source(source) as mdf:
+                return _decode_d65_mdf(
+                    mdf=mdf,
+                    job=entry[2],
+                    upper_dbc_files=upper_dbc_files,
+                    lower_dbc_files=lower_dbc_files,
+                )
+        finally:
+            discard_mdf_source(source)
+
+    def send(entry, decoded):
+        decoded_mdf, current_start, current_end = decoded
+        counts = _send_d65_decoded(
+            decoded=decoded_mdf,
+            job=entry[2],
+            server=server,
+            skip_signal_range_check=skip_signal_range_check,
+            max_batch_size=max_batch_size,
+        )
+        if ledger is not None:
+            ledger.record(
+                s3_entry(bucket, entry[1]),
+                entry[2],
+                counts,
+                (current_start, current_end),
+            )
+        return counts, current_start, current_end
+
+    pipeline = S3StreamingPipeline(
+        download=download,
+        decode=decode,
+        send=send,
+        max_active_files=max_active_files,
+        download_workers=download_workers,
+        decode_workers=decode_workers,
+        send_workers=send_workers,
+        discard=discard_mdf_source,
+        label=lambda entry: f"[{entry[0]} of {total}] {entry[1]['Key']}",
+    )
+    for done in pipeline.run(work):
+        idx, item, job = done.item
+        key = item["Key"]
         count_str = f"[{idx} of {total}]"
-        start_ts = time.time()
-        result: dict[str, int] = {}
-        current_start: datetime | None = None
-        current_end: datetime | None = None
-        if selected_strategy == "memory":
-            blob = download_file_bytes_from_s3(
-                bucket_name=EESBuckets.S3_BUCKET_D65,
-                key=key,
-                s3_client=s3c,
+        result = done.value[0] if done.ok else None
+        watermarks[job].finish(key, result)
+        if cursor.finish(time_order(done.item), not send_failed(result)):
+            cursor_last_ts, cursor_last_key = cursor.last
+        if not done.ok:
+            logging.error(
+                f"❌ {count_str} {job} failed to stream {shortpath(Path(key))}"
             )
-            if blob is None:
-                continue
-            try:
-                with MDF(io.BytesIO(blob)) as mdf:
-                    result, current_start, current_end = _decode_and_send_d65_mdf(
-                        mdf=mdf,
-                        job=job,
-                        server=server,
-                        upper_dbc_files=upper_dbc_files,
-                        lower_dbc_files=lower_dbc_files,
-                        skip_signal_range_check=skip_signal_range_check,
-                        max_batch_size=max_batch_size,
-                    )
-            except Exception as e:
-                logging.error(f"❌ {count_str} Error processing in memory {key}: {e}")
-            del blob
-        else:
-            tmp_path: Path | None = None
-            try:
-                with tempfile.NamedTemporaryFile(
-                    suffix=".mf4", delete=False
-                ) as tmp_file:
-                    tmp_path = Path(tmp_file.name)
-                ok = download_file_to_path_from_s3(
-                    bucket_name=EESBuckets.S3_BUCKET_D65,
-                    key=key,
-                    local_path=tmp_path,
-                    s3_client=s3c,
-                )
-                if not ok:
-                    continue
-                with MDF(tmp_path) as mdf:
-                    result, current_start, current_end = _decode_and_send_d65_mdf(
-                        mdf=mdf,
-                        job=job,
-                        server=server,
-                        upper_dbc_files=upper_dbc_files,
-                        lower_dbc_files=lower_dbc_files,
-                        skip_signal_range_check=skip_signal_range_check,
-                        max_batch_size=max_batch_size,
-                    )
-            except Exception as e:
-                logging.error(f"❌ {count_str} Error processing temp file {key}: {e}")
-            finally:
-                if tmp_path and tmp_path.exists():
-                    tmp_path.unlink()
+            continue
 
+        result, current_start, current_end = done.value
         sent = sum(result.values())
-        item_ts = item.get("Timestamp")
-        if isinstance(item_ts, datetime):
-            if (
-                cursor_last_ts is None
-                or item_ts > cursor_last_ts
-                or (item_ts == cursor_last_ts and key > cursor_last_key)
-            ):
-                cursor_last_ts = item_ts
-                cursor_last_key = key
         if current_start and (span_start is None or current_start < span_start):
             span_start = current_start
         if current_end and (span_end is None or current_end > span_end):
             span_end = current_end
-        logging.info(
-            f"✅ {count_str} {job} streamed {shortpath(Path(key))} in {get_time_str(start_ts)} ({convert_to_eng(sent)} samples)"
-        )
+        if send_failed(result):
+            logging.warning(
+                f"⚠️ {count_str} {job} streamed {shortpath(Path(key))} with {result.failures} failed batches, the cursor stays before it."
+            )
+        else:
+            logging.info(
+                f"✅ {count_str} {job} streamed {shortpath(Path(key))} in {get_time_str(done.started)} ({convert_to_eng(sent)} samples)"
+            )
         for signal_name, count in result.items():
             if job == "Upper":
                 total_upper_counts[signal_name] = (
@@ -1211,6 +1412,36 @@ def main_post_s3_streaming_to_victoriametrics(
     )
     if backfill_span:
         log_final("   ↳ backfill span %s", backfill_span)
+    pipeline_summary = pipeline.format_summary()
+    if pipeline_summary:
+        log_final("   ↳ pipeline %s", pipeline_summary)
+    compression_summary = format_compression_summary()
+    if compression_summary:
+        log_final("   ↳ compression %s", compression_summary)
+    connection_summary = format_vm_client_summary()
+    if connection_summary:
+        log_final("   ↳ connections %s", connection_summary)
+    rate_summary = format_rate_control_summary()
+    if rate_summary:
+        log_final("   ↳ rate control %s", rate_summary)
+    deadband_summary = format_deadband_summary()
+    if deadband_summary:
+        log_final("   ↳ deadband %s", deadband_summary)
+    rollup_summary = format_rollup_summary()
+    if rollup_summary:
+        log_final("   ↳ rollups %s", rollup_summary)
+    backfill_summary = format_backfill_summary()
+    if backfill_summary:
+        log_final("   ↳ gap backfill %s", backfill_summary)
+    ledger_summary = format_ledger_summary()
+    if ledger_summary:
+        log_final("   ↳ ledger %s", ledger_summary)
+    spool = get_spool()
+    if spool is not None and spool.spooled:
+        replay_spool_if_online(server)
+    spool_summary = format_spool_summary()
+    if spool_summary:
+        log_final("   ↳ spool %s", spool_summary)
     if cursor_out:
         Path(cursor_out).write_text(
             json.dumps(
@@ -1585,6 +1816,7 @@ def main_post_to_victoriametrics(
             )
             exit(1)
 
+    replay_spool_if_online(server)
     logging.info(f" -> ✅ {server} is online. Sending files...")
     skip_signal_range_check = kwargs.pop("skip_signal_range_check", False)
     total_lower_counts, total_upper_counts = send_files_to_victoriametrics(
@@ -1624,6 +1856,36 @@ def main_post_to_victoriametrics(
     )
     if backfill_span:
         log_final("   ↳ backfill span %s", backfill_span)
+    decode_pool_summary = format_decode_pool_summary()
+    if decode_pool_summary:
+        log_final("   ↳ decode pool %s", decode_pool_summary)
+    compression_summary = format_compression_summary()
+    if compression_summary:
+        log_final("   ↳ compression %s", compression_summary)
+    connection_summary = format_vm_client_summary()
+    if connection_summary:
+        log_final("   ↳ connections %s", connection_summary)
+    rate_summary = format_rate_control_summary()
+    if rate_summary:
+        log_final("   ↳ rate control %s", rate_summary)
+    deadband_summary = format_deadband_summary()
+    if deadband_summary:
+        log_final("   ↳ deadband %s", deadband_summary)
+    rollup_summary = format_rollup_summary()
+    if rollup_summary:
+        log_final("   ↳ rollups %s", rollup_summary)
+    backfill_summary = format_backfill_summary()
+    if backfill_summary:
+        log_final("   ↳ gap backfill %s", backfill_summary)
+    ledger_summary = format_ledger_summary()
+    if ledger_summary:
+        log_final("   ↳ ledger %s", ledger_summary)
+    spool = get_spool()
+    if spool is not None and spool.spooled:
+        replay_spool_if_online(server)
+    spool_summary = format_spool_summary()
+    if spool_summary:
+        log_final("   ↳ spool %s", spool_summary)
 
 
 def main_download_files(
@@ -1807,12 +2069,24 @@ if __name__ == "__main__":
     parser.add_argument(
         "--s3-streaming-max-active-files",
         type=int,
-        default=1,
+        default=S3_STREAMING_MAX_ACTIVE_FILES,
         help=(
-            "Max concurrently active files assumed by preflight RAM estimate. "
-            "Current streaming execution processes files sequentially."
+            "Max files in the download -> decode -> send pipeline at once "
+            "(also used by the preflight RAM estimate)."
         ),
     )
+    parser.add_argument(
+        "--s3-streaming-workers",
+        type=int,
+        nargs=3,
+        metavar=("DOWNLOAD", "DECODE", "SEND"),
+        default=[
+            S3_PIPELINE_DOWNLOAD_WORKERS,
+            S3_PIPELINE_DECODE_WORKERS,
+            S3_PIPELINE_SEND_WORKERS,
+        ],
+        help="Worker threads per S3 streaming pipeline stage.",
+    )
     parser.add_argument(
         "--test",
         action="store_true",
@@ -1824,6 +2098,141 @@ if __name__ == "__main__":
         default="",
         help="DBC folder path, or 'old'/'compatibility' for workstation lookup. Defaults to decoder/D65/dbc.",
     )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=list(COMPRESSION_ENCODINGS),
+        default=None,
+        help=(
+            "Content-Encoding for VictoriaMetrics import requests "
+            "(default from decoder.config.VM_COMPRESSION)."
+        ),
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        default=None,
+        help=(
+            "Compression level for --compression, or for the encodings of "
+            "decoder.config.VM_COMPRESSION without it (gzip 1-9, zstd 1-22)."
+        ),
+    )
+    parser.add_argument(
+        "--send-engine",
+        type=str,
+        choices=list(SEND_ENGINES),
+        default=None,
+        help=(
+            "threads: one blocking request per sender thread, async: one event "
+            "loop with many requests in flight (default from decoder.config.VM_SEND_ENGINE)."
+        ),
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Concurrent import requests of the async send engine.",
+    )
+    parser.add_argument(
+        "--sink",
+        type=str,
+        choices=list(SEND_SINKS),
+        default=None,
+        help=(
+            "json: one JSON line series per signal, influx: one line-protocol "
+            "line per CAN message and timestamp, which needs VictoriaMetrics "
+            "to run with -influxSkipMeasurement (checked, else json is used; "
+            "default from decoder.config.VM_SEND_SINK)."
+        ),
+    )
+    parser.add_argument(
+        "--coalesce",
+        action="store_true",
+        help=(
+            "Pack the JSON lines of many signals into shared import requests "
+            "(budgets from decoder.config.VM_COALESCE_*; threads engine, json "
+            "sink only)."
+        ),
+    )
+    parser.add_argument(
+        "--deadband",
+        action="store_true",
+        help=(
+            "Only send samples outside the per-signal deadband, plus first/last "
+            "and heartbeat samples (rules from decoder.config.VM_DEADBAND_JOBS "
+            "and DBC VMDeadband/VMHeartbeat attributes)."
+        ),
+    )
+    parser.add_argument(
+        "--decode-processes",
+        type=int,
+        default=None,
+        help=(
+            "Stack and decode local file batches in this many worker "
+            "processes (default decoder.config.DECODE_PROCESSES, 0 = in-process)."
+        ),
+    )
+    parser.add_argument(
+        "--decode-worker-memory-mb",
+        type=int,
+        default=None,
+        help="Address space limit per decode worker process in MiB (not on Windows).",
+    )
+    parser.add_argument(
+        "--decode-transport",
+        type=str,
+        choices=list(DECODE_TRANSPORTS),
+        default=None,
+        help=(
+            "How decode workers hand batches back: shared memory or temp MF4 "
+            "(default decoder.config.DECODE_TRANSPORT)."
+        ),
+    )
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help=(
+            "Also write min/max/avg/last rollup series at "
+            "decoder.config.VM_ROLLUP_RESOLUTIONS for long-range panels."
+        ),
+    )
+    parser.add_argument(
+        "--backfill-gaps",
+        type=int,
+        nargs="?",
+        const=VM_BACKFILL_STEP_SECONDS,
+        default=None,
+        metavar="STEP_SECONDS",
+        help=(
+            "Send only the samples in holes of the VM data, found per series "
+            "with coverage queries at this step (default "
+            "decoder.config.VM_BACKFILL_STEP_SECONDS)."
+        ),
+    )
+    parser.add_argument(
+        "--ledger",
+        type=Path,
+        nargs="?",
+        const=INGEST_LEDGER_PATH,
+        default=None,
+        metavar="PATH",
+        help=(
+            "Skip files already sent with the current DBC set according to "
+            "the SQLite ingest ledger, and record the ones sent now (default "
+            "decoder.config.INGEST_LEDGER_PATH)."
+        ),
+    )
+    parser.add_argument(
+        "--spool-dir",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help=(
+            "Directory of the spool that keeps failed import batches for "
+            "replay (default decoder.config.VM_SPOOL_DIR). Put it outside the "
+            "release tree so spooled batches survive deploys."
+        ),
+    )
     parser.add_argument(
         "--verbosity",
         type=str,
@@ -1856,6 +2265,41 @@ if __name__ == "__main__":
     args = parser.parse_args()
     DBC_FOLDER_OVERRIDE = args.dbc_folder
     install_verbosity_level(args.verbosity)
+    if args.compression is not None or args.compression_level is not None:
+        try:
+            configure_compression(args.compression, args.compression_level)
+        except ValueError as e:
+            parser.error(f"--compression-level needs --compression: {e}.")
+    send_engine = args.send_engine or VM_SEND_ENGINE
+    if args.max_in_flight is not None and send_engine != "async":
+        parser.error("--max-in-flight only applies to --send-engine async.")
+    if args.send_engine is not None or args.max_in_flight is not None:
+        configure_send_engine(send_engine, args.max_in_flight)
+    if args.sink is not None:
+        configure_send_sink(args.sink)
+    if args.coalesce:
+        if send_engine != "threads":
+            parser.error("--coalesce only applies to --send-engine threads.")
+        if (args.sink or VM_SEND_SINK) != "json":
+            parser.error("--coalesce only applies to --sink json.")
+        configure_coalesce()
+    if args.rollups:
+        configure_rollups()
+    if args.backfill_gaps:
+        configure_backfill(args.backfill_gaps)
+    if args.ledger is not None:
+        configure_ledger(args.ledger)
+    if args.spool_dir is not None:
+        configure_spool(args.spool_dir)
+    configure_decode_pool(
+        args.decode_processes, args.decode_worker_memory_mb, args.decode_transport
+    )
+    if args.deadband:
+        configure_deadband(
+            dbc_files=[
+                path for paths in get_d65_dbc_files().values() for path in paths
+            ]
+        )
 
     if args.s3_streaming_memory_fraction <= 0 or args.s3_streaming_memory_fraction > 1:
         parser.error("--s3-streaming-memory-fraction must be in (0, 1].")
@@ -1863,6 +2307,8 @@ if __name__ == "__main__":
         parser.error("--s3-streaming-decode-overhead must be > 0.")
     if args.s3_streaming_max_active_files < 1:
         parser.error("--s3-streaming-max-active-files must be >= 1.")
+    if min(args.s3_streaming_workers) < 1:
+        parser.error("--s3-streaming-workers must all be >= 1.")
 
     server = server_vm_test_dump if args.test else args.server
 
@@ -1989,6 +2435,9 @@ if __name__ == "__main__":
                 memory_fraction=args.s3_streaming_memory_fraction,
                 decode_overhead_factor=args.s3_streaming_decode_overhead,
                 max_active_files=args.s3_streaming_max_active_files,
+                download_workers=args.s3_streaming_workers[0],
+                decode_workers=args.s3_streaming_workers[1],
+                send_workers=args.s3_streaming_workers[2],
                 max_batch_size=10_000,
                 skip_signal_range_check=args.backfill,
                 send_newest_first=True,
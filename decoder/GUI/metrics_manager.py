@@ -1,6 +1,8 @@
 from PySide6.QtCore import QThread, QMutex, QTimer
 import requests
 from decoder.GUI.victoria_metrics_connection import VM_API_IMPORT_PROMETHEUS, VM_DEFAULT_URL
+from decoder.compression import compress_request_body
+from decoder.vm_client import get_vm_client
 from utils import *
 from config import *
 
@@ -48,8 +50,11 @@ class MetricsManager(QThread):
         self.mutex.unlock()
         if batch:
             try:
-                response = requests.post(
-                    f"{self.vm_url}{VM_API_IMPORT_PROMETHEUS}", data="".join(batch)
+                body, headers = compress_request_body("".join(batch), "prometheus")
+                response = get_vm_client(self.vm_url, pool_size=1).post(
+                    VM_API_IMPORT_PROMETHEUS,
+                    data=body,
+                    headers=headers,
                 )
                 if response.status_code != 204:
                     print(
@@ -42,12 +42,19 @@ from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
 
-from ..sending import send_signal_using_json_lines
+from ..sending import normalize_dbc_entries, send_decoded
+from ..dbc_cache import SignalRules
 from ..config import *
 from ..utils import *
 
 CSVContent = tuple[Path, datetime]
 
+# Pruned from the DBC before decoding; multiplexors are skipped after.
+SNOW_LEOPARD_SIGNAL_RULES = SignalRules(
+    exclude_signals=["NSerial", "NChecksum", "NMultiplexer"],
+    exclude_substrings=["mux", "crc"],
+)
+
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 
 
@@ -166,7 +173,9 @@ def process_files(server: str, files: list, dbc_file: Path, batch_size: int = 1)
     if not dbc_file.exists():
         print(f" ☹️  Cannot find DBC file at {dbc_file}")
         return total_signals
-    database_files = {"CAN": [(dbc_file, 0)]}
+    database_files = {
+        "CAN": normalize_dbc_entries([(dbc_file, 0)], SNOW_LEOPARD_SIGNAL_RULES)
+    }
 
     for i in range(0, len(files), batch_size):
 
@@ -194,47 +203,20 @@ def process_files(server: str, files: list, dbc_file: Path, batch_size: int = 1)
                 decoded = cc.extract_bus_logging(database_files=database_files)  # type: ignore
                 print(f"  ☑️ Decoded in {get_time_str(ts)}")
 
-                def skip_signal(name: str) -> bool:
-                    SIGNALS_TO_SKIP = [
-                        "NSerial",
-                        "NChecksum",
-                        "NMultiplexer",
-                    ]
-
-                    if name in SIGNALS_TO_SKIP:
-                        return True
-
-                    if "mux" in name.lower():
-                        return True
-
-                    if "crc" in name.lower():
-                        return True
-
-                    return False
-
                 ts = time.time()
                 num_of_samples = 0
 
-                def process_signal(sig):
-                    if skip_signal(sig.name):
-                        return 0
-                    _n = send_signal_using_json_lines(
-                        signal=sig,
-                        start_time=decoded.start_time,
-                        job="SnowLeopardTMS",
-                        print_metric_line=False,
-                        send_signal=True,
-                        skip_signal_range_check=True,
-                        batch_size=10_000,
-                        server=server,
-                    )
-                    return _n
-
-                with ThreadPoolExecutor() as executor:
-                    results = list(
-                        executor.map(process_signal, decoded.iter_channels())
-                    )
-                    num_of_samples += sum(results)
+                # send_decoded() reads channels lazily, a few per sender
+                # thread, instead of mapping over every channel at once.
+                result = send_decoded(
+                    decoded=decoded,
+                    server=server,
+                    job="SnowLeopardTMS",
+                    skip_signal_fn=SNOW_LEOPARD_SIGNAL_RULES.skips,
+                    skip_signal_range_check=True,
+                    batch_size=10_000,
+                )
+                num_of_samples += sum(result.values())
                 print(
                     f"  ☑️ Sent batch of {convert_to_eng(num_of_samples)} samples in {get_time_str(ts)} ({convert_to_eng(num_of_samples/(time.time() - ts))} samples/sec)"
                 )
@@ -0,0 +1,211 @@
+import sys
+import logging
+from pathlib import Path
+
+import numpy as np
+from datetime import datetime
+from threading import Lock
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from decoder.config import (
+    LOG_FORMAT,
+    VM_BACKFILL_MAX_POINTS,
+    VM_BACKFILL_STEP_SECONDS,
+    vmapi_query_range,
+)
+from decoder.utils import convert_to_eng, setup_simple_logger
+from decoder.vm_client import get_vm_client
+
+logger = logging.getLogger("backfill")
+setup_simple_logger(logger, format=LOG_FORMAT)
+
+SeriesKey = tuple[str, str]  # (metric name, message)
+
+_step_seconds: int | None = None
+_stats_lock = Lock()
+_stats = {"plans": 0, "gaps": 0, "samples_in": 0, "samples_out": 0}
+
+
+def configure_backfill(
+    step_seconds: int | None = VM_BACKFILL_STEP_SECONDS,
+) -> None:
+    """
+    Make send_file/send_decoded plan each decoded file against the VM
+    coverage of its job at step_seconds resolution and send only samples in
+    the holes (see BackfillPlan). None turns gap planning off again.
+    """
+    global _step_seconds
+    _step_seconds = max(1, int(step_seconds)) if step_seconds else None
+
+
+def backfill_step() -> int | None:
+    return _step_seconds
+
+
+class BackfillPlan:
+    """
+    Missing intervals per series of one job over a time window, from coarse
+    count_over_time coverage queries. A step bucket (t - step, t] is a gap
+    when VM has no sample of the series in it. A hole rarely starts or ends
+    on a bucket boundary, so each gap is widened by the covered bucket on
+    either side and the samples VM already has there are sent again (VM
+    keeps one copy). Holes within a single covered bucket are not seen.
+    Series VM doesn't know at all are missing over the whole window.
+    """
+
+    def __init__(
+        self,
+        start: float,
+        end: float,
+        step: int,
+        gaps: dict[SeriesKey, tuple[np.ndarray, np.ndarray]],
+    ):
+        self.start = start
+        self.end = end
+        self.step = step
+        self.gaps = gaps
+
+    def keep_mask(
+        self, metric_name: str, message: str, epoch_s: np.ndarray
+    ) -> np.ndarray | None:
+        """
+        Mask of the samples (epoch seconds, sorted) that fall in a gap of the
+        series, or None to keep all of them.
+        """
+        gaps = self.gaps.get((metric_name, message))
+        if gaps is None:
+            keep = None
+        elif len(gaps[0]) == 0:
+            keep = (epoch_s <= self.start) | (epoch_s > self.end)
+        else:
+            starts, ends = gaps
+            idx = np.searchsorted(starts, epoch_s, side="left") - 1
+            keep = (idx >= 0) & (epoch_s <= ends[np.maximum(idx, 0)])
+            # Samples outside the planned window were never probed.
+            keep |= (epoch_s <= self.start) | (epoch_s > self.end)
+        with _stats_lock:
+            _stats["samples_in"] += len(epoch_s)
+            _stats["samples_out"] += (
+                len(epoch_s) if keep is None else int(keep.sum())
+            )
+        return keep
+
+
+def _coverage_gaps(
+    bucket_ends: np.ndarray, covered: np.ndarray, step: int
+) -> tuple[np.ndarray, np.ndarray]:
+    # (starts, ends) of the merged runs of uncovered (t - step, t] buckets,
+    # each widened by one bucket on both sides: the edge buckets count as
+    # covered but may hold the start or end of the hole.
+    missing = np.flatnonzero(~covered)
+    if missing.size == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty
+    breaks = np.flatnonzero(np.diff(missing) > 1)
+    first = missing[np.r_[0, breaks + 1]]
+    last = missing[np.r_[breaks, missing.size - 1]]
+    return bucket_ends[first] - 2 * step, bucket_ends[last] + step
+
+
+def plan_backfill(
+    server: str,
+    job: str,
+    start: datetime,
+    end: datetime,
+    step_seconds: int | None = None,
+    timeout: float = 30.0,
+) -> BackfillPlan | None:
+    """
+    Query the coverage of every series of `job` between start and end and
+    return the BackfillPlan, or None when VM could not be asked.
+    Long windows are split so no request exceeds VM_BACKFILL_MAX_POINTS
+    points per series.
+    """
+    step = max(
+        1, int(step_seconds or _step_seconds or VM_BACKFILL_STEP_SECONDS)
+    )
+    first_end = (int(start.timestamp()) // step + 1) * step
+    last_end = max(
+        first_end, -(-int(np.ceil(end.timestamp())) // step) * step
+    )
+    bucket_ends = np.arange(first_end, last_end + step, step, dtype=np.float64)
+    job_label = job.replace(" ", "_")
+    query = (
+        f'count_over_time({{job="{job_label}"}}[{step}s]) keep_metric_names'
+    )
+
+    covered: dict[SeriesKey, np.ndarray] = {}
+    client = get_vm_client(server)
+    for offset in range(0, len(bucket_ends), VM_BACKFILL_MAX_POINTS):
+        chunk = bucket_ends[offset : offset + VM_BACKFILL_MAX_POINTS]
+        try:
+            resp = client.get(
+                vmapi_query_range,
+                params={
+                    "query": query,
+                    "start": f"{chunk[0]:.0f}",
+                    "end": f"{chunk[-1]:.0f}",
+                    "step": f"{step}s",
+                },
+                timeout=timeout,
+            )
+            resp.raise_for_status()
+            result = resp.json().get("data", {}).get("result", [])
+        except Exception as e:
+            logger.warning(f"⚠️ Could not plan the backfill of {job}: {e}")
+            return None
+        for series in result:
+            metric = series.get("metric", {})
+            if "__name__" not in metric:
+                continue
+            key = (metric["__name__"], metric.get("message", ""))
+            mask = covered.setdefault(
+                key, np.zeros(len(bucket_ends), dtype=bool)
+            )
+            times = np.array(
+                [float(t) for t, v in series.get("values", []) if float(v) > 0]
+            )
+            if times.size:
+                idx = np.searchsorted(bucket_ends, times)
+                idx = idx[idx < len(bucket_ends)]
+                mask[idx] = True
+
+    gaps = {
+        key: _coverage_gaps(bucket_ends, mask, step)
+        for key, mask in covered.items()
+    }
+    with _stats_lock:
+        _stats["plans"] += 1
+        _stats["gaps"] += sum(len(starts) for starts, _ in gaps.values())
+    logger.debug(
+        f"  🕳️ {job}: {sum(len(s) for s, _ in gaps.values())} gaps in "
+        f"{len(gaps)} series between {start.isoformat()} and {end.isoformat()}"
+    )
+    return BackfillPlan(
+        start=float(bucket_ends[0] - step),
+        end=float(bucket_ends[-1]),
+        step=step,
+        gaps=gaps,
+    )
+
+
+def get_backfill_stats() -> dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def format_backfill_summary() -> str:
+    """
+    One-line gap backfill summary for the run totals, empty when no plan
+    was made.
+    """
+    stats = get_backfill_stats()
+    if not stats["plans"]:
+        return ""
+    return (
+        f"{stats['gaps']} gaps in {stats['plans']} plans, "
+        f"{convert_to_eng(stats['samples_out'])} of "
+        f"{convert_to_eng(stats['samples_in'])} samples in gaps"
+    )
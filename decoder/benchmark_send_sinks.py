@@ -0,0 +1,158 @@
+### Usage
+# Compare the JSON line and InfluxDB line-protocol sinks of send_decoded() on
+# one real MF4 file: bytes put on the wire, number of requests and wall time
+# until VictoriaMetrics acknowledged every batch.
+#
+#   python -m decoder.benchmark_send_sinks <file.MF4> --dbc a.dbc --dbc b.dbc \
+#       --server http://localhost:8428
+#
+# Use a scratch VM instance (e.g. server_vm_test_dump): both sinks write the
+# same samples. For the influx sink to produce the same series names, VM must
+# run with -influxSkipMeasurement; the benchmark checks its /flags and skips
+# the influx sink otherwise. --stub posts to a local server that acknowledges
+# every batch instead, measuring encoding and HTTP without VM's ingest cost.
+# Requests and bytes are counted from the responses of the pooled session.
+
+import sys
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from asammdf import MDF
+
+from decoder import sending
+from decoder.config import LOG_FORMAT, server_vm_test_dump
+from decoder.utils import (
+    convert_to_eng,
+    format_bytes,
+    get_time_str,
+    install_verbosity_level,
+    log_final,
+)
+from decoder.vm_client import get_vm_client
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Acknowledges every import like VM does, and answers /flags as a VM
+    running with -influxSkipMeasurement.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        body = b'-influxSkipMeasurement="true"\n'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def benchmark_sink(
+    decoded: MDF,
+    sink: str,
+    server: str,
+    job: str,
+    skip_signal_fn=None,
+) -> dict[str, float]:
+    stats = {"bytes": 0, "requests": 0}
+    lock = threading.Lock()
+
+    def count(response, *args, **kwargs):
+        if response.request.method == "POST":
+            with lock:
+                stats["bytes"] += len(response.request.body or b"")
+                stats["requests"] += 1
+
+    hooks = get_vm_client(server).session.hooks["response"]
+    hooks.append(count)
+    try:
+        start = time.time()
+        counts = sending.send_decoded(
+            decoded=decoded,
+            server=server,
+            job=job,
+            skip_signal_fn=skip_signal_fn,
+            skip_signal_range_check=True,
+            sink=sink,  # type: ignore[arg-type]
+        )
+        elapsed = time.time() - start
+    finally:
+        hooks.remove(count)
+
+    return {
+        "bytes": stats["bytes"],
+        "requests": stats["requests"],
+        "samples": sum(counts.values()),
+        "signals": len(counts),
+        "seconds": elapsed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark JSON line vs influx line-protocol send sinks."
+    )
+    parser.add_argument("mf4", type=Path, help="Raw MF4 file to decode.")
+    parser.add_argument(
+        "--dbc", type=Path, action="append", required=True, help="DBC file(s)."
+    )
+    parser.add_argument("--server", type=str, default=server_vm_test_dump)
+    parser.add_argument("--job", type=str, default="benchmark_send_sinks")
+    parser.add_argument(
+        "--stub",
+        action="store_true",
+        help="POST to a local server that acknowledges every batch.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    install_verbosity_level("minimal")
+
+    if args.stub:
+        stub = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        stub.daemon_threads = True
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        args.server = f"http://127.0.0.1:{stub.server_address[1]}"
+    sinks = ["json"]
+    if sending.influx_skips_measurement(args.server) is not False:
+        sinks.append("influx")
+
+    start = time.time()
+    with MDF(args.mf4) as mdf:
+        decoded = mdf.extract_bus_logging(
+            database_files={"CAN": sending.normalize_dbc_entries(args.dbc)},
+            ignore_value2text_conversion=True,
+        )
+    log_final(f"⏳ Decoded {args.mf4.name} in {get_time_str(start)}")
+
+    for sink in sinks:
+        result = benchmark_sink(
+            decoded=decoded,
+            sink=sink,
+            server=args.server,
+            job=f"{args.job}_{sink}",
+        )
+        log_final(
+            f"📊 {sink:>6}: {format_bytes(int(result['bytes']))} in "
+            f"{int(result['requests'])} requests | "
+            f"{convert_to_eng(result['samples'])} samples from "
+            f"{int(result['signals'])} signals | "
+            f"{result['seconds']:.3f}s "
+            f"({convert_to_eng(result['samples'] / max(result['seconds'], 1e-9))} samples/s)"
+        )
@@ -0,0 +1,117 @@
+### Usage
+# Measure what sharing one converted timestamp array per channel group saves
+# when encoding the JSON lines of a decoded MF4 file: CPU time (one untraced
+# pass) and peak traced memory (a second pass under tracemalloc), with and
+# without utils.SharedTimestamps. Nothing is sent.
+#
+#   python -m decoder.benchmark_shared_timestamps <file.MF4> --dbc a.dbc \
+#       --dbc b.dbc
+
+import sys
+import time
+import logging
+import argparse
+import tracemalloc
+from pathlib import Path
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from asammdf import MDF
+
+from decoder import sending
+from decoder.config import LOG_FORMAT
+from decoder.utils import (
+    SharedTimestamps,
+    convert_to_eng,
+    format_bytes,
+    get_time_str,
+    install_verbosity_level,
+    log_final,
+)
+
+
+def _encode(decoded: MDF, shared: bool, batch_size: int) -> tuple[int, int]:
+    logger = logging.getLogger("benchmark_shared_timestamps")
+    samples = 0
+    size = 0
+    for group in sending.iter_channel_groups(decoded, copy_master=False):
+        shared_timestamps = (
+            SharedTimestamps(
+                decoded.start_time, group[0].timestamps, users=len(group)
+            )
+            if shared
+            else None
+        )
+        for signal in group:
+            prepared = sending._prepare_json_line_chunks(
+                signal=signal,
+                start_time=decoded.start_time,
+                job="benchmark",
+                server="",
+                skip_signal_range_check=True,
+                job_watermark=None,
+                batch_size=batch_size,
+                logger=logger,
+                shared_timestamps=shared_timestamps,
+            )
+            if prepared is None:
+                continue
+            for chunk, count in prepared[1]:
+                samples += count
+                size += len(chunk)
+    return samples, size
+
+
+def benchmark_encoding(
+    decoded: MDF, shared: bool, batch_size: int = 10_000
+) -> dict[str, float]:
+    start = time.process_time()
+    samples, size = _encode(decoded, shared, batch_size)
+    seconds = time.process_time() - start
+
+    tracemalloc.start()
+    _encode(decoded, shared, batch_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"samples": samples, "bytes": size, "seconds": seconds, "peak": peak}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark JSON line encoding with shared timestamps."
+    )
+    parser.add_argument("mf4", type=Path, help="Raw MF4 file to decode.")
+    parser.add_argument(
+        "--dbc", type=Path, action="append", required=True, help="DBC file(s)."
+    )
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    install_verbosity_level("minimal")
+
+    start = time.time()
+    with MDF(args.mf4) as mdf:
+        decoded = mdf.extract_bus_logging(
+            database_files={"CAN": sending.normalize_dbc_entries(args.dbc)},
+            ignore_value2text_conversion=True,
+        )
+    log_final(f"⏳ Decoded {args.mf4.name} in {get_time_str(start)}")
+
+    results = {}
+    for shared in (False, True):
+        result = benchmark_encoding(decoded, shared, args.batch_size)
+        results[shared] = result
+        log_final(
+            f"📊 {'shared' if shared else 'per-signal':>10}: "
+            f"{convert_to_eng(result['samples'])} samples, "
+            f"{format_bytes(int(result['bytes']))} encoded | "
+            f"{result['seconds']:.3f}s CPU | "
+            f"peak {format_bytes(int(result['peak']))} traced"
+        )
+    if results[False]["bytes"] != results[True]["bytes"]:
+        log_final("❌ Encoded output differs between the two runs.")
+    cpu = results[True]["seconds"] / max(results[False]["seconds"], 1e-9) - 1
+    peak = results[True]["peak"] / max(results[False]["peak"], 1) - 1
+    log_final(f"📉 CPU {cpu:+.0%}, peak memory {peak:+.0%}")
@@ -0,0 +1,131 @@
+import sys
+import time
+import logging
+from pathlib import Path
+
+from collections.abc import Callable
+from threading import Event, Lock, Thread
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from decoder.config import (
+    LOG_FORMAT,
+    VM_COALESCE_FLUSH_SECONDS,
+    VM_COALESCE_MAX_BYTES,
+    VM_COALESCE_MAX_SAMPLES,
+)
+from decoder.utils import setup_simple_logger
+
+_coalesce_enabled = False
+
+
+def configure_coalesce(enabled: bool = True) -> None:
+    """
+    Default for send_decoded(coalesce=None).
+    """
+    global _coalesce_enabled
+    _coalesce_enabled = enabled
+
+
+def coalesce_enabled() -> bool:
+    return _coalesce_enabled
+
+
+class ImportCoalescer:
+    """
+    Packs JSON lines from many signals into shared /api/v1/import requests.
+
+    Lines are buffered until max_bytes or max_samples is reached, until
+    flush_interval seconds passed since the last flush (whatever triggered
+    it), or until close().
+    Per-signal sample counts are only credited once the request holding the
+    line was accepted, so close() returns the same counts as sending every
+    signal on its own.
+    """
+
+    def __init__(
+        self,
+        post: Callable[[bytes], bool],
+        max_bytes: int = VM_COALESCE_MAX_BYTES,
+        max_samples: int = VM_COALESCE_MAX_SAMPLES,
+        flush_interval: float = VM_COALESCE_FLUSH_SECONDS,
+    ):
+        self.post = post
+        self.max_bytes = max(1, max_bytes)
+        self.max_samples = max(1, max_samples)
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(self.__class__.__name__)
+        setup_simple_logger(self.logger, format=LOG_FORMAT)
+
+        self.counts: dict[str, int] = {}
+        self.requests = 0
+        self._lock = Lock()
+        self._lines: list[bytes] = []
+        self._pending: dict[str, int] = {}
+        self._bytes = 0
+        self._samples = 0
+        self._last_flush = time.time()
+        self._closed = Event()
+        self._timer: Thread | None = None
+        if flush_interval > 0:
+            self._timer = Thread(
+                target=self._flush_periodically,
+                name="vm-coalescer",
+                daemon=True,
+            )
+            self._timer.start()
+
+    def add(self, line: bytes, name: str, count: int) -> None:
+        with self._lock:
+            self._lines.append(line)
+            self._pending[name] = self._pending.get(name, 0) + count
+            self._bytes += len(line) + 1
+            self._samples += count
+            full = (
+                self._bytes >= self.max_bytes
+                or self._samples >= self.max_samples
+            )
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._lines:
+                return
+            lines, pending = self._lines, self._pending
+            self._lines, self._pending = [], {}
+            self._bytes = 0
+            self._samples = 0
+            self._last_flush = time.time()
+
+        # Post outside the lock so signal threads keep filling the next request.
+        ok = self.post(b"\n".join(lines) + b"\n")
+        with self._lock:
+            self.requests += 1
+            if ok:
+                for name, count in pending.items():
+                    self.counts[name] = self.counts.get(name, 0) + count
+        if not ok:
+            self.logger.error(
+                f"‼️ Coalesced batch of {len(lines)} lines from {len(pending)} signals was not accepted."
+            )
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(min(self.flush_interval, 0.25)):
+            # Size-triggered flushes restart the interval too.
+            with self._lock:
+                due = time.time() - self._last_flush >= self.flush_interval
+            if due:
+                self.flush()
+
+    def close(self) -> dict[str, int]:
+        """
+        Flush what is left, stop the timer and return {signal: samples_sent}.
+        """
+        self._closed.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+        with self._lock:
+            return dict(self.counts)
@@ -0,0 +1,189 @@
+import sys
+import time
+import gzip
+import logging
+from pathlib import Path
+
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Literal
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from decoder.config import VM_COMPRESSION, VM_COMPRESSION_WORKERS
+from decoder.utils import format_bytes, format_duration_seconds
+
+try:
+    import zstandard  # optional, only needed for encoding="zstd"
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+Encoding = Literal["none", "gzip", "zstd"]
+COMPRESSION_ENCODINGS: tuple[str, ...] = ("none", "gzip", "zstd")
+
+_sink_settings: dict[str, tuple[Encoding, int]] = {}
+_stats_lock = Lock()
+_stats: dict[str, float] = {
+    "requests": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "seconds": 0.0,
+}
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = Lock()
+
+
+def configure_compression(
+    encoding: Encoding | None,
+    level: int | None = None,
+    sinks: Iterable[str] | None = None,
+) -> None:
+    """
+    Set the Content-Encoding used for import requests of the given sinks
+    ("import", "influx", "prometheus"; all of them when sinks is None).
+    encoding=None keeps each sink's configured encoding, level=None its
+    configured level. Raises ValueError for a level that would apply to no
+    compressed sink.
+    """
+    if encoding is not None and encoding not in COMPRESSION_ENCODINGS:
+        raise ValueError(f"Unknown compression encoding: {encoding}")
+
+    selected = list(_sink_settings.keys()) if sinks is None else list(sinks)
+    settings = {
+        sink: _sink_settings.get(sink, ("none", 0)) for sink in selected
+    }
+    if level is not None and all(
+        (encoding or current) == "none" for current, _ in settings.values()
+    ):
+        raise ValueError(
+            f"no compressed sink to apply level {level} to "
+            f"({', '.join(selected)} are uncompressed)"
+        )
+    for sink, (current_encoding, current_level) in settings.items():
+        _sink_settings[sink] = _available(
+            sink,
+            encoding or current_encoding,
+            current_level if level is None else level,
+        )
+
+
+def _available(
+    sink: str, encoding: Encoding, level: int
+) -> tuple[Encoding, int]:
+    # zstd without the optional package falls back to gzip (levels 1-9).
+    if encoding != "zstd" or zstandard is not None:
+        return encoding, level
+    logging.warning(
+        f"⚠️ zstd compression requested for {sink} but the 'zstandard' package is not installed (pip install -r requirements.txt), using gzip."
+    )
+    return "gzip", min(level, 9)
+
+
+_sink_settings.update(
+    {
+        sink: _available(sink, encoding, level)  # type: ignore[arg-type]
+        for sink, (encoding, level) in VM_COMPRESSION.items()
+    }
+)
+
+
+def get_sink_compression(sink: str) -> tuple[Encoding, int]:
+    return _sink_settings.get(sink, ("none", 0))
+
+
+def compress_request_body(
+    payload: bytes | str, sink: str
+) -> tuple[bytes, dict[str, str]]:
+    """
+    Compress one request body with the sink's encoding.
+    Returns (body, extra_headers); the headers are empty when the sink is not
+    compressed.
+    """
+    data = payload.encode() if isinstance(payload, str) else payload
+    encoding, level = get_sink_compression(sink)
+    if encoding == "none":
+        return data, {}
+
+    start = time.perf_counter()
+    if encoding == "zstd":
+        body = zstandard.ZstdCompressor(level=level).compress(data)
+    else:
+        body = gzip.compress(data, compresslevel=level, mtime=0)
+    elapsed = time.perf_counter() - start
+
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["bytes_in"] += len(data)
+        _stats["bytes_out"] += len(body)
+        _stats["seconds"] += elapsed
+
+    return body, {"Content-Encoding": encoding}
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # zlib and zstd release the GIL, so threads compress in parallel
+            # with the sender threads waiting on the network.
+            _pool = ThreadPoolExecutor(
+                max_workers=VM_COMPRESSION_WORKERS,
+                thread_name_prefix="vm-compress",
+            )
+        return _pool
+
+
+def submit_compression(
+    payload: bytes | str, sink: str
+) -> Future[tuple[bytes, dict[str, str]]]:
+    future: Future[tuple[bytes, dict[str, str]]]
+    if get_sink_compression(sink)[0] == "none":
+        future = Future()
+        future.set_result(compress_request_body(payload, sink))
+        return future
+    return _get_pool().submit(compress_request_body, payload, sink)
+
+
+def iter_compressed_chunks(
+    chunks: Iterable[tuple[bytes, Any]],
+    sink: str,
+    prefetch: int = 2,
+) -> Iterator[tuple[bytes, dict[str, str], Any]]:
+    """
+    Yield (body, headers, extra) for every (payload, extra) in chunks.
+    Up to `prefetch` following chunks are compressed in the worker pool while
+    the caller is busy posting the current one.
+    """
+    pending: list[tuple[Future[tuple[bytes, dict[str, str]]], Any]] = []
+    for payload, extra in chunks:
+        pending.append((submit_compression(payload, sink), extra))
+        if len(pending) > prefetch:
+            future, _extra = pending.pop(0)
+            body, headers = future.result()
+            yield body, headers, _extra
+    for future, extra in pending:
+        body, headers = future.result()
+        yield body, headers, extra
+
+
+def get_compression_stats() -> dict[str, float]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def format_compression_summary() -> str:
+    """
+    One-line summary for the run totals, empty when nothing was compressed.
+    """
+    stats = get_compression_stats()
+    if not stats["requests"]:
+        return ""
+    ratio = stats["bytes_in"] / max(stats["bytes_out"], 1)
+    return (
+        f"{format_bytes(int(stats['bytes_in']))} -> "
+        f"{format_bytes(int(stats['bytes_out']))} "
+        f"(ratio {ratio:.1f}x, {int(stats['requests'])} requests, "
+        f"{format_duration_seconds(stats['seconds'])} compressing)"
+    )
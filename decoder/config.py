@@ -1,4 +1,7 @@
+import os
 import logging
+from pathlib import Path
+from typing import Literal
 
 LIVE_STREAMING = False
 LIVE_STREAMING_SERVER = "http://localhost:8428"
@@ -40,4 +43,138 @@ vmapi_datadog_v2_series = "/datadog/api/v2/series"
 vmapi_federate = "/federate"
 vmapi_graphite_find = "/graphite/metrics/find"
 vmapi_influx_write = "/influx/write"
+vmapi_flags = "/flags"
 vmapi_resetRollupResultCache = "/internal/resetRollupResultCache"
+
+# Import request body compression per sink: (Content-Encoding, level).
+# Content-Encoding is "none", "gzip" or "zstd" (zstd needs the optional
+# `zstandard` package and a VictoriaMetrics version that accepts it).
+VM_COMPRESSION = {
+    "import": ("none", 3),
+    "influx": ("none", 3),
+    "prometheus": ("none", 3),
+}
+VM_COMPRESSION_WORKERS = 4
+
+# Cross-signal JSON line coalescing (--coalesce, send_decoded(coalesce=True)):
+# one import request is flushed at whichever budget is hit first, or after the
+# interval since the last flush.
+VM_COALESCE_MAX_BYTES = 8 * 1024 * 1024
+VM_COALESCE_MAX_SAMPLES = 500_000
+VM_COALESCE_FLUSH_SECONDS = 1.0
+
+# Shared keep-alive VictoriaMetrics client (decoder/vm_client.py).
+VM_CLIENT_POOL_SIZE = 10
+VM_CLIENT_TIMEOUT = 10.0
+
+# Send engine for send_decoded/send_file: "threads" (one blocking request per
+# sender thread) or "async" (one event loop keeping up to
+# VM_ASYNC_MAX_IN_FLIGHT import requests in flight).
+VM_SEND_ENGINE = "threads"
+# Sink for send_decoded/send_file: "json" (one JSON line series per signal,
+# /api/v1/import) or "influx" (one line-protocol line per CAN message and
+# timestamp, /influx/write). "influx" only writes the same series when VM runs
+# with -influxSkipMeasurement; without it the senders fall back to "json".
+VM_SEND_SINK = "json"
+VM_ASYNC_MAX_IN_FLIGHT = 64
+# Signals the threads engine reads from the decoded MDF ahead of its sender
+# threads (per thread). Bounds memory: channels are loaded lazily, not all
+# at once.
+VM_SEND_PENDING_PER_WORKER = 2
+# Signals longer than this are sent as several sample-range tasks (rounded up
+# to whole batches) that any idle sender can pick up. 0 sends each signal as
+# one task.
+VM_SEND_SLICE_SAMPLES = 200_000
+
+# Adaptive (AIMD) pacing of VM import requests, shared by every sender in the
+# process (decoder/rate_control.py). The window is the number of import
+# requests allowed in flight; it grows while requests answer within
+# VM_RATE_TARGET_LATENCY seconds and is cut on slow answers, 429/5xx and
+# timeouts. Batch sizes shrink and recover with the same signals; each
+# decoded file is sent with the batch size current when it starts.
+# The window starts at the 10 sender threads of send_decoded(). Only answers
+# slower than half of VM_CLIENT_TIMEOUT count as slow.
+VM_RATE_INITIAL_WINDOW = 10
+VM_RATE_MIN_WINDOW = 1
+VM_RATE_MAX_WINDOW = 64
+VM_RATE_TARGET_LATENCY = 5.0
+VM_RATE_DECREASE_FACTOR = 0.5
+VM_RATE_MIN_BATCH_FRACTION = 0.1
+VM_RATE_MAX_BACKOFF = 30.0
+
+# Import batches that still fail after all retries are appended to this
+# on-disk spool (decoder/spool.py) and replayed on the next run instead of
+# being dropped. Segments rotate at VM_SPOOL_SEGMENT_MAX_BYTES. Batches VM
+# rejects (4xx other than 429), and batches that failed
+# VM_SPOOL_MAX_REPLAYS replays, are moved to its "rejected" subfolder,
+# which is never replayed.
+VM_SPOOL_ENABLED = True
+VM_SPOOL_DIR = Path(__file__).parent / ".vm_spool"
+VM_SPOOL_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+VM_SPOOL_MAX_REPLAYS = 20
+
+# Parsed DBC databases (decoder/dbc_cache.py) are pickled here, keyed by
+# file content and parser version, so runs skip re-parsing unchanged DBCs.
+DBC_CACHE_ENABLED = True
+DBC_CACHE_DIR = Path(__file__).parent / ".dbc_cache"
+
+# Local SQLite ledger of fully sent files (decoder/ledger.py, --ledger):
+# S3 objects (key + ETag) and local files (path, size, mtime) already sent
+# with the job's current DBC set are skipped without asking VictoriaMetrics.
+INGEST_LEDGER_ENABLED = False
+INGEST_LEDGER_PATH = Path(__file__).parent / ".ingest_ledger.sqlite"
+
+# Deadband / change-only compression before sending (decoder/deadband.py),
+# off unless enabled with configure_deadband() or --deadband. Rules map job
+# fnmatch patterns to {signal fnmatch pattern: (deadband, heartbeat seconds)};
+# a sample is only sent when it moved more than `deadband` from the last sent
+# sample (0 = on change), or when `heartbeat` seconds passed since then.
+# DBC signal attributes VM_DEADBAND_DBC_ATTRIBUTES (deadband, heartbeat)
+# override the defaults for their signals.
+VM_DEADBAND_JOBS: dict[str, dict[str, tuple[float, float]]] = {}
+VM_DEADBAND_HEARTBEAT_SECONDS = 60.0
+VM_DEADBAND_DBC_ATTRIBUTES = ("VMDeadband", "VMHeartbeat")
+
+# Ingest-time rollups (decoder/rollups.py, send_decoded(rollups=True) or
+# --rollups): per resolution and aggregate an extra series
+# `<signal>:<resolution>_<aggregate>{job,rollup,rollup_message,unit}`. They
+# carry no `message` label, so existing `{message=~...}` panels never match
+# them; long-range panels select them by name or by `rollup="1m"`.
+VM_ROLLUP_RESOLUTIONS = {"1s": 1_000, "10s": 10_000, "1m": 60_000}
+VM_ROLLUP_AGGREGATES = ("min", "max", "avg", "last")
+
+# One sample `ingest_watermark{job,device}` at the end of the newest file of
+# a device such that it and every older file of the run were fully sent
+# (sending.IngestWatermark). send_decoded(device=...) skips a file ending
+# before it without scanning every series of the job; later files still get
+# the per-series scan.
+VM_INGEST_WATERMARK_METRIC = "ingest_watermark"
+
+# Gap-aware backfill (decoder/backfill.py, --backfill-gaps): coverage of a
+# job is probed with count_over_time at this step, so holes shorter than a
+# step are not refilled. Long windows are queried in pieces of at most
+# VM_BACKFILL_MAX_POINTS steps.
+VM_BACKFILL_STEP_SECONDS = 60
+VM_BACKFILL_MAX_POINTS = 10_000
+
+# S3 streaming runs download -> decode -> send as a pipeline
+# (decoder/s3_pipeline.py) with this many worker threads per stage. At most
+# S3_STREAMING_MAX_ACTIVE_FILES objects are between "download started" and
+# "sent" at once; the RAM preflight assumes the same number.
+S3_STREAMING_MAX_ACTIVE_FILES = 3
+S3_PIPELINE_DOWNLOAD_WORKERS = 2
+S3_PIPELINE_DECODE_WORKERS = 1
+S3_PIPELINE_SEND_WORKERS = 1
+
+# Local-folder ingestion can stack + decode batches in worker processes
+# (decoder/decode_pool.py, --decode-processes); 0 keeps decoding in the main
+# process. Workers hand decoded batches back as temp MF4 files in
+# DECODE_SPILL_DIR (None = system temp dir). DECODE_WORKER_MEMORY_MB caps the
+# address space of each worker where the OS supports it (not on Windows).
+DECODE_PROCESSES = 0
+DECODE_WORKER_MEMORY_MB: int | None = None
+DECODE_SPILL_DIR: str | None = None
+# "shm" hands decoded arrays back in shared memory blocks, "mf4" as temp
+# files. Windows frees shared memory when its creator closes it, so it
+# always uses "mf4" there.
+DECODE_TRANSPORT: Literal["mf4", "shm"] = "mf4" if os.name == "nt" else "shm"
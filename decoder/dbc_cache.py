@@ -0,0 +1,254 @@
+import os
+import sys
+import pickle
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+
+from collections.abc import Callable, Iterable
+from threading import Lock
+from typing import Any
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import asammdf
+import cantools
+import canmatrix
+from asammdf.blocks.utils import load_can_database
+from canmatrix import CanMatrix
+from canmatrix import formats as canmatrix_formats
+
+from decoder.config import DBC_CACHE_DIR, DBC_CACHE_ENABLED, LOG_FORMAT
+from decoder.utils import setup_simple_logger
+
+logger = logging.getLogger("dbc_cache")
+setup_simple_logger(logger, format=LOG_FORMAT)
+
+# Pickles are only valid for the parser (and pickle format) that made them.
+_PARSER_VERSIONS = {
+    "asammdf": f"asammdf-{asammdf.__version__}-canmatrix-{canmatrix.__version__}",
+    "canmatrix": f"canmatrix-{canmatrix.__version__}",
+    "cantools": f"cantools-{cantools.__version__}",
+}
+_PYTHON = f"py{sys.version_info[0]}{sys.version_info[1]}-p{pickle.HIGHEST_PROTOCOL}"
+
+_directory: Path | None = DBC_CACHE_DIR if DBC_CACHE_ENABLED else None
+_stats_lock = Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def configure_dbc_cache(
+    directory: Path | str | None = DBC_CACHE_DIR, enabled: bool = True
+) -> None:
+    """
+    Keep parsed databases in another directory, or parse every time.
+    """
+    global _directory
+    _directory = Path(directory) if enabled and directory is not None else None
+
+
+def _content_hash(paths: Iterable[str | os.PathLike[str]]) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _cached(
+    kind: str,
+    paths: list[str | os.PathLike[str]],
+    parse: Callable[[], Any],
+    variant: str = "",
+) -> Any:
+    """
+    parse() the databases at paths once per content and parser version, and
+    unpickle them on later calls. Every call returns a fresh object, so
+    callers may edit it. Unreadable cache files are parsed and written again.
+    variant tells apart different results parsed from the same files.
+    """
+    directory = _directory
+    if directory is None:
+        return parse()
+
+    key = f"{_content_hash(paths)}-{_PARSER_VERSIONS[kind]}-{_PYTHON}"
+    if variant:
+        key = f"{variant}-{key}"
+    cache_file = directory / f"{kind}-{key}.pickle"
+    try:
+        with open(cache_file, "rb") as f:
+            loaded = pickle.load(f)
+        with _stats_lock:
+            _stats["hits"] += 1
+        return loaded
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"⚠️ Ignoring unreadable DBC cache file {cache_file.name}: {e}")
+
+    parsed = parse()
+    with _stats_lock:
+        _stats["misses"] += 1
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_file)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        logger.debug(
+            f"  🗃️ Cached {kind} database of {', '.join(Path(p).name for p in paths)}"
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Could not write DBC cache file {cache_file.name}: {e}")
+    return parsed
+
+
+class SignalRules:
+    """
+    Include/exclude rules applied to a database before decoding, so that
+    dropped messages and signals are never decoded. Names match
+    case-insensitively.
+
+    With include rules, only messages named in include_messages or carrying
+    a signal of include_signals are kept, each with all of its signals.
+    exclude_messages drops whole messages, exclude_signals signals by name
+    and exclude_substrings signals whose name contains any of them.
+    Excluded multiplexors stay in the database, since the signals they
+    select can't be decoded without them; skips() still drops them after
+    decoding.
+    """
+
+    def __init__(
+        self,
+        include_signals: Iterable[str] = (),
+        include_messages: Iterable[str] = (),
+        exclude_signals: Iterable[str] = (),
+        exclude_substrings: Iterable[str] = (),
+        exclude_messages: Iterable[str] = (),
+    ):
+        self.include_signals = frozenset(s.lower() for s in include_signals)
+        self.include_messages = frozenset(m.lower() for m in include_messages)
+        self.exclude_signals = frozenset(s.lower() for s in exclude_signals)
+        self.exclude_substrings = tuple(
+            sorted({s.lower() for s in exclude_substrings})
+        )
+        self.exclude_messages = frozenset(m.lower() for m in exclude_messages)
+        self.key = hashlib.sha256(
+            repr(
+                [
+                    sorted(self.include_signals),
+                    sorted(self.include_messages),
+                    sorted(self.exclude_signals),
+                    list(self.exclude_substrings),
+                    sorted(self.exclude_messages),
+                ]
+            ).encode()
+        ).hexdigest()[:16]
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.include_signals
+            or self.include_messages
+            or self.exclude_signals
+            or self.exclude_substrings
+            or self.exclude_messages
+        )
+
+    def skips(self, name: str) -> bool:
+        """
+        Whether a decoded signal of this name is excluded; usable as the
+        skip_signal_fn of the senders.
+        """
+        lower = name.lower()
+        return lower in self.exclude_signals or any(
+            part in lower for part in self.exclude_substrings
+        )
+
+    def keeps_frame(self, frame: Any) -> bool:
+        name = (frame.name or "").lower()
+        if name in self.exclude_messages:
+            return False
+        if not self.include_signals and not self.include_messages:
+            return True
+        return name in self.include_messages or any(
+            (signal.name or "").lower() in self.include_signals
+            for signal in frame.signals
+        )
+
+
+def _is_multiplexor(signal: Any) -> bool:
+    return signal.multiplex == "Multiplexor" or bool(signal.is_multiplexer)
+
+
+def prune_can_matrix(matrix: CanMatrix, rules: SignalRules) -> CanMatrix:
+    """
+    Drop the frames and signals `rules` exclude from matrix, in place.
+    Frames left with nothing but skipped signals are dropped too.
+    """
+    for frame in list(matrix.frames):
+        if not rules.keeps_frame(frame):
+            matrix.remove_frame(frame)
+            continue
+        frame.signals = [
+            signal
+            for signal in frame.signals
+            if not rules.skips(signal.name) or _is_multiplexor(signal)
+        ]
+        if all(rules.skips(signal.name) for signal in frame.signals):
+            matrix.remove_frame(frame)
+    return matrix
+
+
+def load_bus_database(
+    path: str | os.PathLike[str], rules: SignalRules | None = None
+) -> CanMatrix | None:
+    """
+    The CanMatrix asammdf's extract_bus_logging() would load for a DBC path,
+    pruned by rules. Pruned databases are cached per rule set.
+    """
+    if not rules:
+        return _cached("asammdf", [path], lambda: load_can_database(Path(path)))
+
+    def parse() -> CanMatrix | None:
+        matrix = load_bus_database(path)
+        return prune_can_matrix(matrix, rules) if matrix is not None else None
+
+    return _cached("asammdf", [path], parse, variant=f"rules-{rules.key}")
+
+
+def load_can_matrices(path: str | os.PathLike[str]) -> dict[str, CanMatrix]:
+    """
+    canmatrix.formats.loadp() of a database file: {bus name: CanMatrix}.
+    """
+    return _cached("canmatrix", [path], lambda: canmatrix_formats.loadp(str(path)))
+
+
+def load_cantools_database(
+    paths: list[str | os.PathLike[str]],
+    on_loaded: Callable[[str | os.PathLike[str]], None] | None = None,
+) -> "cantools.database.Database":
+    """
+    One cantools database with all DBC files added in order. on_loaded(path)
+    is called for each file parsed (cache misses only).
+    """
+
+    def parse() -> "cantools.database.Database":
+        db = cantools.db.Database()
+        for path in paths:
+            db.add_dbc_file(path)
+            if on_loaded is not None:
+                on_loaded(path)
+        return db
+
+    return _cached("cantools", list(paths), parse)
+
+
+def get_dbc_cache_stats() -> dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
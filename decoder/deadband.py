@@ -0,0 +1,233 @@
+import sys
+import logging
+from pathlib import Path
+
+import numpy as np
+from fnmatch import fnmatchcase
+from collections.abc import Iterable
+from threading import Lock
+from typing import Any
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from decoder.config import (
+    VM_DEADBAND_DBC_ATTRIBUTES,
+    VM_DEADBAND_HEARTBEAT_SECONDS,
+    VM_DEADBAND_JOBS,
+)
+from decoder.utils import convert_to_eng
+
+DeadbandRule = tuple[float, float]  # (deadband, heartbeat seconds)
+
+
+def deadband_mask(
+    values: Any,
+    timestamps_in_s: Any,
+    deadband: float,
+    heartbeat: float = VM_DEADBAND_HEARTBEAT_SECONDS,
+) -> np.ndarray:
+    """
+    Boolean mask of the samples to keep.
+
+    A sample is kept when it differs from the last kept sample by more than
+    `deadband` (any change when deadband is 0), when `heartbeat` seconds (if
+    > 0) passed since the last kept sample, or when it is the first or last
+    sample, so step graphs still end on the right value.
+    Steady stretches are skipped with NumPy window scans; only kept samples
+    cost a Python iteration.
+    """
+    _values = np.asarray(values, dtype=np.float64)
+    _timestamps = np.asarray(timestamps_in_s, dtype=np.float64)
+    n = len(_values)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    if n <= 2:
+        return keep
+
+    values_list = _values.tolist()
+    timestamps_list = _timestamps.tolist()
+    last = n - 1
+    k = 0
+    while k < last:
+        reference = values_list[k]
+        due = timestamps_list[k] + heartbeat if heartbeat > 0 else np.inf
+
+        # Fast path: a sample close by already qualifies (noisy signals).
+        nxt = k + 1
+        scan_end = min(k + 16, last)
+        while nxt < scan_end and not (
+            abs(values_list[nxt] - reference) > deadband
+            or timestamps_list[nxt] >= due
+        ):
+            nxt += 1
+        if nxt < scan_end or nxt == last:
+            k = nxt
+            keep[k] = True
+            continue
+
+        end = (
+            int(np.searchsorted(_timestamps, due, side="left"))
+            if heartbeat > 0
+            else last
+        )
+        end = min(end, last)
+        found = end
+        start, width = nxt, 64
+        while start < end:
+            stop = min(start + width, end)
+            hits = np.flatnonzero(
+                np.abs(_values[start:stop] - reference) > deadband
+            )
+            if hits.size:
+                found = start + int(hits[0])
+                break
+            start, width = stop, width * 4
+        k = found
+        keep[k] = True
+    return keep
+
+
+def load_dbc_deadband_rules(
+    dbc_files: Iterable[Path | str],
+    heartbeat: float = VM_DEADBAND_HEARTBEAT_SECONDS,
+) -> dict[str, DeadbandRule]:
+    """
+    {signal_name: (deadband, heartbeat)} from the VM_DEADBAND_DBC_ATTRIBUTES
+    signal attributes of the given DBC files. Signals without a deadband
+    attribute are left out.
+    """
+    from canmatrix import CanMatrix
+    from decoder.dbc_cache import load_can_matrices
+
+    deadband_attr, heartbeat_attr = VM_DEADBAND_DBC_ATTRIBUTES
+    rules: dict[str, DeadbandRule] = {}
+    for dbc_file in dbc_files:
+        try:
+            loaded = load_can_matrices(dbc_file)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not read deadbands from {dbc_file}: {e}")
+            continue
+        matrices = loaded.values() if isinstance(loaded, dict) else [loaded]
+        for matrix in matrices:
+            if not isinstance(matrix, CanMatrix):
+                continue
+            for frame in matrix.frames:
+                for signal in frame.signals:
+                    raw_deadband = signal.attribute(deadband_attr, matrix)
+                    if raw_deadband in (None, ""):
+                        continue
+                    raw_heartbeat = signal.attribute(heartbeat_attr, matrix)
+                    rules[signal.name] = (
+                        float(raw_deadband),
+                        float(raw_heartbeat)
+                        if raw_heartbeat not in (None, "")
+                        else heartbeat,
+                    )
+    return rules
+
+
+class DeadbandConfig:
+    """
+    Per-job deadband rules: {job pattern: {signal pattern: (deadband,
+    heartbeat)}}, patterns in fnmatch syntax, first match wins. Exact signal
+    names (e.g. from DBC attributes) are checked before patterns.
+    """
+
+    def __init__(
+        self,
+        jobs: dict[str, dict[str, DeadbandRule]] | None = None,
+        dbc_rules: dict[str, DeadbandRule] | None = None,
+    ):
+        self.jobs = dict(jobs or {})
+        self.dbc_rules = dict(dbc_rules or {})
+
+    def rule_for(self, job: str, signal_name: str) -> DeadbandRule | None:
+        for job_pattern, rules in self.jobs.items():
+            if not fnmatchcase(job, job_pattern):
+                continue
+            if signal_name in rules:
+                return rules[signal_name]
+            for signal_pattern, rule in rules.items():
+                if fnmatchcase(signal_name, signal_pattern):
+                    return rule
+        return self.dbc_rules.get(signal_name)
+
+
+_config: DeadbandConfig | None = None
+_stats_lock = Lock()
+_stats = {"signals": 0, "samples_in": 0, "samples_out": 0}
+
+
+def configure_deadband(
+    jobs: dict[str, dict[str, DeadbandRule]] | None = None,
+    dbc_files: Iterable[Path | str] = (),
+    enabled: bool = True,
+) -> DeadbandConfig | None:
+    """
+    Enable the deadband stage for every sender in the process, with the
+    per-job rules (default config.VM_DEADBAND_JOBS) plus the deadband
+    attributes of dbc_files. enabled=False turns it off again.
+    """
+    global _config
+    if not enabled:
+        _config = None
+        return None
+    _config = DeadbandConfig(
+        jobs=VM_DEADBAND_JOBS if jobs is None else jobs,
+        dbc_rules=load_dbc_deadband_rules(dbc_files),
+    )
+    return _config
+
+
+def apply_deadband_mask(
+    job: str, signal_name: str, values: np.ndarray, timestamps_in_s: Any
+) -> np.ndarray | None:
+    """
+    Keep-mask for one signal under the configured rules, or None when the
+    stage is off or no rule matches. Counts towards the reduction summary.
+    """
+    config = _config
+    if config is None:
+        return None
+    rule = config.rule_for(job, signal_name)
+    if rule is None:
+        return None
+    mask = deadband_mask(values, timestamps_in_s, *rule)
+    with _stats_lock:
+        _stats["signals"] += 1
+        _stats["samples_in"] += len(mask)
+        _stats["samples_out"] += int(mask.sum())
+    return mask
+
+
+def has_deadband_rule(job: str, signal_name: str) -> bool:
+    """
+    Whether the configured rules filter this signal. The deadband needs the
+    whole signal, so such signals are not split into sample ranges.
+    """
+    config = _config
+    return config is not None and config.rule_for(job, signal_name) is not None
+
+
+def get_deadband_stats() -> dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def format_deadband_summary() -> str:
+    """
+    One-line reduction summary for the run totals, empty when nothing was
+    filtered.
+    """
+    stats = get_deadband_stats()
+    if not stats["samples_in"]:
+        return ""
+    ratio = stats["samples_in"] / max(stats["samples_out"], 1)
+    return (
+        f"{convert_to_eng(stats['samples_in'])} -> "
+        f"{convert_to_eng(stats['samples_out'])} samples "
+        f"(ratio {ratio:.1f}x over {stats['signals']} signals)"
+    )
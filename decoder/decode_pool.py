@@ -0,0 +1,303 @@
+import os
+import sys
+import time
+import logging
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Literal
+
+try:
+    import resource
+except ImportError:  # Windows: no per-process address space limit
+    resource = None  # type: ignore[assignment]
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from asammdf import MDF
+from asammdf.blocks.types import DbcFileType
+
+from decoder.config import (
+    DECODE_PROCESSES,
+    DECODE_SPILL_DIR,
+    DECODE_TRANSPORT,
+    DECODE_WORKER_MEMORY_MB,
+    LOG_FORMAT,
+)
+from decoder.sending import DecodedSignals
+from decoder.shm_transport import (
+    SharedDecodedBatch,
+    discard_shm_manifest,
+    export_decoded_to_shm,
+    new_shm_prefix,
+    sweep_shm_blocks,
+)
+from decoder.utils import format_bytes, setup_simple_logger
+
+DecodeBatch = tuple[Any, list[Path], list[DbcFileType]]
+DecodeTransport = Literal["mf4", "shm"]
+DECODE_TRANSPORTS: tuple[DecodeTransport, ...] = ("mf4", "shm")
+
+logger = logging.getLogger("DecodePool")
+setup_simple_logger(logger, format=LOG_FORMAT)
+
+_processes = DECODE_PROCESSES
+_memory_limit_mb: int | None = DECODE_WORKER_MEMORY_MB
+_transport: DecodeTransport = DECODE_TRANSPORT
+_stats = {
+    "batches": 0,
+    "empty": 0,
+    "failed": 0,
+    "processes": 0,
+    "seconds": 0.0,
+    "bytes": 0,
+}
+_stats_transports: set[str] = set()
+
+
+def configure_decode_pool(
+    processes: int | None = None,
+    memory_limit_mb: int | None = None,
+    transport: DecodeTransport | None = None,
+) -> None:
+    """
+    Decode local stack batches in `processes` worker processes (0 = in the
+    main process). memory_limit_mb caps each worker's address space; it is
+    ignored where the platform can't enforce it. transport picks how decoded
+    batches come back: "shm" (shared memory) or "mf4" (temp files).
+    """
+    global _processes, _memory_limit_mb, _transport
+    if processes is not None:
+        _processes = max(0, processes)
+    if memory_limit_mb is not None:
+        _memory_limit_mb = memory_limit_mb or None
+    if transport is not None:
+        if transport not in DECODE_TRANSPORTS:
+            raise ValueError(
+                f"Unknown decode transport {transport!r}, expected one of {DECODE_TRANSPORTS}"
+            )
+        if transport == "shm" and os.name == "nt":
+            logger.warning(
+                "⚠️ Shared memory transport is not supported on Windows, using mf4."
+            )
+            transport = "mf4"
+        _transport = transport
+    if _memory_limit_mb and resource is None:
+        logger.warning(
+            "⚠️ Per-worker memory limits are not supported on this platform."
+        )
+
+
+def decode_pool_processes() -> int:
+    return _processes
+
+
+def _init_decode_worker(memory_limit_mb: int | None) -> None:
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _decode_batch(files: list[Path], dbc_files: list[DbcFileType]) -> MDF:
+    mdf = MDF(files[0]) if len(files) == 1 else MDF().stack(files)
+    try:
+        return mdf.extract_bus_logging(
+            database_files={"CAN": dbc_files},
+            ignore_value2text_conversion=True,
+        )
+    finally:
+        mdf.close()
+
+
+def decode_batch_to_mf4(
+    files: list[Path], dbc_files: list[DbcFileType], spill_dir: str
+) -> tuple[str | None, float]:
+    """
+    Stack and decode one batch in a worker process and save the decoded
+    signals as an MF4 in spill_dir, so only its path crosses the process
+    boundary. Returns (path or None if nothing decoded, decode seconds).
+    """
+    start = time.time()
+    decoded = _decode_batch(files, dbc_files)
+    try:
+        if not decoded.groups:
+            return None, time.time() - start
+        fd, path = tempfile.mkstemp(suffix=".mf4", dir=spill_dir)
+        os.close(fd)
+        return str(decoded.save(path, overwrite=True)), time.time() - start
+    finally:
+        decoded.close()
+
+
+def decode_batch_to_shm(
+    files: list[Path],
+    dbc_files: list[DbcFileType],
+    spill_dir: str,
+    shm_prefix: str = "",
+) -> tuple[dict[str, Any] | None, float]:
+    """
+    Like decode_batch_to_mf4(), but hands the decoded arrays over in shared
+    memory blocks named shm_prefix + suffix; returns (manifest or None,
+    decode seconds).
+    """
+    start = time.time()
+    decoded = _decode_batch(files, dbc_files)
+    try:
+        return export_decoded_to_shm(decoded, shm_prefix), time.time() - start
+    finally:
+        decoded.close()
+
+
+_WORKERS = {"mf4": decode_batch_to_mf4, "shm": decode_batch_to_shm}
+
+
+def iter_decoded_batches(
+    batches: Iterable[DecodeBatch],
+    processes: int | None = None,
+    memory_limit_mb: int | None = None,
+    spill_dir: str | Path | None = DECODE_SPILL_DIR,
+    transport: DecodeTransport | None = None,
+) -> Iterator[tuple[Any, MDF | DecodedSignals | None]]:
+    """
+    Decode (tag, files, dbc_files) batches in a process pool and yield
+    (tag, decoded) in completion order, so the caller sends one batch while
+    the workers decode the next ones. decoded is an MDF opened from a temp
+    MF4 ("mf4") or a SharedDecodedBatch ("shm"), and None when the batch
+    failed or had no signals. It is closed and its file or shared memory
+    freed when the caller asks for the next batch. At most 2 * processes
+    batches are decoded ahead of the caller. Shared memory blocks carry a
+    per-run name prefix, swept when a worker dies and when the run ends.
+    """
+    processes = max(1, processes or _processes or 1)
+    _stats["processes"] = max(_stats["processes"], processes)
+    memory_limit_mb = memory_limit_mb or _memory_limit_mb
+    transport = transport or _transport
+    decode_batch = _WORKERS[transport]
+    _stats_transports.add(transport)
+    pending_batches = iter(batches)
+    context = multiprocessing.get_context("spawn")
+    shm_prefix = new_shm_prefix() if transport == "shm" else ""
+
+    def new_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=context,
+            initializer=_init_decode_worker,
+            initargs=(memory_limit_mb,),
+        )
+
+    with tempfile.TemporaryDirectory(
+        prefix="vm-decode-", dir=spill_dir
+    ) as tmp_dir:
+        pool = new_pool()
+        in_flight: dict[Future, Any] = {}
+
+        def submit_next() -> bool:
+            batch = next(pending_batches, None)
+            if batch is None:
+                return False
+            tag, files, dbc_files = batch
+            args = (tmp_dir, shm_prefix) if shm_prefix else (tmp_dir,)
+            future = pool.submit(decode_batch, files, dbc_files, *args)
+            in_flight[future] = tag
+            return True
+
+        def discard_unread() -> None:
+            # Call after pool.shutdown(): no worker writes blocks anymore.
+            # Shared memory of finished batches has no reader, and a killed
+            # worker may have left blocks no manifest lists.
+            for future in in_flight:
+                if (
+                    shm_prefix
+                    and not future.cancelled()
+                    and future.exception() is None
+                    and future.result()[0] is not None
+                ):
+                    discard_shm_manifest(future.result()[0])
+            swept = sweep_shm_blocks(shm_prefix)
+            if swept:
+                logger.warning(f"⚠️ Freed {swept} unread shared memory blocks.")
+
+        try:
+            while len(in_flight) < 2 * processes and submit_next():
+                pass
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    tag = in_flight.pop(future)
+                    handle: Any = None
+                    try:
+                        handle, seconds = future.result()
+                        _stats["seconds"] += seconds
+                    except BrokenProcessPool as e:
+                        # A worker died (e.g. killed for memory): restart the
+                        # pool so the remaining batches still get decoded.
+                        broken = True
+                        _stats["failed"] += 1
+                        logger.error(f"❌ {tag}: decode worker died: {e}")
+                    except Exception as e:
+                        _stats["failed"] += 1
+                        logger.error(f"❌ {tag}: failed to decode: {e!r}")
+                    _stats["batches"] += 1
+
+                    if handle is None:
+                        if not broken:
+                            _stats["empty"] += 1
+                        yield tag, None
+                        continue
+                    if transport == "shm":
+                        with SharedDecodedBatch(handle) as batch:
+                            _stats["bytes"] += batch.bytes
+                            yield tag, batch
+                        continue
+                    _stats["bytes"] += os.path.getsize(handle)
+                    decoded = MDF(handle)
+                    try:
+                        yield tag, decoded
+                    finally:
+                        decoded.close()
+                        os.unlink(handle)
+
+                if broken:
+                    for future, tag in in_flight.items():
+                        future.cancel()
+                        logger.error(f"❌ {tag}: lost with the decode worker.")
+                        _stats["failed"] += 1
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    discard_unread()
+                    in_flight.clear()
+                    pool = new_pool()
+                while len(in_flight) < 2 * processes and submit_next():
+                    pass
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            discard_unread()
+
+
+def get_decode_pool_stats() -> dict[str, float]:
+    return dict(_stats)
+
+
+def format_decode_pool_summary() -> str:
+    """
+    One-line process-pool decode summary for the run totals.
+    """
+    if not _stats["batches"]:
+        return ""
+    summary = (
+        f"{int(_stats['batches'])} batches in "
+        f"{int(_stats['processes'])} processes "
+        f"({_stats['seconds']:.1f}s decoding, "
+        f"{format_bytes(int(_stats['bytes']))} via "
+        f"{'/'.join(sorted(_stats_transports))}"
+    )
+    if _stats["failed"]:
+        summary += f", {int(_stats['failed'])} failed"
+    return summary + ")"
@@ -0,0 +1,346 @@
+### Usage
+# The senders consult the ledger when run with --ledger [PATH]. To look at it
+# by hand:
+#
+#   python -m decoder.ledger --stats
+#   python -m decoder.ledger --forget-job Upper
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import argparse
+from pathlib import Path
+
+from collections.abc import Iterable
+from datetime import datetime
+from threading import Lock
+from typing import Any
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from asammdf.blocks.types import DbcFileType
+
+from decoder.config import INGEST_LEDGER_ENABLED, INGEST_LEDGER_PATH, LOG_FORMAT
+from decoder.utils import convert_to_eng, setup_simple_logger
+
+# (source, version): "s3://bucket/key" and its ETag, or the resolved local
+# path and "size:mtime_ns".
+LedgerEntry = tuple[str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested (
+    source TEXT NOT NULL,
+    job TEXT NOT NULL,
+    version TEXT NOT NULL,
+    dbc_hash TEXT NOT NULL,
+    span_start TEXT,
+    span_end TEXT,
+    samples INTEGER NOT NULL,
+    counts TEXT NOT NULL,
+    ingested_at REAL NOT NULL,
+    stack TEXT,
+    PRIMARY KEY (source, job)
+)
+"""
+
+
+def local_entry(path: Path | str) -> LedgerEntry:
+    stat = os.stat(path)
+    return str(Path(path).resolve()), f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def s3_entry(bucket: str, item: dict) -> LedgerEntry:
+    """
+    Entry of an object listed by s3_helper.get_mf4_files_list_from_s3().
+    Listings without an ETag fall back to size and last modified time.
+    """
+    version = str(item.get("ETag") or "").strip('"')
+    if not version:
+        last_modified = item.get("LastModified")
+        if isinstance(last_modified, datetime):
+            last_modified = last_modified.isoformat()
+        version = f"{item.get('Size', '')}:{last_modified or ''}"
+    return f"s3://{bucket}/{item['Key']}", version
+
+
+def _hash_can_matrix(digest: "hashlib._Hash", matrix: Any) -> None:
+    frames = sorted(
+        matrix.frames,
+        key=lambda frame: (frame.arbitration_id.id, frame.name),
+    )
+    for frame in frames:
+        digest.update(f"{frame.arbitration_id.id}:{frame.name}".encode())
+        for signal in sorted(frame.signals, key=lambda s: s.name):
+            digest.update(
+                repr(
+                    (
+                        signal.name,
+                        signal.start_bit,
+                        signal.size,
+                        signal.is_little_endian,
+                        signal.is_signed,
+                        str(signal.factor),
+                        str(signal.offset),
+                        signal.multiplex,
+                        signal.unit,
+                        sorted(
+                            (str(value), str(text))
+                            for value, text in signal.values.items()
+                        ),
+                    )
+                ).encode()
+            )
+
+
+def dbc_set_hash(dbc_files: Iterable[DbcFileType]) -> str:
+    """
+    Content hash of a normalized DBC set: file bytes for DBC paths, the
+    frame and signal layout (with units and value tables) for in-memory
+    CanMatrix entries, plus the bus channel of each entry. Order of the entries doesn't matter.
+    """
+    parts: list[str] = []
+    for source, channel in dbc_files:
+        digest = hashlib.sha256()
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        else:
+            _hash_can_matrix(digest, source)
+        parts.append(f"{channel}:{digest.hexdigest()}")
+    return hashlib.sha256("\n".join(sorted(parts)).encode()).hexdigest()
+
+
+class IngestLedger:
+    """
+    SQLite record of the files that were fully sent: one row per (source,
+    job) with the file version, the hash of the DBC set it was decoded
+    with, the per-signal sample counts and the time span sent. Files sent
+    as one stack share a span; the stack's counts are kept once, on the row
+    of its first file, and every row names that file in `stack`.
+
+    A file counts as ingested only while its version and the job's current
+    DBC set (use_dbc_set()) both still match the row, so a changed object,
+    a touched local file or a new DBC set sends it again and the new send
+    replaces the row. Safe to share between threads.
+    """
+
+    def __init__(self, path: Path = INGEST_LEDGER_PATH):
+        self.path = Path(path)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        setup_simple_logger(self.logger, format=LOG_FORMAT)
+        self.skipped = 0
+        self.skipped_samples = 0
+        self.recorded = 0
+        self.held_back = 0
+        self.stale = 0
+        self._dbc_hashes: dict[str, str] = {}
+        self._lock = Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            self.path, timeout=30.0, check_same_thread=False
+        )
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(_SCHEMA)
+            columns = {
+                row[1]
+                for row in self._db.execute("PRAGMA table_info(ingested)")
+            }
+            if "stack" not in columns:
+                self._db.execute("ALTER TABLE ingested ADD COLUMN stack TEXT")
+
+    def use_dbc_set(self, job: str, dbc_files: Iterable[DbcFileType]) -> str:
+        """
+        Set the DBC set `job` is decoded with from now on; rows written with
+        another set no longer count as ingested.
+        """
+        dbc_hash = dbc_set_hash(dbc_files)
+        with self._lock:
+            self._dbc_hashes[job] = dbc_hash
+        return dbc_hash
+
+    def is_ingested(self, entry: LedgerEntry, job: str) -> bool:
+        source, version = entry
+        with self._lock:
+            dbc_hash = self._dbc_hashes.get(job)
+            row = self._db.execute(
+                "SELECT version, dbc_hash, samples FROM ingested "
+                "WHERE source = ? AND job = ?",
+                (source, job),
+            ).fetchone()
+            if row is None:
+                return False
+            if row[0] != version or dbc_hash is None or row[1] != dbc_hash:
+                self.stale += 1
+                return False
+            self.skipped += 1
+            self.skipped_samples += row[2]
+        return True
+
+    def record(
+        self,
+        entry: LedgerEntry,
+        job: str,
+        counts: dict[str, int],
+        span: tuple[datetime | None, datetime | None] | None = None,
+        stack: str | None = None,
+        with_counts: bool = True,
+    ) -> None:
+        """
+        Mark a file as fully sent for `job` with the job's current DBC set.
+        stack is the source of the first file of the stack it was sent in;
+        with_counts=False records the file without samples, for all but
+        that first file.
+        counts is what the send returned: a SendResult with failures is
+        not recorded, so the file is sent again by the next run. Batches
+        deferred to the spool don't count as failures, its replay sends them.
+        """
+        source, version = entry
+        span_start, span_end = span or (None, None)
+        with self._lock:
+            if getattr(counts, "failures", 0):
+                self.held_back += 1
+                self.logger.warning(
+                    f"⚠️ {source}: batches failed, not recorded as ingested for {job}."
+                )
+                return
+            dbc_hash = self._dbc_hashes.get(job)
+            if dbc_hash is None:
+                raise ValueError(f"No DBC set registered for job {job!r}")
+            row_counts = dict(counts) if with_counts else {}
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO ingested (source, job, version, "
+                    "dbc_hash, span_start, span_end, samples, counts, "
+                    "ingested_at, stack) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        source,
+                        job,
+                        version,
+                        dbc_hash,
+                        span_start.isoformat() if span_start else None,
+                        span_end.isoformat() if span_end else None,
+                        sum(row_counts.values()),
+                        json.dumps(row_counts, sort_keys=True),
+                        time.time(),
+                        stack,
+                    ),
+                )
+            self.recorded += 1
+
+    def record_files(
+        self,
+        files: Iterable[Path],
+        job: str,
+        counts: dict[str, int],
+        span: tuple[datetime | None, datetime | None] | None = None,
+    ) -> None:
+        """
+        record() for local files sent as one stack; each file keeps the span
+        of the whole stack, the first one its counts.
+        """
+        entries = [local_entry(path) for path in files]
+        stack = entries[0][0] if len(entries) > 1 else None
+        for index, entry in enumerate(entries):
+            self.record(entry, job, counts, span, stack, index == 0)
+
+    def forget_job(self, job: str) -> int:
+        with self._lock, self._db:
+            return self._db.execute(
+                "DELETE FROM ingested WHERE job = ?", (job,)
+            ).rowcount
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT job, COUNT(*), SUM(samples) FROM ingested GROUP BY job"
+            ).fetchall()
+        return {
+            job: {"files": files, "samples": samples or 0}
+            for job, files, samples in rows
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_ledger: IngestLedger | None = None
+_ledger_enabled = INGEST_LEDGER_ENABLED
+_ledger_lock = Lock()
+
+
+def configure_ledger(
+    path: Path | str | None = None, enabled: bool = True
+) -> None:
+    """
+    Turn the process-wide ingest ledger on (optionally at another path) or
+    off.
+    """
+    global _ledger, _ledger_enabled
+    with _ledger_lock:
+        if _ledger is not None:
+            _ledger.close()
+        _ledger_enabled = enabled
+        _ledger = IngestLedger(Path(path)) if enabled and path else None
+
+
+def get_ledger() -> IngestLedger | None:
+    global _ledger
+    with _ledger_lock:
+        if not _ledger_enabled:
+            return None
+        if _ledger is None:
+            _ledger = IngestLedger()
+        return _ledger
+
+
+def format_ledger_summary() -> str:
+    """
+    One-line ledger summary for the run totals, empty when the ledger is off.
+    """
+    ledger = _ledger
+    if ledger is None or not _ledger_enabled:
+        return ""
+    summary = (
+        f"{ledger.skipped} files skipped "
+        f"({convert_to_eng(ledger.skipped_samples)} samples), "
+        f"{ledger.recorded} recorded"
+    )
+    if ledger.stale:
+        summary += f", {ledger.stale} re-sent after a file or DBC change"
+    if ledger.held_back:
+        summary += f", {ledger.held_back} not recorded after failed batches"
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the ingest ledger.")
+    parser.add_argument("--path", type=Path, default=INGEST_LEDGER_PATH)
+    parser.add_argument(
+        "--forget-job",
+        type=str,
+        default=None,
+        help="Drop every entry of this job, so its files are sent again.",
+    )
+    parser.add_argument("--stats", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    ledger = IngestLedger(args.path)
+    if args.forget_job:
+        removed = ledger.forget_job(args.forget_job)
+        logging.info(f"🗑️ Forgot {removed} files of job {args.forget_job}")
+    if args.stats or not args.forget_job:
+        for job, stats in sorted(ledger.stats().items()):
+            logging.info(
+                f"📒 {job}: {stats['files']} files "
+                f"({convert_to_eng(stats['samples'])} samples)"
+            )
+    ledger.close()
@@ -9,6 +9,8 @@ from can import Message
 if __name__ == "__main__":
     sys.path.append(str(Path(__file__).parent.parent.parent))
 
+from decoder.dbc_cache import load_cantools_database
+
 
 class DBCDecoder:
     def __init__(self, dbc_paths: List[str]):
@@ -17,17 +19,16 @@ class DBCDecoder:
 
     def _load_dbc_files(self, dbc_paths: List[str]) -> cantools.database.Database:
         """Load and merge multiple DBC files into single database"""
-        db = cantools.db.Database()
-
-        for path in dbc_paths:
-            try:
-                db.add_dbc_file(path)
-                self.logger.info(f"Successfully loaded DBC file: {path}")
-            except Exception as e:
-                self.logger.error(f"Failed to load DBC file {path}: {str(e)}")
-                raise
-
-        return db
+        try:
+            return load_cantools_database(
+                dbc_paths,
+                on_loaded=lambda path: self.logger.info(
+                    f"Successfully loaded DBC file: {path}"
+                ),
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to load DBC files {dbc_paths}: {str(e)}")
+            raise
 
     def decode_message(self, msg: Message) -> Optional[Dict]:
         """
@@ -1,6 +1,5 @@
 import sys
 import logging
-import requests
 from pathlib import Path
 
 if __name__ == "__main__":
@@ -8,6 +7,8 @@ if __name__ == "__main__":
 
 from decoder.config import *
 from decoder.utils import *
+from decoder.compression import compress_request_body
+from decoder.vm_client import get_vm_client
 from decoder.livelogger.DBCDecoder import DBCDecoder
 from decoder.livelogger.CANReader import CANReader
 
@@ -32,6 +33,7 @@ def livestream(server: str):
             logger.error("Failed to initialize CAN interface")
             return
 
+        vm_client = get_vm_client(server, pool_size=1)
         logger.info("Starting CAN monitoring...")
         while True:
             try:
@@ -44,9 +46,9 @@ def livestream(server: str):
                 message = message_data["message"]
                 decoded_signals = message_data["decoded_signals"]
                 if message:
-                    for signal in decoded_signals.keys():
-                        value, unit = decoded_signals[signal]
-                        data = make_metric_line(
+                    # One request per decoded message instead of per signal.
+                    data = "".join(
+                        make_metric_line(
                             message.name,
                             signal,
                             unit,
@@ -54,12 +56,19 @@ def livestream(server: str):
                             timestamp,
                             job="d65_livestream",
                         )
-                        try:
-                            requests.post(
-                                server + vmapi_import_prometheus, data="".join(data)
-                            )
-                        except Exception as e:
-                            logging.error(f"\n ‼️ Error sending data: {e}")
+                        for signal, (value, unit) in decoded_signals.items()
+                    )
+                    if not data:
+                        continue
+                    try:
+                        body, headers = compress_request_body(data, "prometheus")
+                        vm_client.post(
+                            vmapi_import_prometheus,
+                            data=body,
+                            headers=headers,
+                        )
+                    except Exception as e:
+                        logging.error(f"\n ‼️ Error sending data: {e}")
 
             except KeyboardInterrupt:  # Shutting down properly
                 break
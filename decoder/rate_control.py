@@ -0,0 +1,200 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+from threading import Condition, Lock
+from typing import Literal
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from decoder.config import (
+    VM_RATE_DECREASE_FACTOR,
+    VM_RATE_INITIAL_WINDOW,
+    VM_RATE_MAX_BACKOFF,
+    VM_RATE_MAX_WINDOW,
+    VM_RATE_MIN_BATCH_FRACTION,
+    VM_RATE_MIN_WINDOW,
+    VM_RATE_TARGET_LATENCY,
+)
+
+Outcome = Literal["ok", "slow", "throttled", "error", "rejected"]
+
+
+def classify_status(status_code: int) -> Outcome:
+    """
+    Map an import response status to a controller outcome: 2xx is ok,
+    429/503 is throttling, other 5xx an error, other 4xx a rejected request
+    that says nothing about server load.
+    """
+    if 200 <= status_code < 300:
+        return "ok"
+    if status_code in (429, 503):
+        return "throttled"
+    if status_code >= 500:
+        return "error"
+    return "rejected"
+
+
+class AIMDController:
+    """
+    Additive-increase/multiplicative-decrease limit on in-flight VM import
+    requests and on batch size.
+
+    Every answer within target_latency grows the window by 1/window (about
+    one request per round trip) and the batch fraction by a small step. Slow
+    answers, 429/5xx and timeouts multiply both by decrease_factor, at most
+    once per target_latency so a burst of failures from one overload only
+    counts once. Thread-safe; async callers use acquire_async().
+    """
+
+    def __init__(
+        self,
+        initial_window: float = VM_RATE_INITIAL_WINDOW,
+        min_window: float = VM_RATE_MIN_WINDOW,
+        max_window: float = VM_RATE_MAX_WINDOW,
+        target_latency: float = VM_RATE_TARGET_LATENCY,
+        decrease_factor: float = VM_RATE_DECREASE_FACTOR,
+        min_batch_fraction: float = VM_RATE_MIN_BATCH_FRACTION,
+        max_backoff: float = VM_RATE_MAX_BACKOFF,
+    ):
+        self.min_window = max(1.0, float(min_window))
+        self.max_window = max(self.min_window, float(max_window))
+        self.window = min(max(float(initial_window), self.min_window), self.max_window)
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.min_batch_fraction = min_batch_fraction
+        self.max_backoff = max_backoff
+        self.batch_fraction = 1.0
+        self.in_flight = 0
+
+        self.counts: dict[str, int] = {
+            "ok": 0,
+            "slow": 0,
+            "throttled": 0,
+            "error": 0,
+            "rejected": 0,
+        }
+        self.latency_ewma = 0.0
+        self.min_window_seen = self.window
+        self._last_decrease = 0.0
+        self._lock = Lock()
+        self._slot_freed = Condition(self._lock)
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < max(1, int(self.window))
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if not self._has_slot():
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """
+        Block until the window has room for one more request.
+        """
+        with self._slot_freed:
+            if not self._slot_freed.wait_for(self._has_slot, timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    async def acquire_async(self, poll_interval: float = 0.005) -> None:
+        # Slots are freed from other threads too, so poll instead of relying
+        # on an event bound to one loop.
+        while not self.try_acquire():
+            await asyncio.sleep(poll_interval)
+
+    def release(self, latency: float, outcome: Outcome) -> None:
+        """
+        Return a slot and adjust the window from the request's result.
+        """
+        if outcome == "ok" and latency > self.target_latency:
+            outcome = "slow"
+        with self._slot_freed:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.counts[outcome] += 1
+            self.latency_ewma = (
+                latency
+                if self.latency_ewma == 0.0
+                else 0.8 * self.latency_ewma + 0.2 * latency
+            )
+            if outcome == "ok":
+                self.window = min(self.window + 1.0 / self.window, self.max_window)
+                self.batch_fraction = min(self.batch_fraction + 0.01, 1.0)
+            elif outcome != "rejected":
+                now = time.monotonic()
+                if now - self._last_decrease >= self.target_latency:
+                    self._last_decrease = now
+                    self.window = max(
+                        self.window * self.decrease_factor, self.min_window
+                    )
+                    self.batch_fraction = max(
+                        self.batch_fraction * self.decrease_factor,
+                        self.min_batch_fraction,
+                    )
+                    self.min_window_seen = min(self.min_window_seen, self.window)
+            self._slot_freed.notify_all()
+
+    def batch_size(self, requested: int) -> int:
+        """
+        Scale a caller's batch size by the current batch fraction.
+        """
+        with self._lock:
+            return max(1, int(requested * self.batch_fraction))
+
+    def retry_delay(self, retries: int) -> float:
+        return min(2.0**retries, self.max_backoff)
+
+    def snapshot(self) -> dict[str, float]:
+        """
+        Current window and counters, for monitoring.
+        """
+        with self._lock:
+            return {
+                "window": self.window,
+                "min_window_seen": self.min_window_seen,
+                "in_flight": self.in_flight,
+                "batch_fraction": self.batch_fraction,
+                "latency_ewma": self.latency_ewma,
+                **{f"{key}_requests": value for key, value in self.counts.items()},
+            }
+
+
+_controller: AIMDController | None = None
+_controller_lock = Lock()
+
+
+def get_rate_controller() -> AIMDController:
+    """
+    The process-wide controller shared by all VM import senders.
+    """
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AIMDController()
+        return _controller
+
+
+def format_rate_control_summary() -> str:
+    """
+    One-line window summary for the run totals, empty when nothing was sent.
+    """
+    stats = get_rate_controller().snapshot()
+    total = sum(
+        stats[f"{key}_requests"]
+        for key in ("ok", "slow", "throttled", "error", "rejected")
+    )
+    if not total:
+        return ""
+    return (
+        f"window {stats['window']:.1f} (low {stats['min_window_seen']:.1f}), "
+        f"batch {100.0 * stats['batch_fraction']:.0f}%, "
+        f"latency ~{stats['latency_ewma']:.3f}s, "
+        f"{int(stats['slow_requests'])} slow / "
+        f"{int(stats['throttled_requests'])} throttled / "
+        f"{int(stats['error_requests'])} failed of {int(total)} requests"
+    )
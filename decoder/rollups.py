@@ -0,0 +1,184 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+from collections.abc import Iterable, Iterator
+from threading import Lock
+from typing import Any
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from decoder.config import VM_ROLLUP_AGGREGATES, VM_ROLLUP_RESOLUTIONS
+from decoder.utils import convert_to_eng, iter_vm_json_series_chunks
+
+_rollups_enabled = False
+_resolutions: dict[str, int] = dict(VM_ROLLUP_RESOLUTIONS)
+_aggregates: tuple[str, ...] = tuple(VM_ROLLUP_AGGREGATES)
+_stats_lock = Lock()
+_stats = {
+    "signals": 0,
+    "samples_in": 0,
+    "series": 0,
+    "samples_out": 0,
+    "edge_buckets": 0,
+}
+
+
+def configure_rollups(
+    enabled: bool = True,
+    resolutions: dict[str, int] | None = None,
+    aggregates: Iterable[str] | None = None,
+) -> None:
+    """
+    Default for send_decoded(rollups=None). resolutions maps a label ("1m")
+    to a bucket width in ms; aggregates is a subset of min/max/avg/last.
+    """
+    global _rollups_enabled, _resolutions, _aggregates
+    _rollups_enabled = enabled
+    if resolutions is not None:
+        _resolutions = dict(resolutions)
+    if aggregates is not None:
+        unknown = set(aggregates) - set(VM_ROLLUP_AGGREGATES)
+        if unknown:
+            raise ValueError(f"Unknown rollup aggregates: {sorted(unknown)}")
+        _aggregates = tuple(aggregates)
+
+
+def rollups_enabled() -> bool:
+    return _rollups_enabled
+
+
+def compute_rollups(
+    values: Any, timestamps_in_ms: Any, resolution_ms: int
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    Bucket one series into resolution_ms wide windows.
+    Returns (bucket start timestamps in ms, {aggregate: values}) with
+    min/max/avg/last per non-empty bucket, computed with ufunc.reduceat.
+    Timestamps must be sorted.
+    """
+    _values = np.asarray(values, dtype=np.float64)
+    _timestamps = np.asarray(timestamps_in_ms, dtype=np.int64)
+    if len(_values) == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return np.empty(0, dtype=np.int64), {
+            "min": empty,
+            "max": empty,
+            "avg": empty,
+            "last": empty,
+        }
+
+    buckets = _timestamps // resolution_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(_values)]
+    return buckets[starts] * resolution_ms, {
+        "min": np.minimum.reduceat(_values, starts),
+        "max": np.maximum.reduceat(_values, starts),
+        "avg": np.add.reduceat(_values, starts) / (ends - starts),
+        "last": _values[ends - 1],
+    }
+
+
+def complete_buckets(
+    bucket_ts: np.ndarray,
+    resolution_ms: int,
+    span_ms: tuple[int, int],
+    period_ms: float,
+) -> np.ndarray:
+    """
+    Mask of the buckets that lie inside span_ms (first, last sample time of
+    the decoded file) to within one sample period. The others were cut by
+    the file boundary: the neighbouring file holds the rest of their samples.
+    """
+    return (bucket_ts >= span_ms[0] - period_ms) & (
+        bucket_ts + resolution_ms <= span_ms[1] + period_ms
+    )
+
+
+def iter_rollup_chunks(
+    metric_name: str,
+    message: str,
+    unit: str,
+    values: np.ndarray,
+    timestamps_in_ms: np.ndarray,
+    job: str,
+    batch_size: int = 10_000,
+    span_ms: tuple[int, int] | None = None,
+) -> Iterator[tuple[bytes, int]]:
+    """
+    JSON line batches of every configured rollup series of one signal.
+    Batches yield a sample count of 0 so they never add to the raw
+    per-signal counts; rollup samples are tracked in the rollup stats.
+    With span_ms, buckets cut by the file boundary are skipped instead of
+    being written from part of their samples (and again by the next file).
+    """
+    if len(values) == 0:
+        return
+    with _stats_lock:
+        _stats["signals"] += 1
+        _stats["samples_in"] += len(values)
+    period_ms = (
+        float(np.median(np.diff(timestamps_in_ms)))
+        if len(timestamps_in_ms) > 1
+        else 0.0
+    )
+
+    for resolution, resolution_ms in _resolutions.items():
+        bucket_ts, aggregates = compute_rollups(
+            values, timestamps_in_ms, resolution_ms
+        )
+        if span_ms is not None:
+            complete = complete_buckets(
+                bucket_ts, resolution_ms, span_ms, period_ms
+            )
+            if not complete.all():
+                with _stats_lock:
+                    _stats["edge_buckets"] += int((~complete).sum())
+                bucket_ts = bucket_ts[complete]
+                aggregates = {
+                    name: series[complete] for name, series in aggregates.items()
+                }
+        if len(bucket_ts) == 0:
+            continue
+        for aggregate in _aggregates:
+            labels = {
+                "__name__": f"{metric_name}:{resolution}_{aggregate}",
+                "job": job.replace(" ", "_"),
+                "rollup": resolution,
+                "rollup_message": message,
+                "unit": unit,
+            }
+            for chunk, count in iter_vm_json_series_chunks(
+                labels, aggregates[aggregate], bucket_ts, batch_size
+            ):
+                with _stats_lock:
+                    _stats["samples_out"] += count
+                yield chunk, 0
+            with _stats_lock:
+                _stats["series"] += 1
+
+
+def get_rollup_stats() -> dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def format_rollup_summary() -> str:
+    """
+    One-line rollup summary for the run totals, empty when rollups were off.
+    """
+    stats = get_rollup_stats()
+    if not stats["signals"]:
+        return ""
+    return (
+        f"{stats['series']} series with {convert_to_eng(stats['samples_out'])} "
+        f"samples from {convert_to_eng(stats['samples_in'])} raw samples of "
+        f"{stats['signals']} signals "
+        f"({stats['samples_in'] / max(stats['samples_out'], 1):.1f}x smaller)"
+        + (
+            f", {stats['edge_buckets']} buckets cut by file boundaries skipped"
+            if stats["edge_buckets"]
+            else ""
+        )
+    )
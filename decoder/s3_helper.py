@@ -365,6 +365,7 @@ def get_mf4_files_list_from_s3(
                         "Key": key,
                         "LastModified": last_modified,
                         "Size": obj["Size"],
+                        "ETag": obj.get("ETag", "").strip('"'),
                         "Timestamp": timestamp,
                     }
             return {}
@@ -0,0 +1,277 @@
+import io
+import sys
+import time
+import queue
+import logging
+import tempfile
+from pathlib import Path
+
+from collections.abc import Callable, Iterable, Iterator
+from threading import Event, Lock, Semaphore, Thread
+from typing import Any, Literal, NamedTuple
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from asammdf import MDF
+
+from decoder.config import (
+    LOG_FORMAT,
+    S3_PIPELINE_DECODE_WORKERS,
+    S3_PIPELINE_DOWNLOAD_WORKERS,
+    S3_PIPELINE_SEND_WORKERS,
+    S3_STREAMING_MAX_ACTIVE_FILES,
+)
+from decoder.s3_helper import (
+    EESBuckets,
+    download_file_bytes_from_s3,
+    download_file_to_path_from_s3,
+)
+from decoder.utils import setup_simple_logger
+
+STAGES = ("download", "decode", "send")
+
+MdfSource = bytes | Path
+
+
+class PipelineResult(NamedTuple):
+    index: int
+    item: Any
+    value: Any
+    ok: bool
+    started: float
+
+
+class _Task:
+    __slots__ = ("index", "item", "value", "ok", "started")
+
+    def __init__(self, index: int, item: Any):
+        self.index = index
+        self.item = item
+        self.value: Any = None
+        self.ok = True
+        self.started = time.time()
+
+
+_DONE = object()
+
+
+class S3StreamingPipeline:
+    """
+    Overlaps download -> decode -> send of S3 objects.
+
+    Each stage has its own worker threads, connected by bounded queues, so one
+    file can be downloading while the previous one decodes and an older one
+    is sent. At most max_active_files items are in the pipeline at once (from
+    the start of their download until their result was taken by run()).
+
+    Stage functions: download(item) -> raw, decode(item, raw) -> decoded,
+    send(item, decoded) -> value. A stage returning None or raising marks the
+    item as failed and it skips the remaining stages. decode owns the raw
+    download; raws that never reach it (early stop) go to discard(raw).
+    """
+
+    def __init__(
+        self,
+        download: Callable[[Any], Any],
+        decode: Callable[[Any, Any], Any],
+        send: Callable[[Any, Any], Any],
+        max_active_files: int = S3_STREAMING_MAX_ACTIVE_FILES,
+        download_workers: int = S3_PIPELINE_DOWNLOAD_WORKERS,
+        decode_workers: int = S3_PIPELINE_DECODE_WORKERS,
+        send_workers: int = S3_PIPELINE_SEND_WORKERS,
+        discard: Callable[[Any], None] | None = None,
+        label: Callable[[Any], str] = str,
+    ):
+        self.stages = (
+            ("download", lambda item, _: download(item), download_workers),
+            ("decode", decode, decode_workers),
+            ("send", send, send_workers),
+        )
+        self.max_active_files = max(1, max_active_files)
+        self.discard = discard
+        self.label = label
+        self.logger = logging.getLogger(self.__class__.__name__)
+        setup_simple_logger(self.logger, format=LOG_FORMAT)
+
+        self.busy = {stage: 0.0 for stage in STAGES}
+        self.failed = {stage: 0 for stage in STAGES}
+        self.wall = 0.0
+        self._lock = Lock()
+        self._stop = Event()
+
+    def _worker(
+        self,
+        stage: str,
+        fn: Callable[[Any, Any], Any],
+        inbox: queue.Queue,
+        outbox: queue.Queue,
+        alive: list[int],
+    ) -> None:
+        while True:
+            task = inbox.get()
+            if task is _DONE:
+                # Wake the sibling workers, the last one closes the next stage.
+                inbox.put(_DONE)
+                with self._lock:
+                    alive[0] -= 1
+                    last = alive[0] == 0
+                if last:
+                    outbox.put(_DONE)
+                return
+
+            if task.ok and not self._stop.is_set():
+                start = time.time()
+                try:
+                    value = fn(task.item, task.value)
+                except Exception as e:
+                    self.logger.error(
+                        f"❌ {self.label(task.item)}: {stage} failed: {e}"
+                    )
+                    value = None
+                with self._lock:
+                    self.busy[stage] += time.time() - start
+                    if value is None:
+                        self.failed[stage] += 1
+                task.ok = value is not None
+                task.value = value
+            else:
+                # Stopped before decode: the raw download is never consumed.
+                if (
+                    stage == "decode"
+                    and task.value is not None
+                    and self.discard is not None
+                ):
+                    self.discard(task.value)
+                task.ok = False
+                task.value = None
+            outbox.put(task)
+
+    def _feed(
+        self, items: Iterable[Any], inbox: queue.Queue, slots: Semaphore
+    ) -> None:
+        try:
+            for index, item in enumerate(items):
+                while not slots.acquire(timeout=0.25):
+                    if self._stop.is_set():
+                        return
+                if self._stop.is_set():
+                    return
+                inbox.put(_Task(index, item))
+        finally:
+            inbox.put(_DONE)
+
+    def run(self, items: Iterable[Any]) -> Iterator[PipelineResult]:
+        """
+        Push items through the stages and yield a PipelineResult per item,
+        in completion order. Closing the iterator early stops the pipeline
+        after the files already in a stage.
+        """
+        start = time.time()
+        self._stop.clear()
+        slots = Semaphore(self.max_active_files)
+        queues: list[queue.Queue] = [
+            queue.Queue(maxsize=self.max_active_files) for _ in self.stages
+        ]
+        results: queue.Queue = queue.Queue()
+        outboxes = queues[1:] + [results]
+
+        threads = [
+            Thread(
+                target=self._feed,
+                args=(items, queues[0], slots),
+                name="s3-pipeline-feed",
+                daemon=True,
+            )
+        ]
+        for (stage, fn, workers), inbox, outbox in zip(
+            self.stages, queues, outboxes
+        ):
+            workers = max(1, workers)
+            alive = [workers]
+            threads += [
+                Thread(
+                    target=self._worker,
+                    args=(stage, fn, inbox, outbox, alive),
+                    name=f"s3-pipeline-{stage}-{n}",
+                    daemon=True,
+                )
+                for n in range(workers)
+            ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                task = results.get()
+                if task is _DONE:
+                    break
+                slots.release()
+                yield PipelineResult(
+                    index=task.index,
+                    item=task.item,
+                    value=task.value,
+                    ok=task.ok,
+                    started=task.started,
+                )
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self.wall += time.time() - start
+
+    def format_summary(self) -> str:
+        """
+        One-line stage utilisation summary for the run totals.
+        """
+        if not self.wall:
+            return ""
+        workers = "/".join(str(max(1, w)) for _, _, w in self.stages)
+        busy = " | ".join(
+            f"{stage} {self.busy[stage]:.1f}s" for stage in STAGES
+        )
+        failed = sum(self.failed.values())
+        return (
+            f"{busy} busy over {self.wall:.1f}s wall "
+            f"({workers} workers, <= {self.max_active_files} files in flight"
+            + (f", {failed} failed" if failed else "")
+            + ")"
+        )
+
+
+def download_s3_mdf_source(
+    bucket_name: EESBuckets | str,
+    key: str,
+    strategy: Literal["memory", "tempfile"],
+    s3_client=None,
+) -> MdfSource | None:
+    """
+    Download one MF4 object for the pipeline: its bytes for the memory
+    strategy, or the path of a temp file for the tempfile strategy.
+    """
+    if strategy == "memory":
+        return download_file_bytes_from_s3(
+            bucket_name=bucket_name, key=key, s3_client=s3_client
+        )
+
+    with tempfile.NamedTemporaryFile(suffix=".mf4", delete=False) as tmp_file:
+        tmp_path = Path(tmp_file.name)
+    ok = download_file_to_path_from_s3(
+        bucket_name=bucket_name,
+        key=key,
+        local_path=tmp_path,
+        s3_client=s3_client,
+    )
+    if not ok:
+        discard_mdf_source(tmp_path)
+        return None
+    return tmp_path
+
+
+def open_mdf_source(source: MdfSource) -> MDF:
+    return MDF(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def discard_mdf_source(source: MdfSource) -> None:
+    if isinstance(source, Path) and source.exists():
+        source.unlink()
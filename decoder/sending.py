@@ -1,28 +1,87 @@
+import copy
 import time
 import json
+import asyncio
+import itertools
 import os
+import re
 import sys
 import logging
 from pathlib import Path
 
 import requests
+import numpy as np
 from asammdf import MDF, Signal
 from asammdf.blocks.types import DbcFileType, BusType
+from canmatrix import CanMatrix
 from datetime import datetime, timedelta
-from collections.abc import Iterable
-from typing import Sequence, Callable, Optional, Any, cast
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import partial
+from collections.abc import Iterable, Iterator
+from typing import (
+    Sequence,
+    Callable,
+    Optional,
+    Any,
+    Literal,
+    Protocol,
+    cast,
+    runtime_checkable,
+)
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
 
 if __name__ == "__main__":
     sys.path.append(str(Path(__file__).parent.parent))
 
 from decoder.config import *
 from decoder.utils import *
+from decoder.compression import compress_request_body, iter_compressed_chunks
+from decoder.coalescer import ImportCoalescer, coalesce_enabled
+from decoder.vm_client import (
+    AsyncVMClient,
+    ImportRejected,
+    _extend_no_proxy,
+    get_vm_client,
+)
+from decoder.rate_control import get_rate_controller
+from decoder.spool import spool_failed_batch
+from decoder.deadband import apply_deadband_mask, has_deadband_rule
+from decoder.backfill import BackfillPlan, backfill_step, plan_backfill
+from decoder.rollups import iter_rollup_chunks, rollups_enabled
+from decoder.dbc_cache import SignalRules, load_bus_database, prune_can_matrix
 from decoder.livelogger.CANReader import CANReader
 from decoder.livelogger.DBCDecoder import DBCDecoder
 
 
-def normalize_dbc_entries(entries: Iterable[DbcFileType | Any]) -> list[DbcFileType]:
+def _load_cached_dbc(source: Any, rules: SignalRules | None = None) -> Any:
+    # DBC paths become the CanMatrix extract_bus_logging() would parse,
+    # loaded from the DBC cache; in-memory CanMatrix entries are pruned on a
+    # copy, anything else is passed on unchanged.
+    if not isinstance(source, (str, os.PathLike)):
+        if rules and isinstance(source, CanMatrix):
+            return prune_can_matrix(copy.deepcopy(source), rules)
+        return source
+    try:
+        return load_bus_database(source, rules) or source
+    except Exception as e:
+        logging.getLogger("dbc_cache").debug(f"  🗃️ Not caching {source}: {e}")
+        return source
+
+
+def normalize_dbc_entries(
+    entries: Iterable[DbcFileType | Any], rules: SignalRules | None = None
+) -> list[DbcFileType]:
+    """
+    (database, bus channel) entries for extract_bus_logging(). With rules,
+    the databases are pruned before decoding; pass rules.skips as the
+    skip_signal_fn too, for the multiplexors that have to stay.
+    """
     normalized: list[DbcFileType] = []
     for entry in entries:
         if (
@@ -30,40 +89,12 @@ def normalize_dbc_entries(entries: Iterable[DbcFileType | Any]) -> list[DbcFileT
             and len(entry) == 2
             and isinstance(entry[1], int)
         ):
-            normalized.append(cast(DbcFileType, entry))
+            normalized.append((_load_cached_dbc(entry[0], rules), entry[1]))
         else:
-            normalized.append((cast(Any, entry), 0))
+            normalized.append((_load_cached_dbc(entry, rules), 0))
     return normalized
 
 
-def _extend_no_proxy(entries: list[str]) -> None:
-    # Preserve existing NO_PROXY/no_proxy values and append entries needed for local/tailnet VM access.
-    existing_raw = (
-        os.environ.get("NO_PROXY") or os.environ.get("no_proxy") or ""
-    )
-    existing = [e.strip() for e in existing_raw.split(",") if e.strip()]
-    merged: list[str] = []
-
-    for value in [*existing, *entries]:
-        if value and value not in merged:
-            merged.append(value)
-
-    no_proxy_value = ",".join(merged)
-    os.environ["NO_PROXY"] = no_proxy_value
-    os.environ["no_proxy"] = no_proxy_value
-
-
-_extend_no_proxy(
-    [
-        "localhost",
-        "127.0.0.1",
-        "::1",
-        ".ts.net",
-        ".tailnet",
-    ]
-)
-
-
 def get_mf4_files(
     directory: Path | str,
     start_date: datetime | None = None,
@@ -122,102 +153,218 @@ def is_valid_sample(sample):
         return False
 
 
+def _valid_signal_samples(signal: Signal) -> tuple[np.ndarray, np.ndarray]:
+    # (float64 values, offsets) of the numeric, non-NaN samples.
+    samples = np.asarray(signal.samples)
+    offsets = np.asarray(signal.timestamps, dtype=np.float64)
+
+    if samples.ndim == 1 and samples.dtype.kind in "biuf":
+        values = samples.astype(np.float64, copy=False)
+        valid = ~np.isnan(values)
+    else:
+        # Object/string/structured samples: fall back to per-sample checks.
+        valid = np.fromiter(
+            (is_valid_sample(sample) for sample in samples),
+            dtype=bool,
+            count=len(samples),
+        )
+        values = np.array(
+            [float(sample) if ok else np.nan for sample, ok in zip(samples, valid)],
+            dtype=np.float64,
+        )
+        valid &= ~np.isnan(values)
+
+    if not valid.all():
+        values = values[valid]
+        offsets = offsets[valid]
+    return values, offsets
+
+
+def signal_to_vm_arrays(
+    signal: Signal, start_time: datetime
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized numeric filter + timestamp conversion for one signal.
+    Returns (values as float64, timestamps as int64 epoch ms), keeping only
+    samples that are numeric and not NaN.
+    """
+    values, offsets = _valid_signal_samples(signal)
+    return values, offsets_to_epoch_ms(start_time, offsets)
+
+
 def check_signal_range(
     signal: Signal, start_time: datetime, server: str
 ) -> Signal | None:
     """
     Checks if the signal timestamps already exist in the database, returns a Signal object only with timestamps not already there,
+    i.e. the samples before and after the range VictoriaMetrics already covers (see utils.get_vm_series_coverage()).
     """
 
     logger = logging.getLogger("check_signal_range")
     setup_simple_logger(logger, format=LOG_FORMAT)
 
-    # Query VictoriaMetrics to check if data for this signal exists in the given time range
+    # Ask VictoriaMetrics where data for this signal already starts and ends
+    # in the signal's time range, without exporting the samples.
     message, metric_name = get_channel_data(signal)
-    start_ts = (
-        start_time + timedelta(seconds=signal.timestamps[0])
-    ).timestamp()
-    end_ts = (start_time + timedelta(seconds=signal.timestamps[-1])).timestamp()
-
-    params: dict[str, str] = {
-        "match[]": f'{metric_name}{{message="{message}"}}',
-        "start": str(start_ts),
-        "end": str(end_ts),
-        "step": "1s",
-    }
+    timestamps = np.asarray(signal.timestamps, dtype=np.float64)
+    if len(timestamps) == 0:
+        return None
+    epoch_s = offsets_to_epoch_seconds(start_time, timestamps[[0, -1]])
     try:
-        resp = requests.get(server + vmapi_export, params=params, timeout=10)
-        if resp.status_code != 200:
-            return signal
-        elif resp.text == "":
-            return signal
-        else:
-            # Data exists for this signal in the range
-            # Cut the data that already exists
-            _json = json.loads(resp.text)
-            respstart_ts = datetime.fromtimestamp(
-                1e-3 * _json["timestamps"][0], tz=start_time.tzinfo
-            )
-            respend_ts = datetime.fromtimestamp(
-                1e-3 * _json["timestamps"][-1], tz=start_time.tzinfo
-            )
-
-            cutstart = (respstart_ts - start_time).total_seconds()
-            cutend = (respend_ts - start_time).total_seconds()
-
-            eps = 1e-3  # Adjusts for precision, acceptable to lose 1ms of data
-            older_data = signal.cut(signal.timestamps[0] + eps, cutstart - eps)
-            newer_data = signal.cut(cutend + eps, signal.timestamps[-1] - eps)
-
-            newsig = older_data.extend(newer_data)
-            return newsig if len(newsig.timestamps) > 0 else None
+        coverage = get_vm_series_coverage(
+            server,
+            metric_name=metric_name,
+            start=float(epoch_s[0]),
+            end=float(epoch_s[1]),
+            label_filters={"message": message},
+        )
     except Exception as e:
         logger.warning(
             f"⚠️ Warning: Could not check Signal range for {metric_name}: {e}"
         )
-    return signal
+        return signal
+    if coverage is None:
+        return signal
+
+    # Keep what lies before and after the covered range.
+    eps = 1e-3  # Adjusts for precision, acceptable to lose 1ms of data
+    start_s = start_time.timestamp()
+    cutstart = coverage[0] - start_s
+    cutend = coverage[1] - start_s
+    before = int(np.searchsorted(timestamps, cutstart - eps, side="left"))
+    after = int(np.searchsorted(timestamps, cutend + eps, side="right"))
+    if before == 0 and after == len(timestamps):
+        return None
+    if after <= before:
+        return signal
+    return _select_samples(signal, np.r_[0:before, after : len(timestamps)])
+
+
+def _select_samples(signal: Signal, index: np.ndarray) -> Signal:
+    # The samples at index (positions or a boolean mask) as a new Signal.
+    return Signal(
+        samples=np.asarray(signal.samples)[index],
+        timestamps=np.asarray(signal.timestamps)[index],
+        name=signal.name,
+        unit=signal.unit,
+        display_names=signal.display_names,
+        comment=signal.comment,
+    )
+
+
+class SeriesWatermarks:
+    """
+    Newest timestamp already in VictoriaMetrics for every series of a job,
+    fetched with one grouped query (utils.get_vm_series_watermarks()).
+    Each signal is trimmed against its own series, so series lagging behind
+    the job's newest data are neither cut short nor re-sent in full.
+    """
+
+    def __init__(self, series: dict[tuple[str, str], datetime]):
+        self.series = series
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def for_signal(self, signal: Signal) -> datetime | None:
+        """
+        Watermark of the signal's series, None when VM has none of its data.
+        """
+        message, metric_name = get_channel_data(signal)
+        return self.series.get((metric_name, message))
+
+
+# A job-wide watermark, one per series, or a gap backfill plan.
+JobWatermark = datetime | SeriesWatermarks | BackfillPlan
 
 
 def _resolve_job_watermark(
-    server: str, job: str, skip_signal_range_check: bool
-) -> datetime | None:
+    server: str,
+    job: str,
+    skip_signal_range_check: bool,
+    device: str | None = None,
+    span: tuple[datetime, datetime] | None = None,
+) -> datetime | SeriesWatermarks | None:
     if skip_signal_range_check or not job:
         return None
 
-    result = get_latest_vm_job_timestamp(server=server, job=job)
-    watermark = result.get("timestamp")
-    if result.get("has_data") and isinstance(watermark, datetime):
-        return watermark
+    if device is not None and span is not None:
+        # Everything of the device up to its ingest watermark was sent (see
+        # IngestWatermark), so only a file straddling it needs a series scan:
+        # one ending before it is skipped, one starting after it is new.
+        result = get_vm_ingest_watermark(server=server, job=job, device=device)
+        if result.get("has_data"):
+            watermark = result["timestamp"]
+            if span[1] <= watermark:
+                logging.getLogger("send_decoded").debug(
+                    f"  🔖 {job}: file ends before the ingest watermark {watermark.isoformat()}"
+                )
+                return watermark
+            if span[0] >= watermark:
+                logging.getLogger("send_decoded").debug(
+                    f"  🔖 {job}: file starts after the ingest watermark {watermark.isoformat()}"
+                )
+                return watermark
+
+    result = get_vm_series_watermarks(server=server, job=job)
+    if "error" in result:
+        logging.getLogger("send_decoded").warning(
+            f"⚠️ Could not fetch the watermarks of job {job}: {result['error']}"
+        )
+    if result.get("has_data"):
+        logging.getLogger("send_decoded").debug(
+            f"  🔖 {job}: watermarks of {len(result['watermarks'])} series"
+        )
+        return SeriesWatermarks(result["watermarks"])
     return None
 
 
+def _signal_watermark(
+    signal: Signal, job_watermark: JobWatermark | None
+) -> datetime | None:
+    if isinstance(job_watermark, SeriesWatermarks):
+        return job_watermark.for_signal(signal)
+    if isinstance(job_watermark, BackfillPlan):
+        return None
+    return job_watermark
+
+
 def _apply_job_watermark(
     signal: Signal,
     start_time: datetime,
-    job_watermark: datetime | None,
+    job_watermark: JobWatermark | None,
 ) -> Signal | None:
-    if job_watermark is None or len(signal.timestamps) == 0:
+    if isinstance(job_watermark, BackfillPlan):
+        if len(signal.timestamps) == 0:
+            return signal
+        message, metric_name = get_channel_data(signal)
+        keep = job_watermark.keep_mask(
+            metric_name,
+            message,
+            offsets_to_epoch_seconds(start_time, signal.timestamps),
+        )
+        if keep is None or keep.all():
+            return signal
+        return _select_samples(signal, keep) if keep.any() else None
+
+    watermark = _signal_watermark(signal, job_watermark)
+    if watermark is None or len(signal.timestamps) == 0:
         return signal
 
     signal_start = start_time + timedelta(seconds=signal.timestamps[0])
     signal_end = start_time + timedelta(seconds=signal.timestamps[-1])
 
-    if signal_end <= job_watermark:
+    if signal_end <= watermark:
         return None
 
-    if signal_start >= job_watermark:
+    if signal_start >= watermark:
         return signal
 
-    cutoff = (job_watermark - start_time).total_seconds()
-    first_sample_idx = next(
-        (
-            idx
-            for idx, timestamp in enumerate(signal.timestamps)
-            if timestamp > cutoff
-        ),
-        None,
+    cutoff = (watermark - start_time).total_seconds()
+    first_sample_idx = int(
+        np.searchsorted(np.asarray(signal.timestamps), cutoff, side="right")
     )
-    if first_sample_idx is None:
+    if first_sample_idx >= len(signal.timestamps):
         return None
 
     trimmed = signal.cut(
@@ -226,6 +373,128 @@ def _apply_job_watermark(
     return trimmed if len(trimmed.timestamps) > 0 else None
 
 
+class SendResult(dict):
+    """
+    {signal name: samples sent} of one send_file()/send_decoded() call.
+    failures counts the batches and signals that didn't make it and weren't
+    spooled either, deferred the failed batches that are safe in the disk
+    spool (replay_spool() sends them), and span is the file's (first, last)
+    sample time when it was probed. Only an ok result (no failures) may
+    mark the file as ingested, in the ledger or by moving a cursor or
+    watermark; deferred batches don't hold the file back, sending it again
+    would only duplicate what the replay sends.
+    """
+
+    def __init__(
+        self,
+        counts: dict[str, int] | None = None,
+        failures: int = 0,
+        span: tuple[datetime, datetime] | None = None,
+        deferred: int = 0,
+    ):
+        super().__init__(counts or {})
+        self.failures = failures
+        self.deferred = deferred
+        self.span = span
+
+    @property
+    def ok(self) -> bool:
+        return self.failures == 0
+
+
+def send_failed(result: dict[str, int] | None) -> bool:
+    """
+    Whether a send result (SendResult or plain counts) had failures; None
+    stands for a send that never happened.
+    """
+    return result is None or getattr(result, "failures", 0) > 0
+
+
+# [failures, deferred] of the send in progress in this context, see
+# _counting_send_failures(). Sender threads run in a copy of the context.
+_send_failures: ContextVar[list[int] | None] = ContextVar(
+    "send_failures", default=None
+)
+_send_failures_lock = Lock()
+
+
+def _note_send_failure() -> None:
+    # Any batch or signal that didn't make it.
+    counter = _send_failures.get()
+    if counter is not None:
+        with _send_failures_lock:
+            counter[0] += 1
+
+
+def _note_failed_batch(spooled: bool) -> None:
+    # A batch VM didn't accept: deferred to the spool's replay, or lost.
+    counter = _send_failures.get()
+    if not spooled:
+        _note_send_failure()
+    elif counter is not None:
+        with _send_failures_lock:
+            counter[1] += 1
+
+
+@contextmanager
+def _counting_send_failures(counter: list[int] | None) -> Iterator[None]:
+    token = _send_failures.set(counter)
+    try:
+        yield
+    finally:
+        _send_failures.reset(token)
+
+
+def _post_import_batch(
+    server: str,
+    path: str,
+    data: bytes | str,
+    label: str,
+    logger: logging.Logger,
+    params: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+) -> bool:
+    """
+    POST one import batch through the server's shared VMClient (retries with
+    exponential backoff). Returns True once VictoriaMetrics answers 204;
+    batches that still fail are kept in the disk spool for replay_spool(),
+    batches VM rejects are quarantined there.
+    """
+    rejected = ""
+    try:
+        ok = get_vm_client(server).post_import(
+            path,
+            data=data,
+            label=label,
+            logger=logger,
+            params=params,
+            headers=headers,
+        )
+    except ImportRejected as e:
+        ok = False
+        rejected = str(e)
+    if not ok:
+        spooled = spool_failed_batch(
+            server=server,
+            path=path,
+            body=data,
+            label=label,
+            params=params,
+            headers=headers,
+            rejected=rejected,
+        )
+        _note_failed_batch(spooled)
+    return ok
+
+
+def _log_chunks(
+    chunks: Iterable[tuple[bytes, Any]], logger: logging.Logger
+) -> Iterable[tuple[bytes, Any]]:
+    for chunk, extra in chunks:
+        logger.info(chunk.decode())
+        yield chunk, extra
+
+
 def send_signal(
     signal: Signal,
     start_time: datetime,
@@ -234,7 +503,7 @@ def send_signal(
     print_metric_line: bool = False,
     send_signal: bool = True,
     skip_signal_range_check: bool = False,
-    job_watermark: datetime | None = None,
+    job_watermark: JobWatermark | None = None,
     batch_size: int = 250_000,
 ) -> int:
     """
@@ -276,40 +545,43 @@ def send_signal(
 
     logger.debug(f"  📨 Sending {metric_name} [{_time_str}] ...")
     start = time.time()
-    batch: list[str] = []
-    for sample, ts in zip(_signal.samples, _signal.timestamps):
-        if not is_valid_sample(
-            sample
-        ):  # Check if sample is not float (e.g. string)
-            continue  # Skip this sample
-        data = make_metric_line(
-            metric_name,
-            message,
-            unit,
-            sample,
-            start_time + timedelta(seconds=ts),
-            job=job if job else "",
-        )
-        batch.append(data)
-        num_of_samples_sent += 1
-        if len(batch) >= batch_size:
-            try:
-                if print_metric_line:
-                    logger.info("".join(batch))
-                if send_signal:
-                    requests.post(
-                        server + vmapi_import_prometheus, data="".join(batch)
-                    )
-            except Exception as e:
-                logger.error(f"‼️ Error sending batch: {e}")
-            batch = []
-            time.sleep(0.01)  # Avoid overwhelming the server
-    if batch:
+    values, offsets = _valid_signal_samples(_signal)
+    keep = apply_deadband_mask(job, signal.name, values, offsets)
+    if keep is not None:
+        values, offsets = values[keep], offsets[keep]
+    chunks = iter_prometheus_line_chunks(
+        metric_name=metric_name,
+        message=message,
+        unit=unit,
+        values=values,
+        timestamps_in_s=offsets_to_epoch_seconds(start_time, offsets),
+        job=job if job else "",
+        batch_size=batch_size,
+    )
+    for chunk, count in chunks:
         try:
-            requests.post(server + vmapi_import_prometheus, data="".join(batch))
+            if print_metric_line:
+                logger.info(chunk.decode())
+            if not send_signal:
+                num_of_samples_sent += count
+                continue
+            body, headers = compress_request_body(chunk, "prometheus")
+            if _post_import_batch(
+                server=server,
+                path=vmapi_import_prometheus,
+                data=body,
+                label=metric_name,
+                logger=logger,
+                headers=headers,
+            ):
+                num_of_samples_sent += count
         except Exception as e:
-            logger.error(f"‼️ Error sending final batch: {e}")
+            _note_send_failure()
+            logger.error(f"‼️ Error sending batch: {e}")
 
+    if num_of_samples_sent == 0:
+        logger.warning(f"  ⚠️ {metric_name}: No samples sent.")
+        return num_of_samples_sent
     time_str = get_time_str(start)
     end_ts = time.time()
     logger.info(
@@ -318,36 +590,31 @@ def send_signal(
     return num_of_samples_sent
 
 
-def send_signal_using_json_lines(
+def _prepare_json_line_chunks(
     signal: Signal,
     start_time: datetime,
     job: str,
     server: str,
-    print_metric_line: bool = False,
-    send_signal: bool = True,
-    skip_signal_range_check: bool = False,
-    job_watermark: datetime | None = None,
-    batch_size: int = 10_000,
-) -> int:
+    skip_signal_range_check: bool,
+    job_watermark: JobWatermark | None,
+    batch_size: int,
+    logger: logging.Logger,
+    rollups: bool = False,
+    shared_timestamps: SharedTimestamps | None = None,
+    rollup_span: tuple[datetime, datetime] | None = None,
+) -> tuple[str, Iterator[tuple[bytes, int]]] | None:
     """
-    Send a single signal to VictoriaMetrics using JSON lines.
-    Options:
-    - signal: The Signal object to send.
-    - start_time: The datetime representing the start time of the MDF file.
-    - job: Label to recognize what machine this signal belongs to.
-    - print_metric_line: If True, prints the metric lines before sending (default: False).
-    - send_signal: If True, actually sends the data to VictoriaMetrics (default: True).
-    - skip_signal_range_check: If True, skips checking if the signal data already exists in the database (default: False).
-    - batch_size: Number of samples to send in each HTTP POST batch (default: 10,000) see https://docs.victoriametrics.com/victoriametrics/single-server-victoriametrics/#json-line-format.
+    Apply the job watermark to a signal and return (metric_name, chunks) with
+    its JSON line batches, or None when there is nothing new to send.
+    With rollups=True the rollup series batches (count 0) follow the raw ones;
+    rollup_span is the decoded file's (first, last) sample time, and buckets
+    it cuts are skipped (see rollups.complete_buckets()).
+    shared_timestamps are the converted timestamps of the signal's channel
+    group; they are used when the signal keeps every sample.
+    Shared by the threaded and the async send engines.
     """
-
-    logger = logging.getLogger("send_signal_using_json_lines")
-    setup_simple_logger(logger)
-
     message, metric_name = get_channel_data(signal)
 
-    num_of_samples_sent = 0
-
     if job_watermark is None and not skip_signal_range_check:
         job_watermark = _resolve_job_watermark(
             server=server, job=job, skip_signal_range_check=skip_signal_range_check
@@ -359,32 +626,62 @@ def send_signal_using_json_lines(
 
     if _signal is None or len(_signal.timestamps) < 1:
         logger.debug(f"  ☑️ No new data for {metric_name}, skipping ...")
-        return num_of_samples_sent
+        return None
 
     unit = _signal.unit if _signal.unit else ""
     _sig_start_str = start_time + timedelta(seconds=_signal.timestamps[0])
     _sig_end_str = start_time + timedelta(seconds=_signal.timestamps[-1])
-    values: list[float] = []
-    timestamps: list[int] = []
-    for sample, ts in zip(_signal.samples, _signal.timestamps):
-        if not is_valid_sample(
-            sample
-        ):  # Check if sample is not float (e.g. string)
-            continue  # Skip this sample
-        values.append(float(sample))
-        timestamps.append(
-            int((start_time + timedelta(seconds=ts)).timestamp() * 1e3)
-        )
+    if (
+        shared_timestamps is not None
+        and _signal is signal
+        and len(signal.timestamps) == len(shared_timestamps)
+    ):
+        values, offsets = _valid_signal_samples(_signal)
+        if len(values) == len(shared_timestamps):
+            timestamps = shared_timestamps.ms
+        else:
+            timestamps = offsets_to_epoch_ms(start_time, offsets)
+            shared_timestamps = None
+    else:
+        values, timestamps = signal_to_vm_arrays(_signal, start_time)
+        shared_timestamps = None
     _time_str = f"{_sig_start_str.isoformat()} - {_sig_end_str.isoformat()}, {len(timestamps)} samples"
 
     if len(values) < 1 or len(timestamps) < 1:
         logger.debug(
             f"  ℹ️ No valid numeric data for {metric_name}, skipping ..."
         )
-        return num_of_samples_sent
+        return None
+
+    # Rollups are computed from every sample, before the deadband.
+    rollup_chunks = None
+    if rollups:
+        span_ms = None
+        if rollup_span is not None:
+            span_ms = (
+                int(rollup_span[0].timestamp() * 1e3),
+                int(rollup_span[1].timestamp() * 1e3),
+            )
+            if _signal is not signal:
+                # Samples before the job watermark were sent by an earlier run.
+                span_ms = (max(span_ms[0], int(timestamps[0])), span_ms[1])
+        rollup_chunks = iter_rollup_chunks(
+            metric_name=metric_name,
+            message=message,
+            unit=unit,
+            values=values,
+            timestamps_in_ms=timestamps,
+            job=job if job else "",
+            batch_size=batch_size,
+            span_ms=span_ms,
+        )
+    keep = apply_deadband_mask(job, signal.name, values, timestamps / 1e3)
+    if keep is not None:
+        values, timestamps = values[keep], timestamps[keep]
+        shared_timestamps = None
 
     logger.debug(f"  📨 Sending {metric_name} [{_time_str}] ...")
-    lines, counts = make_list_of_vm_json_line_format(
+    chunks = iter_vm_json_line_chunks(
         metric_name=metric_name,
         message=message,
         unit=unit,
@@ -392,36 +689,97 @@ def send_signal_using_json_lines(
         timestamps_in_ms=timestamps,
         job=job if job else "",
         batch_size=batch_size,
+        shared_timestamps=shared_timestamps,
     )
+    if rollup_chunks is not None:
+        chunks = itertools.chain(chunks, rollup_chunks)
+    return metric_name, chunks
+
+
+def send_signal_using_json_lines(
+    signal: Signal,
+    start_time: datetime,
+    job: str,
+    server: str,
+    print_metric_line: bool = False,
+    send_signal: bool = True,
+    skip_signal_range_check: bool = False,
+    job_watermark: JobWatermark | None = None,
+    batch_size: int = 10_000,
+    coalescer: ImportCoalescer | None = None,
+    rollups: bool = False,
+    shared_timestamps: SharedTimestamps | None = None,
+    rollup_span: tuple[datetime, datetime] | None = None,
+) -> int:
+    """
+    Send a single signal to VictoriaMetrics using JSON lines.
+    Options:
+    - signal: The Signal object to send.
+    - start_time: The datetime representing the start time of the MDF file.
+    - job: Label to recognize what machine this signal belongs to.
+    - print_metric_line: If True, prints the metric lines before sending (default: False).
+    - send_signal: If True, actually sends the data to VictoriaMetrics (default: True).
+    - skip_signal_range_check: If True, skips checking if the signal data already exists in the database (default: False).
+    - batch_size: Number of samples to send in each HTTP POST batch (default: 10,000) see https://docs.victoriametrics.com/victoriametrics/single-server-victoriametrics/#json-line-format.
+    - coalescer: If given, lines are handed to this shared ImportCoalescer instead of being posted; the returned count is then only queued, the coalescer reports what was sent.
+    - rollups: If True, also send the min/max/avg/last rollup series of the signal (see decoder/rollups.py).
+    - shared_timestamps: Converted timestamps of the signal's channel group, shared with the other signals of its CAN message (see utils.SharedTimestamps).
+    - rollup_span: (first, last) sample time of the decoded file; rollup buckets it cuts are skipped (see rollups.complete_buckets()).
+    """
+
+    logger = logging.getLogger("send_signal_using_json_lines")
+    setup_simple_logger(logger)
+
+    num_of_samples_sent = 0
+
+    prepared = _prepare_json_line_chunks(
+        signal=signal,
+        start_time=start_time,
+        job=job,
+        server=server,
+        skip_signal_range_check=skip_signal_range_check,
+        job_watermark=job_watermark,
+        batch_size=batch_size,
+        logger=logger,
+        rollups=rollups,
+        shared_timestamps=shared_timestamps,
+        rollup_span=rollup_span,
+    )
+    if prepared is None:
+        return num_of_samples_sent
+    metric_name, chunks = prepared
+
+    if print_metric_line:
+        chunks = _log_chunks(chunks, logger)
+    if not send_signal:
+        for _ in chunks:
+            pass
+        return num_of_samples_sent
+
+    if coalescer is not None:
+        for line, count in chunks:
+            coalescer.add(line, signal.name, count)
+            num_of_samples_sent += count
+        logger.debug(
+            f"  📦 Queued {metric_name} ({convert_to_eng(num_of_samples_sent)} samples)"
+        )
+        return num_of_samples_sent
 
     start = time.time()
-    for line, count in zip(lines, counts):
+    for body, headers, count in iter_compressed_chunks(chunks, "import"):
         try:
-            if print_metric_line:
-                logger.info(line)
-            if send_signal:
-                for retries in range(5):  # Retry up to 5 times
-                    try:
-                        resp = requests.post(
-                            server + vmapi_import,
-                            data=line,
-                            timeout=10,
-                        )
-                        time.sleep(0.01)  # Avoid overwhelming the server
-                        if resp.status_code == 204:
-                            num_of_samples_sent += count
-                            break  # Success, exit retry loop
-                        else:
-                            logger.error(
-                                f"‼️ {metric_name}: Error sending batch (attempt {retries + 1}): HTTP {resp.status_code} - {resp.text}"
-                            )
-                    except requests.RequestException as e:
-                        logger.error(
-                            f"‼️ {metric_name}: Exception sending batch (attempt {retries + 1}): {e}"
-                        )
-                    time.sleep(2**retries)  # Exponential backoff
+            if _post_import_batch(
+                server=server,
+                path=vmapi_import,
+                data=body,
+                label=metric_name,
+                logger=logger,
+                headers=headers,
+            ):
+                num_of_samples_sent += count
 
         except Exception as e:
+            _note_send_failure()
             logger.error(f"‼️ {metric_name}: Error sending batch: {e}")
 
     if num_of_samples_sent == 0:
@@ -435,6 +793,1022 @@ def send_signal_using_json_lines(
     return num_of_samples_sent
 
 
+@runtime_checkable
+class DecodedSignals(Protocol):
+    """
+    Decoded signals that don't live in an MDF, e.g. a batch handed over by a
+    decode worker through shared memory (decoder/shm_transport.py). The send
+    engines report each signal to release_signals() once they are done with
+    it, so its memory can be freed while the rest is still being sent.
+    """
+
+    name: Path
+    start_time: datetime
+
+    def iter_channels(self) -> Iterator[Signal]: ...
+
+    def iter_channel_groups(self) -> Iterator[list[Signal]]: ...
+
+    def release_signals(self, signals: list[Signal]) -> None: ...
+
+
+def iter_channel_groups(
+    mdf: MDF | DecodedSignals, copy_master: bool = True
+) -> Iterable[list[Signal]]:
+    """
+    Like MDF.iter_channels(), but yields the signals of one channel group at a
+    time. After extract_bus_logging each group is one CAN message, so all
+    signals in a group share one master (time) channel.
+    """
+    if isinstance(mdf, DecodedSignals):
+        yield from mdf.iter_channel_groups()
+        return
+    for _, channels in _iter_included_channels(mdf):
+        yield mdf.select(channels, copy_master=copy_master)
+
+
+def _iter_included_channels(
+    mdf: MDF,
+) -> Iterator[tuple[int, list[tuple[None, int, int]]]]:
+    # (group index, select() entries) per group with data channels. Only
+    # reads channel metadata, no samples.
+    for index in mdf.virtual_groups:
+        channels = [
+            (None, gp_index, ch_index)
+            for gp_index, channel_indexes in mdf.included_channels(index)[
+                index
+            ].items()
+            for ch_index in channel_indexes
+        ]
+        if channels:
+            yield index, channels
+
+
+def decoded_has_channels(mdf: MDF | DecodedSignals) -> bool:
+    """
+    Whether a decoded MDF has any signal to send, without loading samples
+    (unlike list(mdf.iter_channels())).
+    """
+    if isinstance(mdf, DecodedSignals):
+        return any(True for _ in mdf.iter_channel_groups())
+    return any(True for _ in _iter_included_channels(mdf))
+
+
+def probe_decoded_span(
+    mdf: MDF | DecodedSignals,
+) -> tuple[datetime, datetime] | None:
+    """
+    (first, last) sample time over all signals of a decoded MDF, or None if
+    it has no samples. Reads only the first and last master record of each
+    channel group instead of every channel's samples.
+    """
+    first: float | None = None
+    last: float | None = None
+    if isinstance(mdf, DecodedSignals):
+        bounds = [
+            (group[0].timestamps[0], group[0].timestamps[-1])
+            for group in mdf.iter_channel_groups()
+            if len(group[0].timestamps)
+        ]
+    else:
+        bounds = []
+        for index, _ in _iter_included_channels(mdf):
+            records = mdf.groups[index].channel_group.cycles_nr
+            if records < 1:
+                continue
+            bounds.append(
+                (
+                    mdf.get_master(index, record_offset=0, record_count=1)[0],
+                    mdf.get_master(
+                        index, record_offset=records - 1, record_count=1
+                    )[0],
+                )
+            )
+    for start, end in bounds:
+        first = start if first is None else min(first, start)
+        last = end if last is None else max(last, end)
+    if first is None or last is None:
+        return None
+    return (
+        mdf.start_time + timedelta(seconds=float(first)),
+        mdf.start_time + timedelta(seconds=float(last)),
+    )
+
+
+def _plan_decoded_backfill(
+    span: tuple[datetime, datetime] | None, server: str, job: str
+) -> BackfillPlan | None:
+    # Gap plan over the decoded file's span, when --backfill-gaps is on.
+    if not backfill_step() or not job or span is None:
+        return None
+    return plan_backfill(server=server, job=job, start=span[0], end=span[1])
+
+
+def _write_ingest_watermark(
+    server: str,
+    job: str,
+    device: str,
+    watermark: datetime,
+    samples: int,
+    logger: logging.Logger,
+) -> None:
+    line = make_ingest_watermark_line(job, device, watermark, samples)
+    if _post_import_batch(
+        server=server,
+        path=vmapi_import,
+        data=line,
+        label=VM_INGEST_WATERMARK_METRIC,
+        logger=logger,
+    ):
+        logger.debug(
+            f"  🔖 {job}: ingest watermark of {device or 'all devices'} at {watermark.isoformat()}"
+        )
+
+
+class IngestWatermark:
+    """
+    Moves the ingest watermark series of one job and device over the files
+    of a run. Files may finish out of order (S3 pipeline, decode pool), so
+    the watermark only moves over the prefix of files, in time order, that
+    were all fully sent: never past a file still in flight or failed, as
+    send_decoded() skips whatever ends before the watermark.
+
+    keys identify the files (or stacks) of the device, oldest first;
+    finish(key, result) takes each one's SendResult (None if it failed
+    before sending).
+    """
+
+    def __init__(
+        self, server: str, job: str, device: str, keys: Iterable[Any]
+    ):
+        self.server = server
+        self.job = job
+        self.device = device
+        self.moved_to: datetime | None = None
+        self._order = OrderedCompletions(keys)
+        self._results: dict[Any, dict[str, int] | None] = {}
+        self._lock = Lock()
+        self.logger = logging.getLogger("send_decoded")
+        setup_simple_logger(self.logger, format=LOG_FORMAT)
+
+    def finish(self, key: Any, result: dict[str, int] | None) -> None:
+        with self._lock:
+            self._results[key] = result
+            failed_before = self._order.failed
+            advanced = self._order.finish(key, not send_failed(result))
+            if self._order.failed and not failed_before:
+                self.logger.warning(
+                    f"⚠️ {self.job}: a file of {self.device} was not fully sent, its ingest watermark stays before it."
+                )
+            ends = []
+            samples = 0
+            for done in advanced:
+                done_result = self._results.pop(done)
+                span = getattr(done_result, "span", None)
+                if span is not None:
+                    ends.append(span[1])
+                samples += sum((done_result or {}).values())
+            end = max(ends, default=None)
+            if end is None or (self.moved_to is not None and end <= self.moved_to):
+                return
+            self.moved_to = end
+        _write_ingest_watermark(
+            self.server, self.job, self.device, end, samples, self.logger
+        )
+
+
+InfluxGroup = tuple[str, str, list[tuple[str, Signal]], np.ndarray, int]
+
+
+def _plan_influx_groups(
+    signals: list[Signal],
+    start_time: datetime,
+    skip_signal_range_check: bool,
+    job_watermark: JobWatermark | None,
+    logger: logging.Logger,
+) -> tuple[list[Signal], list[InfluxGroup]]:
+    """
+    Split the signals of one message into JSON line fallbacks (non-numeric)
+    and influx groups (message, unit, [(field, signal)], timestamps,
+    first_idx) of signals sharing unit and timestamps, with first_idx the
+    first sample after the job watermark. Groups with no new data are dropped.
+    """
+    if isinstance(job_watermark, BackfillPlan) and not skip_signal_range_check:
+        # Gaps differ per series, but members of a group share timestamps:
+        # send each signal as JSON lines, cut to its own gaps.
+        return list(signals), []
+
+    fallback: list[Signal] = []
+    # (message, unit) -> list of (shared timestamps, [(field, signal)])
+    groups: dict[tuple[str, str], list[tuple[np.ndarray, list[tuple[str, Signal]]]]] = {}
+    for signal in signals:
+        samples = np.asarray(signal.samples)
+        if samples.ndim != 1 or samples.dtype.kind not in "biuf":
+            fallback.append(signal)
+            continue
+
+        message, metric_name = get_channel_data(signal)
+        timestamps = np.asarray(signal.timestamps, dtype=np.float64)
+        subgroups = groups.setdefault((message, signal.unit or ""), [])
+        for shared_timestamps, members in subgroups:
+            if len(shared_timestamps) == len(timestamps) and np.array_equal(
+                shared_timestamps, timestamps
+            ):
+                members.append((metric_name, signal))
+                break
+        else:
+            subgroups.append((timestamps, [(metric_name, signal)]))
+
+    planned: list[InfluxGroup] = []
+    for (message, unit), subgroups in groups.items():
+        for timestamps, members in subgroups:
+            first_idx = 0
+            # Members share the timestamps, so the group starts after the
+            # oldest member watermark (a member without one sends it all).
+            watermarks = [
+                _signal_watermark(signal, job_watermark) for _, signal in members
+            ]
+            if (
+                not skip_signal_range_check
+                and watermarks
+                and None not in watermarks
+            ):
+                cutoff = (
+                    min(cast(list[datetime], watermarks)) - start_time
+                ).total_seconds()
+                first_idx = int(np.searchsorted(timestamps, cutoff, side="right"))
+            if first_idx >= len(timestamps):
+                logger.debug(f"  ☑️ No new data for {message}, skipping ...")
+                continue
+            planned.append((message, unit, members, timestamps, first_idx))
+    return fallback, planned
+
+
+def _iter_influx_group_chunks(
+    group: InfluxGroup,
+    start_time: datetime,
+    job: str,
+    batch_size: int,
+) -> tuple[dict[str, str], Iterator[tuple[bytes, dict[str, int]]]]:
+    """
+    Return ({field: signal_name}, line protocol batches) for one influx group.
+    """
+    message, unit, members, timestamps, first_idx = group
+    fields: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+    names: dict[str, str] = {}
+    offsets = timestamps[first_idx:]
+    for metric_name, signal in members:
+        values = np.asarray(signal.samples)[first_idx:].astype(
+            np.float64, copy=False
+        )
+        valid = ~np.isnan(values)
+        keep = apply_deadband_mask(
+            job, signal.name, values[valid], offsets[valid]
+        )
+        if keep is not None:
+            valid[np.flatnonzero(valid)[~keep]] = False
+        fields[metric_name] = (values, valid)
+        names[metric_name] = signal.name
+
+    chunks = iter_influx_line_chunks(
+        message=message,
+        unit=unit,
+        fields=fields,
+        timestamps_in_ms=offsets_to_epoch_ms(start_time, offsets),
+        job=job if job else "",
+        batch_size=batch_size,
+    )
+    return names, chunks
+
+
+def send_message_group_using_influx_lines(
+    signals: list[Signal],
+    start_time: datetime,
+    job: str,
+    server: str,
+    print_metric_line: bool = False,
+    send_signal: bool = True,
+    skip_signal_range_check: bool = False,
+    job_watermark: JobWatermark | None = None,
+    batch_size: int = 10_000,
+) -> dict[str, int]:
+    """
+    Send the signals of one CAN message to VictoriaMetrics as InfluxDB line
+    protocol (`vmapi_influx_write`), one line per (message, timestamp) with
+    every signal as a field, so timestamps are serialized once per message.
+
+    VictoriaMetrics names influx series `<measurement>_<field>`; run it with
+    `-influxSkipMeasurement` to get the same `<signal>{job,message,unit}`
+    series as the JSON line path. Signals are grouped by unit (a tag) and by
+    shared timestamps; non-numeric signals fall back to JSON lines.
+    Returns {signal_name: samples_sent}.
+    """
+    logger = logging.getLogger("send_message_group_using_influx_lines")
+    setup_simple_logger(logger)
+
+    signals_sample_count: dict[str, int] = {}
+    if not signals:
+        return signals_sample_count
+
+    if job_watermark is None and not skip_signal_range_check:
+        job_watermark = _resolve_job_watermark(
+            server=server, job=job, skip_signal_range_check=skip_signal_range_check
+        )
+
+    fallback, groups = _plan_influx_groups(
+        signals=signals,
+        start_time=start_time,
+        skip_signal_range_check=skip_signal_range_check,
+        job_watermark=job_watermark,
+        logger=logger,
+    )
+    for signal in fallback:
+        count = send_signal_using_json_lines(
+            signal=signal,
+            start_time=start_time,
+            job=job,
+            server=server,
+            print_metric_line=print_metric_line,
+            send_signal=send_signal,
+            skip_signal_range_check=skip_signal_range_check,
+            job_watermark=job_watermark,
+            batch_size=batch_size,
+        )
+        if count > 0:
+            signals_sample_count[signal.name] = count
+
+    for group in groups:
+        message, _, members, _, _ = group
+        start = time.time()
+        sent: dict[str, int] = {}
+        names, chunks = _iter_influx_group_chunks(
+            group, start_time=start_time, job=job, batch_size=batch_size
+        )
+        if print_metric_line:
+            chunks = _log_chunks(chunks, logger)
+        if not send_signal:
+            for _ in chunks:
+                pass
+            continue
+
+        for body, headers, counts in iter_compressed_chunks(chunks, "influx"):
+            try:
+                if _post_import_batch(
+                    server=server,
+                    path=vmapi_influx_write,
+                    data=body,
+                    label=message,
+                    logger=logger,
+                    params={"precision": "ms"},
+                    headers=headers,
+                ):
+                    for metric_name, count in counts.items():
+                        sent[metric_name] = sent.get(metric_name, 0) + count
+            except Exception as e:
+                _note_send_failure()
+                logger.error(f"‼️ {message}: Error sending batch: {e}")
+
+        for metric_name, count in sent.items():
+            if count > 0:
+                signal_name = names[metric_name]
+                signals_sample_count[signal_name] = (
+                    signals_sample_count.get(signal_name, 0) + count
+                )
+        if sent:
+            total = sum(sent.values())
+            logger.info(
+                f"  📨 Sent {message} ({len(members)} signals) in {get_time_str(start)} ({convert_to_eng(total)} samples | {convert_to_eng(total / max(time.time() - start, 1e-9))} samples/s)"
+            )
+        else:
+            logger.warning(f"  ⚠️ {message}: No samples sent.")
+
+    return signals_sample_count
+
+
+SendEngine = Literal["threads", "async"]
+SEND_ENGINES: tuple[str, ...] = ("threads", "async")
+SendSink = Literal["json", "influx"]
+SEND_SINKS: tuple[str, ...] = ("json", "influx")
+_send_engine: SendEngine = cast(SendEngine, VM_SEND_ENGINE)
+_send_sink: SendSink = cast(SendSink, VM_SEND_SINK)
+_influx_checks: dict[str, bool | None] = {}
+_influx_checks_lock = Lock()
+_max_in_flight: int = VM_ASYNC_MAX_IN_FLIGHT
+_pending_per_worker: int = VM_SEND_PENDING_PER_WORKER
+_slice_samples: int = VM_SEND_SLICE_SAMPLES
+
+
+def configure_send_engine(
+    engine: SendEngine,
+    max_in_flight: int | None = None,
+    pending_per_worker: int | None = None,
+    slice_samples: int | None = None,
+) -> None:
+    """
+    Set the engine used by send_file/send_decoded when engine=None is passed
+    ("threads" or "async"). max_in_flight bounds the concurrent import
+    requests of the async engine; pending_per_worker bounds the signals the
+    threads engine reads ahead per sender thread. slice_samples splits
+    longer signals into sample ranges sent as separate tasks (0 = never).
+    """
+    global _send_engine, _max_in_flight, _pending_per_worker, _slice_samples
+    if engine not in SEND_ENGINES:
+        raise ValueError(f"Unknown send engine: {engine}")
+    _send_engine = engine
+    if max_in_flight is not None:
+        _max_in_flight = max(1, max_in_flight)
+    if pending_per_worker is not None:
+        _pending_per_worker = max(1, pending_per_worker)
+    if slice_samples is not None:
+        _slice_samples = max(0, slice_samples)
+
+
+def configure_send_sink(sink: SendSink) -> None:
+    """
+    Set the sink used by send_file/send_decoded when sink=None is passed
+    ("json" or "influx").
+    """
+    global _send_sink
+    if sink not in SEND_SINKS:
+        raise ValueError(f"Unknown send sink: {sink}")
+    _send_sink = sink
+
+
+def influx_skips_measurement(server: str) -> bool | None:
+    """
+    Whether VictoriaMetrics at `server` runs with -influxSkipMeasurement, read
+    from its /flags page once per server; None when the page can't be read.
+    Without the flag, influx lines are stored as `<message>_<signal>` series
+    instead of the JSON sink's `<signal>`.
+    """
+    key = server.rstrip("/")
+    with _influx_checks_lock:
+        if key in _influx_checks:
+            return _influx_checks[key]
+
+    logger = logging.getLogger("send_decoded")
+    setup_simple_logger(logger, format=LOG_FORMAT)
+    skips: bool | None = None
+    try:
+        resp = get_vm_client(server).get(vmapi_flags, timeout=5)
+        if resp.status_code == 200:
+            match = re.search(
+                r'^-influxSkipMeasurement="?(\w+)', resp.text, re.MULTILINE
+            )
+            skips = match is not None and match.group(1) == "true"
+    except requests.RequestException:
+        pass
+    if skips is None:
+        logger.warning(
+            f"⚠️ Could not read the flags of {server}; the influx sink needs -influxSkipMeasurement to write the same series as the JSON sink."
+        )
+    elif not skips:
+        logger.error(
+            f"❌ {server} runs without -influxSkipMeasurement, so influx lines would be stored as <message>_<signal> series: sending JSON lines instead."
+        )
+    with _influx_checks_lock:
+        _influx_checks[key] = skips
+    return skips
+
+
+class _SignalSlices:
+    """
+    Splits long signals into sample-range slices, so the senders share the
+    work of a few huge signals instead of one thread sending each of them
+    while the others idle. Slices start at multiples of batch_size, so the
+    import batches are the same as for the whole signal. Signals with
+    rollups or a deadband rule need all their samples and stay whole.
+    """
+
+    def __init__(self, job: str, batch_size: int, rollups: bool):
+        self.job = job
+        self.size = (
+            0
+            if rollups or _slice_samples <= 0
+            else -(-_slice_samples // batch_size) * batch_size
+        )
+        self.sliced = 0
+        self._left: dict[int, int] = {}
+
+    def split(
+        self, signal: Signal, shared_timestamps: SharedTimestamps | None
+    ) -> Iterator[tuple[Signal, SharedTimestamps | None]]:
+        count = len(signal.timestamps)
+        if (
+            self.size <= 0
+            or count <= self.size
+            or has_deadband_rule(self.job, signal.name)
+        ):
+            yield signal, shared_timestamps
+            return
+        if shared_timestamps is not None and len(shared_timestamps) != count:
+            shared_timestamps = None
+        self._left[id(signal)] = -(-count // self.size)
+        self.sliced += 1
+        for start in range(0, count, self.size):
+            stop = min(start + self.size, count)
+            part = Signal(
+                samples=signal.samples[start:stop],
+                timestamps=signal.timestamps[start:stop],
+                name=signal.name,
+                unit=signal.unit,
+                display_names=signal.display_names,
+            )
+            yield part, (
+                shared_timestamps.window(start, stop)
+                if shared_timestamps is not None
+                else None
+            )
+
+    def finished(self, signals: list[Signal]) -> list[Signal]:
+        """
+        The signals whose last outstanding slice just completed.
+        """
+        done = []
+        for signal in signals:
+            left = self._left.pop(id(signal), 1) - 1
+            if left:
+                self._left[id(signal)] = left
+            else:
+                done.append(signal)
+        return done
+
+
+def _next_compressed(
+    chunks: Iterator[tuple[bytes, Any]], sink: str
+) -> tuple[bytes, dict[str, str], Any] | None:
+    # Encode and compress the next batch off the event loop.
+    for payload, extra in chunks:
+        body, headers = compress_request_body(payload, sink)
+        return body, headers, extra
+    return None
+
+
+async def _send_mdf_channels_async(
+    mdf: MDF | DecodedSignals,
+    server: str,
+    job: str,
+    skip_signal_range_check: bool,
+    skip_signal_fn: Optional[Callable[[str], bool]],
+    batch_size: int,
+    max_in_flight: int,
+    job_watermark: JobWatermark | None,
+    sink: SendSink = "json",
+    rollups: bool = False,
+    rollup_span: tuple[datetime, datetime] | None = None,
+) -> dict[str, int]:
+    """
+    asyncio send engine: max_in_flight workers share one event loop and one
+    AsyncVMClient, so up to max_in_flight import requests are in flight while
+    retries back off without holding a thread. Preparing each signal's
+    batches and encoding and compressing each batch run in the loop's
+    default executor, never on the loop itself.
+    """
+    logger = logging.getLogger("send_decoded")
+    setup_simple_logger(logger, format=LOG_FORMAT)
+    json_logger = logging.getLogger("send_signal_using_json_lines")
+    setup_simple_logger(json_logger)
+    influx_logger = logging.getLogger("send_message_group_using_influx_lines")
+    setup_simple_logger(influx_logger)
+
+    loop = asyncio.get_running_loop()
+    client = AsyncVMClient(server, max_connections=max_in_flight)
+    signals_sample_count: dict[str, int] = {}
+
+    if job_watermark is None and not skip_signal_range_check:
+        job_watermark = await loop.run_in_executor(
+            None, _resolve_job_watermark, server, job, skip_signal_range_check
+        )
+    if job_watermark is None:
+        # Resolved once here; without a watermark there is nothing to trim.
+        skip_signal_range_check = True
+
+    def keep(sig: Signal) -> bool:
+        return skip_signal_fn is None or not skip_signal_fn(sig.name)
+
+    def credit(signal_name: str, count: int) -> None:
+        if count > 0:
+            signals_sample_count[signal_name] = (
+                signals_sample_count.get(signal_name, 0) + count
+            )
+
+    async def post_chunks(
+        chunks: Iterator[tuple[bytes, Any]],
+        sink_name: str,
+        path: str,
+        label: str,
+        task_logger: logging.Logger,
+        params: dict[str, str] | None = None,
+    ) -> list[Any]:
+        accepted: list[Any] = []
+        while True:
+            item = await loop.run_in_executor(
+                None, _next_compressed, chunks, sink_name
+            )
+            if item is None:
+                return accepted
+            body, headers, extra = item
+            rejected = ""
+            try:
+                ok = await client.post_import(
+                    path,
+                    data=body,
+                    label=label,
+                    logger=task_logger,
+                    params=params,
+                    headers=headers,
+                )
+            except ImportRejected as e:
+                ok = False
+                rejected = str(e)
+            if ok:
+                accepted.append(extra)
+            else:
+                spooled = spool_failed_batch(
+                    server=server,
+                    path=path,
+                    body=body,
+                    label=label,
+                    params=params,
+                    headers=headers,
+                    rejected=rejected,
+                )
+                _note_failed_batch(spooled)
+
+    async def send_json(
+        signal: Signal, shared_timestamps: SharedTimestamps | None
+    ) -> None:
+        prepared = await loop.run_in_executor(
+            None,
+            partial(
+                _prepare_json_line_chunks,
+                signal=signal,
+                start_time=mdf.start_time,
+                job=job,
+                server=server,
+                skip_signal_range_check=skip_signal_range_check,
+                job_watermark=job_watermark,
+                batch_size=batch_size,
+                logger=json_logger,
+                rollups=rollups,
+                shared_timestamps=shared_timestamps,
+                rollup_span=rollup_span,
+            ),
+        )
+        if prepared is None:
+            return
+        metric_name, chunks = prepared
+        start = time.time()
+        sent = sum(
+            await post_chunks(chunks, "import", vmapi_import, metric_name, json_logger)
+        )
+        credit(signal.name, sent)
+        if sent == 0:
+            json_logger.warning(f"  ⚠️ {metric_name}: No samples sent.")
+        else:
+            json_logger.info(
+                f"  📨 Sent {metric_name} in {get_time_str(start)} ({convert_to_eng(sent)} samples | {convert_to_eng(sent / max(time.time() - start, 1e-9))} samples/s)"
+            )
+
+    async def send_influx(group: InfluxGroup) -> None:
+        message, _, members, _, _ = group
+        names, chunks = await loop.run_in_executor(
+            None,
+            partial(
+                _iter_influx_group_chunks,
+                group,
+                start_time=mdf.start_time,
+                job=job,
+                batch_size=batch_size,
+            ),
+        )
+        start = time.time()
+        total = 0
+        for counts in await post_chunks(
+            chunks,
+            "influx",
+            vmapi_influx_write,
+            message,
+            influx_logger,
+            params={"precision": "ms"},
+        ):
+            for metric_name, count in counts.items():
+                credit(names[metric_name], count)
+                total += count
+        if total == 0:
+            influx_logger.warning(f"  ⚠️ {message}: No samples sent.")
+        else:
+            influx_logger.info(
+                f"  📨 Sent {message} ({len(members)} signals) in {get_time_str(start)} ({convert_to_eng(total)} samples | {convert_to_eng(total / max(time.time() - start, 1e-9))} samples/s)"
+            )
+
+    # (kind, signal slice or influx group, shared timestamps, signals done
+    # with it)
+    WorkItem = tuple[
+        str, Signal | InfluxGroup, SharedTimestamps | None, list[Signal]
+    ]
+    slices = _SignalSlices(job, batch_size, rollups)
+
+    def work_items() -> Iterator[WorkItem]:
+        if sink == "influx":
+            for group in iter_channel_groups(mdf):
+                fallback, groups = _plan_influx_groups(
+                    signals=[sig for sig in group if keep(sig)],
+                    start_time=mdf.start_time,
+                    skip_signal_range_check=skip_signal_range_check,
+                    job_watermark=job_watermark,
+                    logger=influx_logger,
+                )
+                yield from (("json", sig, None, [sig]) for sig in fallback)
+                for g in groups:
+                    yield "influx", g, None, [sig for _, sig in g[2]]
+        else:
+            for group in iter_channel_groups(mdf, copy_master=False):
+                kept = [sig for sig in group if keep(sig)]
+                if not kept:
+                    continue
+                shared = SharedTimestamps(
+                    mdf.start_time, kept[0].timestamps, users=len(kept)
+                )
+                for sig in kept:
+                    for part, part_timestamps in slices.split(sig, shared):
+                        yield "json", part, part_timestamps, [sig]
+
+    # Workers pull from one lazy iterator, so only max_in_flight signals are
+    # materialized at a time. next() never awaits, so sharing it is safe.
+    work = work_items()
+
+    release = mdf.release_signals if isinstance(mdf, DecodedSignals) else None
+
+    async def worker() -> None:
+        for kind, item, shared_timestamps, signals in work:
+            name = item.name if isinstance(item, Signal) else item[0]
+            try:
+                if kind == "influx":
+                    await send_influx(cast(InfluxGroup, item))
+                else:
+                    await send_json(cast(Signal, item), shared_timestamps)
+            except Exception as e:
+                _note_send_failure()
+                logger.error(f"❌ Error sending signal {name}: {e}")
+            finally:
+                done = slices.finished(signals)
+                if release is not None and done:
+                    release(done)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, max_in_flight))))
+    finally:
+        await client.close()
+
+    logger.debug(
+        f"  🔀 Async engine: {client.requests} requests, peak {client.peak_in_flight} in flight"
+    )
+    return signals_sample_count
+
+
+def _run_coroutine_blocking(coro: Any) -> Any:
+    """
+    Run a coroutine to completion from synchronous code. When the calling
+    thread already runs an event loop, the coroutine gets its own thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(copy_context().run, asyncio.run, coro).result()
+
+
+def _send_mdf_channels(
+    mdf: MDF | DecodedSignals,
+    server: str,
+    job: str,
+    skip_signal_range_check: bool,
+    skip_signal_fn: Optional[Callable[[str], bool]],
+    batch_size: int,
+    max_thread_workers: int,
+    job_watermark: JobWatermark | None,
+    sink: SendSink | None = None,
+    coalesce: bool | None = None,
+    engine: SendEngine | None = None,
+    rollups: bool | None = None,
+) -> dict[str, int]:
+    logger = logging.getLogger("send_decoded")
+    setup_simple_logger(logger, format=LOG_FORMAT)
+
+    if rollups is None:
+        rollups = rollups_enabled()
+    if coalesce is None:
+        coalesce = coalesce_enabled()
+    sink = sink or _send_sink
+    if sink == "influx" and influx_skips_measurement(server) is False:
+        sink = "json"
+    if rollups and sink == "influx":
+        logger.warning(
+            "⚠️ Rollups are only written by the JSON line sink, skipping them for sink='influx'."
+        )
+    rollup_span = probe_decoded_span(mdf) if rollups else None
+
+    # The rate controller shrinks batches under load, but only between
+    # files: shared timestamp text and signal slices are cut at multiples of
+    # one batch size, which must hold for every signal of the file.
+    batch_size = get_rate_controller().batch_size(batch_size)
+
+    if (engine or _send_engine) == "async":
+        if coalesce:
+            logger.debug(
+                "  ℹ️ coalesce is ignored by the async engine, it keeps many requests in flight instead."
+            )
+        return _run_coroutine_blocking(
+            _send_mdf_channels_async(
+                mdf=mdf,
+                server=server,
+                job=job,
+                skip_signal_range_check=skip_signal_range_check,
+                skip_signal_fn=skip_signal_fn,
+                batch_size=batch_size,
+                max_in_flight=_max_in_flight,
+                job_watermark=job_watermark,
+                sink=sink,
+                rollups=rollups,
+                rollup_span=rollup_span,
+            )
+        )
+
+    signals_sample_count: dict[str, int] = {}
+
+    def keep(sig: Signal) -> bool:
+        return skip_signal_fn is None or not skip_signal_fn(sig.name)
+
+    # One pooled keep-alive connection per sender thread.
+    get_vm_client(server, pool_size=max_thread_workers)
+
+    coalescer: ImportCoalescer | None = None
+    if coalesce and sink == "json":
+
+        # Flushes may run on the coalescer's timer thread.
+        failures = _send_failures.get()
+
+        def post_coalesced(payload: bytes) -> bool:
+            body, headers = compress_request_body(payload, "import")
+            with _counting_send_failures(failures):
+                return _post_import_batch(
+                    server=server,
+                    path=vmapi_import,
+                    data=body,
+                    label=f"{job} (coalesced)",
+                    logger=logger,
+                    headers=headers,
+                )
+
+        coalescer = ImportCoalescer(post=post_coalesced)
+
+    # (send function, its kwargs, signals done with it)
+    SendTask = tuple[Callable[..., Any], dict[str, Any], list[Signal]]
+    slices = _SignalSlices(job, batch_size, rollups)
+
+    def tasks() -> Iterator[SendTask]:
+        common = dict(
+            start_time=mdf.start_time,
+            job=job,
+            skip_signal_range_check=skip_signal_range_check,
+            job_watermark=job_watermark,
+            batch_size=batch_size,
+            server=server,
+        )
+        if sink == "influx":
+            for group in iter_channel_groups(mdf):
+                kwargs = dict(common, signals=[sig for sig in group if keep(sig)])
+                yield send_message_group_using_influx_lines, kwargs, group
+        else:
+            for group in iter_channel_groups(mdf, copy_master=False):
+                kept = [sig for sig in group if keep(sig)]
+                if not kept:
+                    continue
+                shared = SharedTimestamps(
+                    mdf.start_time, kept[0].timestamps, users=len(kept)
+                )
+                for sig in kept:
+                    for part, part_timestamps in slices.split(sig, shared):
+                        kwargs = dict(
+                            common,
+                            signal=part,
+                            coalescer=coalescer,
+                            rollups=rollups,
+                            shared_timestamps=part_timestamps,
+                            rollup_span=rollup_span,
+                        )
+                        yield send_signal_using_json_lines, kwargs, [sig]
+
+    release = mdf.release_signals if isinstance(mdf, DecodedSignals) else None
+    # Signals are read from the MDF only when a slot frees up, so at most
+    # max_pending of them are in memory instead of every channel at once.
+    # Idle threads take the next queued slice, whichever signal it is from.
+    max_pending = max(1, max_thread_workers * _pending_per_worker)
+    pending_tasks = tasks()
+    with ThreadPoolExecutor(max_workers=max_thread_workers) as executor:
+        future_to_signals: dict[Any, list[Signal]] = {}
+
+        def fill() -> None:
+            while len(future_to_signals) < max_pending:
+                task = next(pending_tasks, None)
+                if task is None:
+                    return
+                fn, kwargs, signals = task
+                future = executor.submit(copy_context().run, fn, **kwargs)
+                future_to_signals[future] = signals
+
+        fill()
+        while future_to_signals:
+            done, _ = wait(future_to_signals, return_when=FIRST_COMPLETED)
+            for future in done:
+                signals = future_to_signals.pop(future)
+                name = signals[0].name if signals else ""
+                done_signals = slices.finished(signals)
+                if release is not None and done_signals:
+                    # The signal is sent (or its lines encoded into the coalescer).
+                    release(done_signals)
+                try:
+                    result = future.result()
+                    if isinstance(result, int):
+                        result = {name: result}
+                    for signal_name, samples_sent in result.items():
+                        if samples_sent > 0:
+                            signals_sample_count[signal_name] = (
+                                signals_sample_count.get(signal_name, 0)
+                                + samples_sent
+                            )
+                except Exception as e:
+                    _note_send_failure()
+                    logger.error(f"❌ Error sending signal {name}: {e}")
+            fill()
+
+    if coalescer is not None:
+        # Futures only report queued samples, the coalescer knows what VM accepted.
+        signals_sample_count = {
+            name: count for name, count in coalescer.close().items() if count > 0
+        }
+        logger.debug(
+            f"  📦 Coalesced {len(signals_sample_count)} signals into {coalescer.requests} requests"
+        )
+
+    return signals_sample_count
+
+
+def _send_decoded_channels(
+    mdf: MDF | DecodedSignals,
+    server: str,
+    job: str,
+    device: str | None,
+    skip_signal_range_check: bool,
+    job_watermark: JobWatermark | None,
+    logger: logging.Logger,
+    **kwargs: Any,
+) -> SendResult:
+    """
+    Resolve the job watermark of one decoded file (gap backfill plan, then
+    the ingest watermark of `device` unless the file straddles it, then the
+    per-series scan) and send its channels. The ingest watermark itself is
+    moved by the caller's IngestWatermark, which knows the order of files.
+    """
+    span = None
+    if device is not None or backfill_step():
+        span = probe_decoded_span(mdf)
+    if job_watermark is None:
+        job_watermark = _plan_decoded_backfill(span, server, job)
+        if job_watermark is not None:
+            skip_signal_range_check = False
+    if job_watermark is None and not skip_signal_range_check:
+        job_watermark = _resolve_job_watermark(
+            server=server,
+            job=job,
+            skip_signal_range_check=skip_signal_range_check,
+            device=device,
+            span=span,
+        )
+
+    counter = [0, 0]
+    with _counting_send_failures(counter):
+        result = SendResult(
+            _send_mdf_channels(
+                mdf=mdf,
+                server=server,
+                job=job,
+                skip_signal_range_check=skip_signal_range_check,
+                job_watermark=job_watermark,
+                **kwargs,
+            ),
+            span=span,
+        )
+    result.failures, result.deferred = counter
+    if result.deferred:
+        logger.warning(
+            f"💾 {result.deferred} failed batches of {mdf.name} are spooled for replay, the file counts as sent."
+        )
+    return result
+
+
 def send_file(
     filename: Path,
     server: str,
@@ -443,13 +1817,18 @@ def send_file(
     skip_signal_fn: Optional[Callable[[str], bool]] = None,
     batch_size: int = 10_000,
     max_thread_workers=10,
-    job_watermark: datetime | None = None,
-) -> dict[str, int]:
+    job_watermark: JobWatermark | None = None,
+    sink: SendSink | None = None,
+    coalesce: bool | None = None,
+    engine: SendEngine | None = None,
+    rollups: bool | None = None,
+    device: str | None = None,
+) -> SendResult:
     logger = logging.getLogger("send_file")
     setup_simple_logger(logger, format=LOG_FORMAT)
 
     logger.debug(f"Sending {filename}")
-    signals_sample_count: dict[str, int] = {}
+    signals_sample_count = SendResult()
     if not filename.exists():
         logger.warning(f"📃 File {filename} does not exist.")
         return signals_sample_count
@@ -464,64 +1843,71 @@ def send_file(
 
     try:
         resolved_job = job if job else filename.stem
-        if job_watermark is None and not skip_signal_range_check:
-            job_watermark = _resolve_job_watermark(
+        with MDF(filename) as mdf:
+            signals_sample_count = _send_decoded_channels(
+                mdf=mdf,
                 server=server,
                 job=resolved_job,
+                device=device,
+                logger=logger,
                 skip_signal_range_check=skip_signal_range_check,
+                skip_signal_fn=skip_signal_fn,
+                batch_size=batch_size,
+                max_thread_workers=max_thread_workers,
+                job_watermark=job_watermark,
+                sink=sink,
+                coalesce=coalesce,
+                engine=engine,
+                rollups=rollups,
             )
-        with MDF(filename) as mdf:
-            with ThreadPoolExecutor(max_workers=max_thread_workers) as executor:
-                future_to_signal = {
-                    executor.submit(
-                        send_signal_using_json_lines,
-                        signal=sig,
-                        start_time=mdf.start_time,
-                        job=resolved_job,
-                        skip_signal_range_check=skip_signal_range_check,
-                        job_watermark=job_watermark,
-                        batch_size=batch_size,
-                        server=server,
-                    ): sig
-                    for sig in mdf.iter_channels()
-                    if skip_signal_fn is None or not skip_signal_fn(sig.name)
-                }
-
-                for future in as_completed(future_to_signal):
-                    sig = future_to_signal[future]
-                    try:
-                        samples_sent = future.result()
-                        if samples_sent > 0:
-                            if sig.name in signals_sample_count:
-                                signals_sample_count[sig.name] += samples_sent
-                            else:
-                                signals_sample_count[sig.name] = samples_sent
-                    except Exception as e:
-                        logger.error(f"❌ Error sending signal {sig.name}: {e}")
 
     except Exception as e:
         logger.error(f"❌ Error processing {filename}: {e}")
+        signals_sample_count = SendResult(signals_sample_count, failures=1)
 
     return signals_sample_count
 
 
 def send_decoded(
-    decoded: Path | MDF,
+    decoded: Path | MDF | DecodedSignals,
     server: str,
     job: str | None = None,
     skip_signal_range_check: bool = True,
     skip_signal_fn: Optional[Callable[[str], bool]] = None,
     batch_size: int = 10_000,
     max_thread_workers: int = 10,
-    job_watermark: datetime | None = None,
-) -> dict[str, int]:
+    job_watermark: JobWatermark | None = None,
+    sink: SendSink | None = None,
+    coalesce: bool | None = None,
+    engine: SendEngine | None = None,
+    rollups: bool | None = None,
+    device: str | None = None,
+) -> SendResult:
     """
     Send a decoded MDF4 file to VictoriaMetrics.
+    sink="json" sends one JSON line series per signal (/api/v1/import),
+    sink="influx" sends one line-protocol line per message and timestamp
+    (/influx/write), see send_message_group_using_influx_lines(); None uses
+    configure_send_sink(). The influx sink falls back to JSON lines when VM
+    runs without -influxSkipMeasurement (see influx_skips_measurement()).
+    coalesce=True packs the JSON lines of many signals into shared import
+    requests (see ImportCoalescer and config.VM_COALESCE_*); None uses
+    configure_coalesce().
+    engine="async" sends from one asyncio event loop with many requests in
+    flight instead of a thread pool; None uses configure_send_engine().
+    rollups=True also writes min/max/avg/last rollup series per signal (JSON
+    line sink only); None uses configure_rollups().
+    Returns a SendResult: the counts, plus the failures that mean the file
+    was not fully sent.
+    device names the logger the file came from: a file ending before its
+    ingest watermark series (config.VM_INGEST_WATERMARK_METRIC) is skipped,
+    and one starting after it is sent in full, both without scanning the
+    job's series. Callers move the watermark with an IngestWatermark.
     """
     logger = logging.getLogger("send_decoded")
     setup_simple_logger(logger, format=LOG_FORMAT)
 
-    signals_sample_count: dict[str, int] = {}
+    signals_sample_count = SendResult()
 
     if isinstance(decoded, Path):
         return send_file(
@@ -533,46 +1919,35 @@ def send_decoded(
             batch_size=batch_size,
             max_thread_workers=max_thread_workers,
             job_watermark=job_watermark,
+            sink=sink,
+            coalesce=coalesce,
+            engine=engine,
+            rollups=rollups,
+            device=device,
         )
-    elif isinstance(decoded, MDF):
+    elif isinstance(decoded, (MDF, DecodedSignals)):
         resolved_job = job if job else "-".join(decoded.name.parts)
-        if job_watermark is None and not skip_signal_range_check:
-            job_watermark = _resolve_job_watermark(
-                server=server,
-                job=resolved_job,
-                skip_signal_range_check=skip_signal_range_check,
-            )
-        with ThreadPoolExecutor(max_workers=max_thread_workers) as executor:
-            future_to_signal = {
-                executor.submit(
-                    send_signal_using_json_lines,
-                    signal=sig,
-                    start_time=decoded.start_time,
-                    job=resolved_job,
-                    skip_signal_range_check=skip_signal_range_check,
-                    job_watermark=job_watermark,
-                    batch_size=batch_size,
-                    server=server,
-                ): sig
-                for sig in decoded.iter_channels()
-                if skip_signal_fn is None or not skip_signal_fn(sig.name)
-            }
-
-            for future in as_completed(future_to_signal):
-                sig = future_to_signal[future]
-                try:
-                    samples_sent = future.result()
-                    if samples_sent > 0:
-                        if sig.name in signals_sample_count:
-                            signals_sample_count[sig.name] += samples_sent
-                        else:
-                            signals_sample_count[sig.name] = samples_sent
-                except Exception as e:
-                    logger.error(f"❌ Error sending signal {sig.name}: {e}")
+        signals_sample_count = _send_decoded_channels(
+            mdf=decoded,
+            server=server,
+            job=resolved_job,
+            device=device,
+            logger=logger,
+            skip_signal_range_check=skip_signal_range_check,
+            skip_signal_fn=skip_signal_fn,
+            batch_size=batch_size,
+            max_thread_workers=max_thread_workers,
+            job_watermark=job_watermark,
+            sink=sink,
+            coalesce=coalesce,
+            engine=engine,
+            rollups=rollups,
+        )
     else:
         logger.warning(
-            "⚠️ Invalid decoded input type. Must be Path or MDF instance."
+            "⚠️ Invalid decoded input type. Must be Path, MDF or DecodedSignals."
         )
+        signals_sample_count.failures = 1
 
     return signals_sample_count
 
@@ -587,6 +1962,10 @@ def decode_and_send(
     skip_signal_range_check: bool = True,
     skip_signal_fn: Optional[Callable[[str], bool]] = None,
     batch_size=10_000,
+    sink: SendSink | None = None,
+    coalesce: bool | None = None,
+    engine: SendEngine | None = None,
+    rollups: bool | None = None,
 ) -> dict[str, int]:
     """
     Decode all MDF4 files in the specified directory and send their data to VictoriaMetrics.
@@ -625,7 +2004,7 @@ def decode_and_send(
                 logger.info(
                     f" ✅ {stack_msg}: Decoded in {get_time_str(start)}s"
                 )
-                if list(decoded.iter_channels()):
+                if decoded_has_channels(decoded):
                     result = send_decoded(
                         decoded=decoded,
                         job=job,
@@ -633,6 +2012,10 @@ def decode_and_send(
                         skip_signal_range_check=skip_signal_range_check,
                         batch_size=batch_size,
                         server=server,
+                        sink=sink,
+                        coalesce=coalesce,
+                        engine=engine,
+                        rollups=rollups,
                     )
                     for k, v in result.items():
                         signals_sample_count[k] = (
@@ -665,7 +2048,7 @@ def decode_and_send(
                 logger.info(
                     f" ✅ Decoded ../{_dispname} in {time.time() - start:.3f}s"
                 )
-                if list(decoded.iter_channels()):
+                if decoded_has_channels(decoded):
                     result = send_decoded(
                         decoded=decoded,
                         job=job,
@@ -673,6 +2056,10 @@ def decode_and_send(
                         skip_signal_range_check=skip_signal_range_check,
                         batch_size=batch_size,
                         server=server,
+                        sink=sink,
+                        coalesce=coalesce,
+                        engine=engine,
+                        rollups=rollups,
                     )
 
                     for k, v in result.items():
@@ -0,0 +1,312 @@
+import sys
+import gc
+import logging
+import secrets
+from pathlib import Path
+
+from datetime import datetime
+from collections.abc import Iterator
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+from typing import Any
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from asammdf import MDF, Signal
+
+from decoder.config import LOG_FORMAT
+from decoder.sending import get_channel_data, is_valid_sample, iter_channel_groups
+from decoder.utils import setup_simple_logger
+
+logger = logging.getLogger("shm_transport")
+setup_simple_logger(logger, format=LOG_FORMAT)
+
+# Array offsets inside a block are aligned for any NumPy dtype.
+_ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _view(
+    block: SharedMemory, dtype: np.dtype, offset: int, length: int
+) -> np.ndarray:
+    # frombuffer() keeps the buffer exported, so block.close() refuses to
+    # unmap memory a view still points to (np.ndarray(buffer=...) doesn't).
+    return np.frombuffer(block.buf, dtype=dtype, count=length, offset=offset)
+
+
+def _numeric_samples(signal: Signal) -> np.ndarray:
+    samples = np.asarray(signal.samples)
+    if samples.ndim == 1 and samples.dtype.kind in "biuf":
+        return samples
+    # Same rule as sending._valid_signal_samples(): non-numbers become NaN.
+    return np.array(
+        [float(x) if is_valid_sample(x) else np.nan for x in samples],
+        dtype=np.float64,
+    )
+
+
+def _unlink(block: SharedMemory) -> None:
+    block.close()
+    block.unlink()
+
+
+def new_shm_prefix() -> str:
+    """
+    Name prefix for the blocks of one decode run, so sweep_shm_blocks() can
+    find blocks whose worker died before they were listed in a manifest.
+    Short enough for macOS's 31 character limit on shared memory names.
+    """
+    return f"vmdec_{secrets.token_hex(4)}_"
+
+
+def _create_block(prefix: str, size: int) -> SharedMemory:
+    while True:
+        try:
+            return SharedMemory(
+                name=f"{prefix}{secrets.token_hex(4)}" if prefix else None,
+                create=True,
+                size=size,
+            )
+        except FileExistsError:
+            continue
+
+
+def sweep_shm_blocks(prefix: str) -> int:
+    """
+    Unlink every block whose name starts with prefix and return how many
+    there were. Only possible where shared memory is listed as files
+    (/dev/shm on Linux); elsewhere the resource tracker unlinks them when
+    the program exits.
+    """
+    shm_dir = Path("/dev/shm")
+    if not prefix or not shm_dir.is_dir():
+        return 0
+    swept = 0
+    for path in shm_dir.glob(f"{prefix}*"):
+        try:
+            _unlink(SharedMemory(name=path.name))
+        except FileNotFoundError:
+            continue
+        except ValueError:
+            # Worker died before sizing it: nothing to map, just remove it.
+            path.unlink(missing_ok=True)
+        swept += 1
+    return swept
+
+
+def export_decoded_to_shm(
+    decoded: MDF, prefix: str = ""
+) -> dict[str, Any] | None:
+    """
+    Copy every channel group of a decoded MDF into its own shared memory
+    block and return the manifest describing them, or None if there is
+    nothing to export. One block per CAN message holds the shared timestamps
+    followed by each signal's samples:
+
+        {"name", "start_time", "groups": [{"block", "size", "timestamps":
+         (offset, length), "signals": [{"name", "unit", "message",
+         "display_names", "dtype", "offset", "length"}]}]}
+
+    Runs in the decode worker. Ownership of the blocks passes to whoever
+    opens the manifest with SharedDecodedBatch, which unlinks them. Blocks
+    are named prefix + random suffix (random names without a prefix). They
+    stay registered with the resource tracker, which spawned workers share
+    with the parent, so the parent's tracker still unlinks them at exit if
+    the worker is killed before handing the manifest over.
+    """
+    groups: list[dict[str, Any]] = []
+    created: list[SharedMemory] = []
+    try:
+        for group in iter_channel_groups(decoded):
+            if not group:
+                continue
+            timestamps = np.asarray(group[0].timestamps, dtype=np.float64)
+            arrays: list[tuple[Signal, np.ndarray]] = []
+            for signal in group:
+                if len(signal.timestamps) != len(timestamps):
+                    logger.warning(
+                        f"⚠️ {signal.name}: timestamps differ from its message, not exported."
+                    )
+                    continue
+                arrays.append((signal, _numeric_samples(signal)))
+
+            size = _aligned(timestamps.nbytes)
+            layout = []
+            for signal, samples in arrays:
+                layout.append(size)
+                size = _aligned(size + samples.nbytes)
+            block = _create_block(prefix, max(size, 1))
+            created.append(block)
+
+            _view(block, timestamps.dtype, 0, len(timestamps))[:] = timestamps
+            signals = []
+            for (signal, samples), offset in zip(arrays, layout):
+                _view(block, samples.dtype, offset, len(samples))[:] = samples
+                message, _ = get_channel_data(signal)
+                signals.append(
+                    {
+                        "name": signal.name,
+                        "unit": signal.unit or "",
+                        "message": message,
+                        "display_names": dict(signal.display_names),
+                        "dtype": samples.dtype.str,
+                        "offset": offset,
+                        "length": len(samples),
+                    }
+                )
+            groups.append(
+                {
+                    "block": block.name,
+                    "size": size,
+                    "timestamps": (0, len(timestamps)),
+                    "signals": signals,
+                }
+            )
+    except BaseException:
+        for block in created:
+            _unlink(block)
+        raise
+
+    for block in created:
+        block.close()
+    if not groups:
+        return None
+    return {
+        "name": str(decoded.name),
+        "start_time": decoded.start_time.isoformat(),
+        "groups": groups,
+    }
+
+
+def discard_shm_manifest(manifest: dict[str, Any]) -> None:
+    """
+    Unlink the blocks of a manifest that will never be opened.
+    """
+    for group in manifest["groups"]:
+        try:
+            _unlink(SharedMemory(name=group["block"]))
+        except FileNotFoundError:
+            pass
+
+
+# Unlinked blocks whose mapping is still referenced by a NumPy view. They are
+# kept here (not left to SharedMemory.__del__, which would fail on the view)
+# and closed by a later _close_mappings() once the views are gone.
+_unmapped: list[SharedMemory] = []
+_unmapped_lock = Lock()
+
+
+def _close_mappings(*blocks: SharedMemory) -> None:
+    with _unmapped_lock:
+        still_open = []
+        for block in [*_unmapped, *blocks]:
+            try:
+                block.close()
+            except BufferError:
+                still_open.append(block)
+        _unmapped[:] = still_open
+
+
+class SharedDecodedBatch:
+    """
+    Decoded signals of one batch as zero-copy NumPy views into the shared
+    memory blocks written by export_decoded_to_shm().
+
+    Implements sending.DecodedSignals, so it can be passed to send_decoded()
+    like an MDF. A message's block is unlinked as soon as all of its signals
+    were reported sent through release_signals(); close() unlinks the rest.
+    """
+
+    def __init__(self, manifest: dict[str, Any]):
+        self.name = Path(manifest["name"])
+        self.start_time = datetime.fromisoformat(manifest["start_time"])
+        self.bytes = 0
+        self.freed_early = 0
+        self._lock = Lock()
+        self._blocks: dict[str, SharedMemory] = {}
+        self._groups: dict[str, list[Signal]] = {}
+        self._owner: dict[int, str] = {}
+        self._pending: dict[str, int] = {}
+        try:
+            for group in manifest["groups"]:
+                self._attach(group)
+        except BaseException:
+            self.close()
+            for group in manifest["groups"]:
+                if group["block"] not in self._blocks:
+                    discard_shm_manifest({"groups": [group]})
+            raise
+
+    def _attach(self, group: dict[str, Any]) -> None:
+        block = SharedMemory(name=group["block"])
+        self._blocks[block.name] = block
+        self.bytes += group["size"]
+        offset, length = group["timestamps"]
+        timestamps = _view(block, np.dtype(np.float64), offset, length)
+        signals = []
+        for meta in group["signals"]:
+            samples = _view(
+                block, np.dtype(meta["dtype"]), meta["offset"], meta["length"]
+            )
+            signal = Signal(
+                samples=samples,
+                timestamps=timestamps,
+                name=meta["name"],
+                unit=meta["unit"],
+                display_names=meta["display_names"],
+            )
+            self._owner[id(signal)] = block.name
+            signals.append(signal)
+        self._groups[block.name] = signals
+        self._pending[block.name] = len(signals)
+
+    def iter_channels(self) -> Iterator[Signal]:
+        for name in list(self._groups):
+            yield from self._groups.get(name, ())
+
+    def iter_channel_groups(self) -> Iterator[list[Signal]]:
+        for name in list(self._groups):
+            signals = self._groups.get(name)
+            if signals:
+                yield list(signals)
+
+    def release_signals(self, signals: list[Signal]) -> None:
+        """
+        Mark signals as sent; unlinks each block whose signals are all sent.
+        """
+        with self._lock:
+            for signal in signals:
+                name = self._owner.pop(id(signal), None)
+                if name is None:
+                    continue
+                self._pending[name] -= 1
+                if self._pending[name] == 0:
+                    self._free(name)
+                    self.freed_early += 1
+
+    def _free(self, name: str) -> None:
+        block = self._blocks.pop(name)
+        self._groups.pop(name, None)
+        self._pending.pop(name, None)
+        block.unlink()
+        _close_mappings(block)
+
+    def close(self) -> None:
+        with self._lock:
+            for name in list(self._blocks):
+                self._free(name)
+            self._owner.clear()
+        if _unmapped:
+            gc.collect()
+            _close_mappings()
+
+    def __enter__(self) -> "SharedDecodedBatch":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
@@ -0,0 +1,552 @@
+### Usage
+# Failed import batches are spooled automatically by the senders. To drain
+# the spool by hand (e.g. from cron once VictoriaMetrics is back):
+#
+#   python -m decoder.spool --replay
+#   python -m decoder.spool --stats
+
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import logging
+import argparse
+from pathlib import Path
+
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from threading import Lock
+from typing import IO, Any
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from decoder.config import (
+    LOG_FORMAT,
+    VM_SPOOL_DIR,
+    VM_SPOOL_ENABLED,
+    VM_SPOOL_MAX_REPLAYS,
+    VM_SPOOL_SEGMENT_MAX_BYTES,
+)
+from decoder.utils import (
+    format_bytes,
+    is_victoriametrics_online,
+    setup_simple_logger,
+)
+from decoder.vm_client import ImportRejected, get_vm_client
+
+# Record: magic, meta length, body length, crc32(meta + body), meta, body.
+_MAGIC = b"VMS1"
+_HEADER = struct.Struct("<4sIII")
+SEGMENT_SUFFIX = ".spool"
+CLAIMED_SUFFIX = ".replaying"
+REPLAYER_SUFFIX = ".replayer"
+REJECTED_DIR = "rejected"
+LOCK_FILE = ".lock"
+
+# (server, path, body, params, headers, label) -> accepted
+ReplayPost = Callable[
+    [str, str, bytes, dict[str, str] | None, dict[str, str] | None, str], bool
+]
+
+
+def _lock_file(f: IO[bytes], locked: bool) -> None:
+    if os.name == "nt":
+        f.seek(0)
+        mode = msvcrt.LK_LOCK if locked else msvcrt.LK_UNLCK
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), mode, 1)
+                return
+            except OSError:
+                if not locked:
+                    raise  # LK_LOCK gives up after 10s; keep waiting
+    else:
+        fcntl.flock(f, fcntl.LOCK_EX if locked else fcntl.LOCK_UN)
+
+
+def _is_locked(path: Path) -> bool:
+    # Whether another open file (of any process) holds _lock_file() on path.
+    try:
+        with open(path, "a+b") as f:
+            try:
+                if os.name == "nt":
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return True
+            _lock_file(f, False)
+            return False
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def directory_lock(directory: Path) -> Iterator[None]:
+    """
+    Exclusive lock on a spool directory, across processes: writers hold it
+    while appending to a segment and replayers while claiming segments, so
+    a segment is never renamed away in the middle of a write.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / LOCK_FILE, "a+b") as f:
+        _lock_file(f, True)
+        try:
+            yield
+        finally:
+            _lock_file(f, False)
+
+
+def iter_segment_records(
+    segment: Path, logger: logging.Logger | None = None
+) -> Iterator[tuple[dict[str, Any], bytes]]:
+    """
+    Yield (meta, body) for every intact record of a segment. Reading stops at
+    the first truncated or corrupt record (e.g. a crash mid-append).
+    """
+    with open(segment, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if not header:
+                return
+            if len(header) < _HEADER.size:
+                break
+            magic, meta_len, body_len, crc = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                break
+            meta_raw = f.read(meta_len)
+            body = f.read(body_len)
+            if (
+                len(meta_raw) != meta_len
+                or len(body) != body_len
+                or zlib.crc32(body, zlib.crc32(meta_raw)) != crc
+            ):
+                break
+            yield json.loads(meta_raw), body
+    if logger is not None:
+        logger.warning(
+            f"⚠️ Spool segment {segment.name} has a corrupt or truncated tail, ignoring it."
+        )
+
+
+class ImportSpool:
+    """
+    Append-only on-disk spool of encoded import batches.
+
+    Records (target server/path/params/headers + the already encoded and
+    compressed body) are appended to segment files with a CRC32 each, and
+    fsynced, so a spooled batch survives crashes. replay() drains closed
+    segments oldest first; records that fail again go to a new segment,
+    until they failed max_replays replays. Those, and batches VM rejected
+    as invalid, are quarantined in the "rejected" subfolder instead, which
+    is kept for inspection and never replayed.
+    """
+
+    def __init__(
+        self,
+        directory: Path = VM_SPOOL_DIR,
+        segment_max_bytes: int = VM_SPOOL_SEGMENT_MAX_BYTES,
+        max_replays: int = VM_SPOOL_MAX_REPLAYS,
+    ):
+        self.directory = Path(directory)
+        self.rejected_directory = self.directory / REJECTED_DIR
+        self.segment_max_bytes = segment_max_bytes
+        self.max_replays = max_replays
+        self.logger = logging.getLogger(self.__class__.__name__)
+        setup_simple_logger(self.logger, format=LOG_FORMAT)
+        self.spooled = 0
+        self.spooled_bytes = 0
+        self.quarantined = 0
+        self._lock = Lock()
+        self._segment: Path | None = None
+        self._segment_bytes = 0
+        self._rejected_segment: Path | None = None
+        self._seq = 0
+
+    def _new_segment(self, directory: Path | None = None) -> Path:
+        directory = directory or self.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        name = f"{time.time_ns():020d}-{os.getpid()}-{self._seq:06d}{SEGMENT_SUFFIX}"
+        return directory / name
+
+    def _encode_record(self, meta: dict[str, Any], data: bytes) -> bytes:
+        meta_raw = json.dumps(meta).encode()
+        crc = zlib.crc32(data, zlib.crc32(meta_raw))
+        header = _HEADER.pack(_MAGIC, len(meta_raw), len(data), crc)
+        return header + meta_raw + data
+
+    def _write_record(self, record: bytes) -> Path:
+        with self._lock:
+            if (
+                self._segment is None
+                or self._segment_bytes + len(record) > self.segment_max_bytes
+            ):
+                self._segment = self._new_segment()
+                self._segment_bytes = 0
+            # Opened by name under the lock: if a replayer claimed the
+            # segment meanwhile, this starts a new file of the same name.
+            with directory_lock(self.directory), open(self._segment, "ab") as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+            self._segment_bytes += len(record)
+            return self._segment
+
+    def append(
+        self,
+        server: str,
+        path: str,
+        body: bytes | str,
+        label: str = "",
+        params: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+        rejected: str = "",
+    ) -> None:
+        """
+        Spool a failed batch for replay, or quarantine it right away when
+        `rejected` gives the reason VM refused it.
+        """
+        data = body.encode() if isinstance(body, str) else body
+        meta = {
+            "server": server,
+            "path": path,
+            "params": params or {},
+            "headers": headers or {},
+            "label": label,
+            "spooled_at": time.time(),
+            "replays": 0,
+        }
+        if rejected:
+            self.quarantine(meta, data, rejected)
+            return
+        segment = self._write_record(self._encode_record(meta, data))
+        with self._lock:
+            self.spooled += 1
+            self.spooled_bytes += len(data)
+        self.logger.warning(
+            f"💾 {label}: Spooled failed batch ({format_bytes(len(data))}) to {segment.name}"
+        )
+
+    def quarantine(
+        self, meta: dict[str, Any], body: bytes, reason: str
+    ) -> None:
+        """
+        Keep a batch that must not be replayed in the rejected subfolder.
+        """
+        meta = {**meta, "rejected": reason}
+        with self._lock:
+            if self._rejected_segment is None:
+                self._rejected_segment = self._new_segment(
+                    self.rejected_directory
+                )
+            with open(self._rejected_segment, "ab") as f:
+                f.write(self._encode_record(meta, body))
+                f.flush()
+                os.fsync(f.fileno())
+            self.quarantined += 1
+        self.logger.error(
+            f"🚫 {meta['label']}: Quarantined batch ({format_bytes(len(body))}) in {self.rejected_directory}: {reason}"
+        )
+
+    def segments(self) -> list[Path]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def stats(self) -> dict[str, int]:
+        segments = self.segments()
+        records = 0
+        size = 0
+        for segment in segments:
+            size += segment.stat().st_size
+            records += sum(1 for _ in iter_segment_records(segment))
+        return {"segments": len(segments), "records": records, "bytes": size}
+
+    def recover_claimed(self) -> int:
+        """
+        Hand segments claimed by a replayer that died (crash, kill) back to
+        the spool and return how many there were. A live replayer holds the
+        lock on its ".replayer" file; claims of any other replayer are
+        stale. Records it already sent before dying are sent again (VM keeps
+        one copy of identical samples), none are lost.
+        """
+        if not self.directory.is_dir():
+            return 0
+        recovered = 0
+        with directory_lock(self.directory):
+            for claimed in sorted(self.directory.glob(f"*{CLAIMED_SUFFIX}")):
+                name = claimed.name[: -len(CLAIMED_SUFFIX)]
+                stem, _, owner = name.rpartition(".")
+                if _is_locked(self.directory / f"{owner}{REPLAYER_SUFFIX}"):
+                    continue
+                claimed.rename(self.directory / f"{stem}{SEGMENT_SUFFIX}")
+                recovered += 1
+            for owner_file in self.directory.glob(f"*{REPLAYER_SUFFIX}"):
+                if not _is_locked(owner_file):
+                    owner_file.unlink(missing_ok=True)
+        if recovered:
+            self.logger.warning(
+                f"♻️ Recovered {recovered} spool segments of an interrupted replay."
+            )
+        return recovered
+
+    @contextmanager
+    def _replayer(self) -> Iterator[str]:
+        # Claims are named after a lock file held for the whole replay, so
+        # recover_claimed() can tell a live replayer from a dead one.
+        owner = f"{time.time_ns()}-{os.getpid()}"
+        owner_file = self.directory / f"{owner}{REPLAYER_SUFFIX}"
+        with directory_lock(self.directory):
+            f = open(owner_file, "a+b")
+            _lock_file(f, True)
+        try:
+            yield owner
+        finally:
+            _lock_file(f, False)
+            f.close()
+            owner_file.unlink(missing_ok=True)
+
+    def replay(
+        self, post: ReplayPost, server: str | None = None
+    ) -> tuple[int, int]:
+        """
+        Re-send spooled batches with post(); only records for `server` when
+        given. Returns (replayed, still_failed); rejected and exhausted
+        records are quarantined, not counted as still failing. Segments are
+        claimed by renaming under the directory lock, so concurrent
+        replayers never send a record twice and no writer (of any process)
+        is appending to a claimed segment. Segments left claimed by a
+        replayer that died are recovered first (see recover_claimed()).
+        """
+        self.recover_claimed()
+        with self._lock:
+            # Start a fresh segment for anything spooled while replaying.
+            self._segment = None
+            segments = self.segments()
+        if not segments:
+            return 0, 0
+        with self._replayer() as owner:
+            return self._replay_segments(segments, owner, post, server)
+
+    def _replay_segments(
+        self,
+        segments: list[Path],
+        owner: str,
+        post: ReplayPost,
+        server: str | None,
+    ) -> tuple[int, int]:
+        replayed = 0
+        failed = 0
+        for segment in segments:
+            claimed = segment.with_name(
+                f"{segment.stem}.{owner}{CLAIMED_SUFFIX}"
+            )
+            try:
+                with directory_lock(self.directory):
+                    segment.rename(claimed)
+            except OSError:
+                continue  # Claimed by another replayer
+
+            for meta, body in iter_segment_records(claimed, self.logger):
+                if server is not None and meta["server"].rstrip(
+                    "/"
+                ) != server.rstrip("/"):
+                    self._append_meta(meta, body)
+                    continue
+                ok = False
+                try:
+                    ok = post(
+                        meta["server"],
+                        meta["path"],
+                        body,
+                        meta["params"] or None,
+                        meta["headers"] or None,
+                        meta["label"],
+                    )
+                except ImportRejected as e:
+                    self.quarantine(meta, body, str(e))
+                    continue
+                except Exception as e:
+                    self.logger.error(
+                        f"‼️ {meta['label']}: Error replaying spooled batch: {e}"
+                    )
+                if ok:
+                    replayed += 1
+                    continue
+                meta = {**meta, "replays": meta.get("replays", 0) + 1}
+                if meta["replays"] >= self.max_replays:
+                    reason = f"still failing after {meta['replays']} replays"
+                    self.quarantine(meta, body, reason)
+                else:
+                    failed += 1
+                    self._append_meta(meta, body)
+            claimed.unlink()
+        return replayed, failed
+
+    def _append_meta(self, meta: dict[str, Any], body: bytes) -> None:
+        # Requeue: keeps the original spooled_at and the run counters.
+        self._write_record(self._encode_record(meta, body))
+
+
+_spool: ImportSpool | None = None
+_spool_enabled = VM_SPOOL_ENABLED
+_spool_lock = Lock()
+
+
+def configure_spool(
+    directory: Path | str | None = None, enabled: bool = True
+) -> None:
+    """
+    Point the process-wide spool to another directory, or disable it.
+    """
+    global _spool, _spool_enabled
+    with _spool_lock:
+        _spool_enabled = enabled
+        _spool = ImportSpool(Path(directory)) if directory is not None else None
+
+
+def get_spool() -> ImportSpool | None:
+    global _spool
+    with _spool_lock:
+        if not _spool_enabled:
+            return None
+        if _spool is None:
+            _spool = ImportSpool()
+        return _spool
+
+
+def spool_failed_batch(
+    server: str,
+    path: str,
+    body: bytes | str,
+    label: str,
+    params: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+    rejected: str = "",
+) -> bool:
+    """
+    Keep a batch that exhausted its retries for a later replay_spool(), or
+    quarantine it when VM rejected it (`rejected` gives the reason).
+    Returns whether the batch is on disk; False when the spool is disabled
+    or could not be written.
+    """
+    spool = get_spool()
+    if spool is None:
+        return False
+    try:
+        spool.append(
+            server=server,
+            path=path,
+            body=body,
+            label=label,
+            params=params,
+            headers=headers,
+            rejected=rejected,
+        )
+    except OSError as e:
+        spool.logger.error(f"‼️ {label}: Could not spool failed batch: {e}")
+        return False
+    return True
+
+
+def replay_spool(server: str | None = None) -> tuple[int, int]:
+    """
+    Drain the process-wide spool through the pooled VMClient.
+    Returns (replayed, still_failed).
+    """
+    spool = get_spool()
+    if spool is None or not spool.segments():
+        return 0, 0
+
+    def post(
+        target: str,
+        path: str,
+        body: bytes,
+        params: dict[str, str] | None,
+        headers: dict[str, str] | None,
+        label: str,
+    ) -> bool:
+        return get_vm_client(target).post_import(
+            path,
+            data=body,
+            label=f"{label} (spooled)",
+            logger=spool.logger,
+            params=params,
+            headers=headers,
+        )
+
+    replayed, failed = spool.replay(post, server=server)
+    if replayed or failed:
+        spool.logger.info(
+            f"💾 Replayed {replayed} spooled batches, {failed} still failing."
+        )
+    return replayed, failed
+
+
+def replay_spool_if_online(server: str) -> tuple[int, int]:
+    """
+    Replay batches spooled for `server` once it answers again.
+    """
+    spool = get_spool()
+    if spool is None or not spool.segments():
+        return 0, 0
+    if not is_victoriametrics_online(server):
+        spool.logger.warning(
+            f"⚠️ {server} not available, keeping spooled batches for the next run."
+        )
+        return 0, 0
+    return replay_spool(server=server)
+
+
+def format_spool_summary() -> str:
+    """
+    One-line spool summary for the run totals, empty when nothing was spooled.
+    """
+    spool = get_spool()
+    if spool is None or not (spool.spooled or spool.quarantined):
+        return ""
+    summary = (
+        f"{spool.spooled} failed batches ({format_bytes(spool.spooled_bytes)}) "
+        f"spooled to {spool.directory}"
+    )
+    if spool.quarantined:
+        summary += (
+            f", {spool.quarantined} quarantined in {spool.rejected_directory}"
+        )
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Inspect or replay the failed VictoriaMetrics import spool."
+    )
+    parser.add_argument("--dir", type=Path, default=VM_SPOOL_DIR)
+    parser.add_argument(
+        "--server",
+        type=str,
+        default=None,
+        help="Only replay batches for this server.",
+    )
+    parser.add_argument("--replay", action="store_true")
+    parser.add_argument("--stats", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    configure_spool(args.dir)
+    if args.replay:
+        replay_spool(server=args.server)
+    if args.stats or not args.replay:
+        stats = get_spool().stats()  # type: ignore[union-attr]
+        logging.info(
+            f"💾 {stats['records']} batches in {stats['segments']} segments ({format_bytes(stats['bytes'])})"
+        )
@@ -0,0 +1,122 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from asammdf import Signal
+
+from decoder.backfill import plan_backfill
+from decoder.sending import _apply_job_watermark
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _signal(name: str) -> Signal:
+    return Signal(
+        samples=np.arange(10, dtype=np.float64),
+        timestamps=np.arange(10, dtype=np.float64) + 0.5,
+        name=name,
+        display_names={f"CAN1.Msg.{name}": "bus", f"Msg.{name}": "message"},
+    )
+
+
+class BackfillPlanTest(unittest.TestCase):
+    def setUp(self) -> None:
+        start_s = START.timestamp()
+        response = MagicMock(status_code=200)
+        response.json.return_value = {
+            "data": {
+                "result": [
+                    {
+                        "metric": {"__name__": "Covered", "message": "Msg"},
+                        "values": [
+                            [start_s + 2, "2"],
+                            [start_s + 4, "2"],
+                            [start_s + 6, "0"],
+                            [start_s + 10, "1"],
+                        ],
+                    },
+                    {
+                        "metric": {"__name__": "Empty", "message": "Msg"},
+                        "values": [[start_s + 2, "0"]],
+                    },
+                ]
+            }
+        }
+        with patch(
+            "decoder.vm_client.requests.Session.get", return_value=response
+        ) as get:
+            self.plan = plan_backfill(
+                "http://vm",
+                "D65 Upper",
+                START,
+                START + timedelta(seconds=9.5),
+                step_seconds=2,
+            )
+        self.params = get.call_args.kwargs["params"]
+
+    def test_queries_job_coverage_on_step_grid(self) -> None:
+        self.assertIn('job="D65_Upper"', self.params["query"])
+        self.assertEqual(self.params["step"], "2s")
+        self.assertEqual(float(self.params["start"]), START.timestamp() + 2)
+        self.assertEqual(float(self.params["end"]), START.timestamp() + 10)
+
+    def test_sends_only_samples_in_gaps(self) -> None:
+        assert self.plan is not None
+        result = _apply_job_watermark(_signal("Covered"), START, self.plan)
+        self.assertIsNotNone(result)
+        # The gap (4, 8] is widened by the buckets around it.
+        self.assertEqual(
+            list(result.timestamps), [2.5, 3.5, 4.5, 5.5, 6.5, 7.5, 8.5, 9.5]
+        )
+
+        # No sample in any bucket: the whole window is a gap.
+        signal = _signal("Empty")
+        self.assertIs(_apply_job_watermark(signal, START, self.plan), signal)
+        # VM has never seen the series.
+        signal = _signal("Unknown")
+        self.assertIs(_apply_job_watermark(signal, START, self.plan), signal)
+
+    def test_gap_edges_inside_covered_buckets_are_sent(self) -> None:
+        # VM has samples at 4.2 and 8.2 only: the hole (4.2, 8.2) starts in
+        # the covered bucket (4, 6] and ends in the covered bucket (8, 10].
+        start_s = START.timestamp()
+        response = MagicMock(status_code=200)
+        response.json.return_value = {
+            "data": {
+                "result": [
+                    {
+                        "metric": {"__name__": "Edge", "message": "Msg"},
+                        "values": [
+                            [start_s + 2, "2"],
+                            [start_s + 4, "2"],
+                            [start_s + 6, "1"],
+                            [start_s + 10, "1"],
+                        ],
+                    }
+                ]
+            }
+        }
+        with patch(
+            "decoder.vm_client.requests.Session.get", return_value=response
+        ):
+            plan = plan_backfill(
+                "http://vm", "D65", START, START + timedelta(seconds=9.5), 2
+            )
+        assert plan is not None
+        result = _apply_job_watermark(_signal("Edge"), START, plan)
+        self.assertIsNotNone(result)
+        self.assertLessEqual({4.5, 5.5, 6.5, 7.5}, set(result.timestamps))
+        self.assertNotIn(0.5, list(result.timestamps))
+
+    def test_no_plan_when_vm_fails(self) -> None:
+        with patch(
+            "decoder.vm_client.requests.Session.get",
+            side_effect=ConnectionError("down"),
+        ):
+            plan = plan_backfill("http://vm", "D65", START, START, 60)
+        self.assertIsNone(plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
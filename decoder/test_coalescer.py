@@ -0,0 +1,94 @@
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import numpy as np
+from asammdf import MDF, Signal
+
+from decoder.coalescer import ImportCoalescer
+from decoder.sending import send_decoded
+
+
+class ImportCoalescerTest(unittest.TestCase):
+    def test_flushes_on_budget_and_close(self) -> None:
+        bodies: list[bytes] = []
+
+        def post(body: bytes) -> bool:
+            bodies.append(body)
+            return True
+
+        coalescer = ImportCoalescer(
+            post=post, max_bytes=1_000_000, max_samples=10, flush_interval=0
+        )
+        for i in range(5):
+            coalescer.add(f'{{"line": {i}}}'.encode(), f"Sig{i % 2}", 3)
+        counts = coalescer.close()
+
+        self.assertEqual(counts, {"Sig0": 9, "Sig1": 6})
+        self.assertEqual(coalescer.requests, 2)
+        self.assertEqual(bodies[0].count(b"\n"), 4)
+        self.assertEqual(bodies[1], b'{"line": 4}\n')
+
+    def test_size_flush_restarts_the_interval(self) -> None:
+        coalescer = ImportCoalescer(
+            post=lambda body: True, max_samples=2, flush_interval=1.0
+        )
+        time.sleep(0.6)
+        coalescer.add(b"{}", "Sig", 2)
+        self.assertEqual(coalescer.requests, 1)
+        coalescer.add(b"{}", "Sig", 1)
+        # 1.2 s since the start, but only 0.6 s since the size flush.
+        time.sleep(0.6)
+        self.assertEqual(coalescer.requests, 1)
+        self.assertEqual(coalescer.close(), {"Sig": 3})
+        self.assertEqual(coalescer.requests, 2)
+
+    def test_rejected_batches_are_not_counted(self) -> None:
+        coalescer = ImportCoalescer(post=lambda body: False, flush_interval=0)
+        coalescer.add(b"{}", "Sig", 10)
+        self.assertEqual(coalescer.close(), {})
+
+
+class Response:
+    status_code = 204
+    text = ""
+
+
+class SendDecodedCoalesceTest(unittest.TestCase):
+    def test_counts_match_uncoalesced_send(self) -> None:
+        mdf = MDF()
+        mdf.start_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        timestamps = np.arange(50, dtype=np.float64) * 0.1
+        for group in range(4):
+            mdf.append(
+                [
+                    Signal(
+                        samples=np.arange(50, dtype=np.float64) + idx,
+                        timestamps=timestamps,
+                        name=f"Sig{group}_{idx}",
+                        display_names={
+                            f"CAN1.Msg{group}.Sig{group}_{idx}": "bus",
+                            f"Msg{group}.Sig{group}_{idx}": "message",
+                        },
+                    )
+                    for idx in range(3)
+                ]
+            )
+
+        with patch("decoder.vm_client.requests.Session.post", return_value=Response()):
+            expected = send_decoded(mdf, server="http://vm", job="Upper")
+        with patch(
+            "decoder.vm_client.requests.Session.post", return_value=Response()
+        ) as post:
+            coalesced = send_decoded(
+                mdf, server="http://vm", job="Upper", coalesce=True
+            )
+
+        self.assertEqual(coalesced, expected)
+        self.assertEqual(len(coalesced), 12)
+        self.assertEqual(post.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
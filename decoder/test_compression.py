@@ -0,0 +1,71 @@
+import gzip
+import unittest
+from unittest.mock import patch
+
+from decoder import compression
+
+
+class CompressionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.saved = dict(compression._sink_settings)
+
+    def tearDown(self) -> None:
+        compression._sink_settings.clear()
+        compression._sink_settings.update(self.saved)
+
+    def test_uncompressed_sink_passes_body_through(self) -> None:
+        compression.configure_compression("none", sinks=["import"])
+        body, headers = compression.compress_request_body("abc", "import")
+        self.assertEqual(body, b"abc")
+        self.assertEqual(headers, {})
+
+    def test_gzip_round_trip_and_stats(self) -> None:
+        compression.configure_compression("gzip", level=6, sinks=["import"])
+        before = compression.get_compression_stats()
+        payload = b'{"metric": {"__name__": "Sig"}, "values": [1.0]}\n' * 100
+
+        body, headers = compression.compress_request_body(payload, "import")
+
+        self.assertEqual(headers, {"Content-Encoding": "gzip"})
+        self.assertEqual(gzip.decompress(body), payload)
+        after = compression.get_compression_stats()
+        self.assertEqual(after["requests"] - before["requests"], 1)
+        self.assertEqual(after["bytes_in"] - before["bytes_in"], len(payload))
+        self.assertIn("ratio", compression.format_compression_summary())
+
+    def test_level_alone_keeps_each_sinks_encoding(self) -> None:
+        compression.configure_compression("gzip", level=3, sinks=["influx"])
+        compression.configure_compression("none", sinks=["import"])
+        compression.configure_compression(None, level=9)
+        self.assertEqual(compression.get_sink_compression("influx"), ("gzip", 9))
+        self.assertEqual(compression.get_sink_compression("import"), ("none", 9))
+
+        compression.configure_compression("none")
+        with self.assertRaises(ValueError):
+            compression.configure_compression(None, level=9)
+
+    def test_missing_zstandard_warns_when_configured(self) -> None:
+        with patch.object(compression, "zstandard", None), self.assertLogs(
+            level="WARNING"
+        ) as logs:
+            compression.configure_compression("zstd", level=19, sinks=["import"])
+        self.assertIn("'zstandard' package is not installed", logs.output[0])
+        self.assertEqual(compression.get_sink_compression("import"), ("gzip", 9))
+        _, headers = compression.compress_request_body(b"abc", "import")
+        self.assertEqual(headers, {"Content-Encoding": "gzip"})
+
+    def test_pooled_chunks_keep_order(self) -> None:
+        compression.configure_compression("gzip", sinks=["influx"])
+        chunks = [(f"line {i}\n".encode() * 50, i) for i in range(10)]
+
+        result = list(compression.iter_compressed_chunks(chunks, "influx"))
+
+        self.assertEqual([extra for _, _, extra in result], list(range(10)))
+        self.assertEqual(
+            [gzip.decompress(body) for body, _, _ in result],
+            [payload for payload, _ in chunks],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
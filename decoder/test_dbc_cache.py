@@ -0,0 +1,166 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import can
+from asammdf import MDF
+
+from decoder.config import DBC_CACHE_DIR
+from decoder.dbc_cache import (
+    SignalRules,
+    configure_dbc_cache,
+    get_dbc_cache_stats,
+    load_bus_database,
+    load_can_matrices,
+    load_cantools_database,
+)
+
+DBC = """VERSION ""
+
+BU_: ECU
+
+BO_ 256 Msg: 8 ECU
+ SG_ Sig : 0|16@1+ (0.1,0) [0|6553.5] "V" Vector__XXX
+"""
+
+
+class DbcCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.dbc = self.dir / "bus.dbc"
+        self.dbc.write_text(DBC)
+        configure_dbc_cache(self.dir / "cache")
+        self.addCleanup(configure_dbc_cache, DBC_CACHE_DIR)
+
+    def _counts(self) -> tuple[int, int]:
+        stats = get_dbc_cache_stats()
+        return stats["hits"], stats["misses"]
+
+    def test_parses_once_per_content(self) -> None:
+        hits, misses = self._counts()
+        first = load_bus_database(self.dbc)
+        second = load_bus_database(self.dbc)
+        self.assertEqual(self._counts(), (hits + 1, misses + 1))
+        # Fresh objects: callers may edit what they get.
+        self.assertIsNot(first, second)
+        self.assertEqual(
+            [frame.name for frame in second.frames],  # type: ignore[union-attr]
+            ["Msg"],
+        )
+
+        self.dbc.write_text(DBC.replace("Msg", "Other"))
+        changed = load_bus_database(self.dbc)
+        self.assertEqual(self._counts(), (hits + 1, misses + 2))
+        self.assertEqual(
+            [frame.name for frame in changed.frames], ["Other"]  # type: ignore[union-attr]
+        )
+
+    def test_loaders_are_cached_separately(self) -> None:
+        load_bus_database(self.dbc)
+        matrices = load_can_matrices(self.dbc)
+        self.assertEqual(list(matrices), [""])
+        db = load_cantools_database([self.dbc])
+        self.assertEqual(db.get_message_by_name("Msg").frame_id, 256)
+        self.assertEqual(len(list((self.dir / "cache").glob("*.pickle"))), 3)
+
+    def test_unreadable_cache_file_is_replaced(self) -> None:
+        load_can_matrices(self.dbc)
+        (cache_file,) = (self.dir / "cache").glob("*.pickle")
+        cache_file.write_bytes(b"not a pickle")
+        hits, misses = self._counts()
+        self.assertIn("", load_can_matrices(self.dbc))
+        self.assertEqual(self._counts(), (hits, misses + 1))
+        self.assertIn("", load_can_matrices(self.dbc))
+        self.assertEqual(self._counts(), (hits + 1, misses + 1))
+
+
+PRUNE_DBC = """VERSION ""
+
+BU_: ECU
+
+BO_ 256 Msg: 8 ECU
+ SG_ Sig : 0|16@1+ (1,0) [0|65535] "" Vector__XXX
+ SG_ Msg_CRC : 56|8@1+ (1,0) [0|255] "" Vector__XXX
+
+BO_ 257 Muxed: 8 ECU
+ SG_ Muxed_mux M : 0|8@1+ (1,0) [0|255] "" Vector__XXX
+ SG_ ValueA m0 : 8|16@1+ (1,0) [0|65535] "" Vector__XXX
+ SG_ ValueB m1 : 8|16@1+ (1,0) [0|65535] "" Vector__XXX
+
+BO_ 258 Checks: 8 ECU
+ SG_ NChecksum : 0|8@1+ (1,0) [0|255] "" Vector__XXX
+"""
+
+RULES = SignalRules(
+    exclude_signals=["NChecksum"], exclude_substrings=["crc", "mux"]
+)
+
+
+class SignalRulesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.dbc = self.dir / "bus.dbc"
+        self.dbc.write_text(PRUNE_DBC)
+        configure_dbc_cache(self.dir / "cache")
+        self.addCleanup(configure_dbc_cache, DBC_CACHE_DIR)
+
+    def _layout(self, rules: SignalRules | None) -> dict[str, list[str]]:
+        matrix = load_bus_database(self.dbc, rules)
+        return {
+            frame.name: sorted(s.name for s in frame.signals)
+            for frame in matrix.frames  # type: ignore[union-attr]
+        }
+
+    def test_prunes_excluded_signals_but_keeps_multiplexors(self) -> None:
+        self.assertEqual(
+            self._layout(RULES),
+            {"Msg": ["Sig"], "Muxed": ["Muxed_mux", "ValueA", "ValueB"]},
+        )
+        self.assertTrue(RULES.skips("Muxed_mux"))
+        # The unpruned database and every rule set are cached separately.
+        self.assertEqual(len(self._layout(None)), 3)
+        self.assertEqual(
+            self._layout(SignalRules(include_signals=["valuea"])),
+            {"Muxed": ["Muxed_mux", "ValueA", "ValueB"]},
+        )
+        self.assertEqual(
+            self._layout(SignalRules(exclude_messages=["MSG"])).keys(),
+            {"Muxed", "Checks"},
+        )
+        self.assertEqual(len(list((self.dir / "cache").glob("*.pickle"))), 4)
+
+    def test_pruned_signals_are_never_decoded(self) -> None:
+        from decoder.sending import normalize_dbc_entries
+
+        log = self.dir / "log.mf4"
+        writer = can.Logger(str(log))
+        for idx, arbitration_id in enumerate((256, 257, 258)):
+            writer.on_message_received(
+                can.Message(
+                    timestamp=1.7e9 + idx,
+                    arbitration_id=arbitration_id,
+                    is_extended_id=False,
+                    data=bytes(8),
+                    channel=0,
+                )
+            )
+        writer.stop()
+
+        def decoded_names(rules: SignalRules | None) -> set[str]:
+            dbc_files = normalize_dbc_entries([self.dbc], rules)
+            with MDF(log) as mdf:
+                decoded = mdf.extract_bus_logging(database_files={"CAN": dbc_files})
+            names = {sig.name for sig in decoded.iter_channels()}
+            decoded.close()
+            return names
+
+        self.assertLessEqual({"Msg_CRC", "NChecksum"}, decoded_names(None))
+        # The multiplexor stays to select ValueA (mux value 0).
+        self.assertEqual(decoded_names(RULES), {"Sig", "Muxed_mux", "ValueA"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import numpy as np
+from asammdf import MDF, Signal
+
+from decoder.deadband import (
+    DeadbandConfig,
+    configure_deadband,
+    deadband_mask,
+    get_deadband_stats,
+)
+from decoder.sending import send_decoded
+
+
+def _reference_mask(values, timestamps, deadband, heartbeat):
+    kept = [0]
+    for i in range(1, len(values)):
+        last = kept[-1]
+        if (
+            abs(values[i] - values[last]) > deadband
+            or (heartbeat > 0 and timestamps[i] >= timestamps[last] + heartbeat)
+            or i == len(values) - 1
+        ):
+            kept.append(i)
+    mask = np.zeros(len(values), dtype=bool)
+    mask[kept] = True
+    return mask
+
+
+class DeadbandMaskTest(unittest.TestCase):
+    def test_keeps_first_last_changes_and_heartbeats(self) -> None:
+        timestamps = np.arange(10, dtype=np.float64)
+        values = np.array([1, 1, 1, 1, 2, 2, 2, 2.05, 2, 2], dtype=np.float64)
+        mask = deadband_mask(values, timestamps, deadband=0.1, heartbeat=3)
+        self.assertEqual(np.flatnonzero(mask).tolist(), [0, 3, 4, 7, 9])
+
+        mask = deadband_mask(values, timestamps, deadband=0, heartbeat=0)
+        self.assertEqual(np.flatnonzero(mask).tolist(), [0, 4, 7, 8, 9])
+
+    def test_matches_sequential_reference(self) -> None:
+        rng = np.random.default_rng(11)
+        for _ in range(50):
+            n = int(rng.integers(1, 2_000))
+            timestamps = np.cumsum(rng.uniform(0.001, 0.5, n))
+            steps = rng.normal(size=n) * (rng.random(n) < 0.05)
+            values = np.round(np.cumsum(steps), 1)
+            deadband = float(rng.choice([0.0, 0.5, 2.0]))
+            heartbeat = float(rng.choice([0.0, 5.0, 60.0]))
+            np.testing.assert_array_equal(
+                deadband_mask(values, timestamps, deadband, heartbeat),
+                _reference_mask(values, timestamps, deadband, heartbeat),
+            )
+
+    def test_rules_per_job(self) -> None:
+        config = DeadbandConfig(
+            jobs={"Upper*": {"Temp*": (0.5, 30.0)}},
+            dbc_rules={"State": (0.0, 60.0)},
+        )
+        self.assertEqual(config.rule_for("Upper_rig", "TempOil"), (0.5, 30.0))
+        self.assertIsNone(config.rule_for("Lower", "TempOil"))
+        self.assertEqual(config.rule_for("Lower", "State"), (0.0, 60.0))
+
+
+class Response:
+    status_code = 204
+    text = ""
+
+
+class SendDecodedDeadbandTest(unittest.TestCase):
+    def test_steady_signal_is_reduced(self) -> None:
+        mdf = MDF()
+        mdf.start_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        timestamps = np.arange(1_000, dtype=np.float64) * 0.1
+        mdf.append(
+            [
+                Signal(
+                    samples=np.repeat([0.0, 1.0], 500),
+                    timestamps=timestamps,
+                    name="State",
+                    display_names={
+                        "CAN1.Msg.State": "bus",
+                        "Msg.State": "message",
+                    },
+                ),
+                Signal(
+                    samples=np.arange(1_000, dtype=np.float64),
+                    timestamps=timestamps,
+                    name="Counter",
+                    display_names={
+                        "CAN1.Msg.Counter": "bus",
+                        "Msg.Counter": "message",
+                    },
+                ),
+            ]
+        )
+
+        configure_deadband(jobs={"Upper": {"State": (0.0, 30.0)}})
+        self.addCleanup(configure_deadband, enabled=False)
+        before = get_deadband_stats()
+        for sink in ("json", "influx"):
+            with patch(
+                "decoder.vm_client.requests.Session.post", return_value=Response()
+            ):
+                counts = send_decoded(
+                    mdf,
+                    server="http://vm",
+                    job="Upper",
+                    sink=sink,  # type: ignore[arg-type]
+                )
+            # 0, 30 s and 60 s heartbeats, the step at 50 s and the last sample.
+            self.assertEqual(counts, {"State": 5, "Counter": 1_000})
+
+        stats = get_deadband_stats()
+        self.assertEqual(stats["samples_in"] - before["samples_in"], 2_000)
+        self.assertEqual(stats["samples_out"] - before["samples_out"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import can
+import numpy as np
+from asammdf import MDF
+from canmatrix import formats as canmatrix_formats
+
+from decoder.decode_pool import iter_decoded_batches
+
+DBC = Path(__file__).parent / "B3SR" / "dbc" / "b3sr_base.dbc"
+
+
+def _write_can_log(path: Path, start: float, count: int) -> None:
+    frame = canmatrix_formats.loadp_flat(str(DBC)).frames[0]
+    writer = can.Logger(str(path))
+    for idx in range(count):
+        writer.on_message_received(
+            can.Message(
+                timestamp=start + idx * 0.1,
+                arbitration_id=frame.arbitration_id.id,
+                is_extended_id=frame.arbitration_id.extended,
+                data=bytes([idx % 256] * frame.size),
+                channel=0,
+            )
+        )
+    writer.stop()
+
+
+class DecodePoolTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.files = [self.tmp / "a.mf4", self.tmp / "b.mf4"]
+        _write_can_log(self.files[0], 1.7e9, 30)
+        _write_can_log(self.files[1], 1.7e9 + 10, 20)
+        self.dbc = [(str(DBC), 0)]
+
+    def test_worker_batches_match_in_process_decoding(self) -> None:
+        for transport in ("mf4", "shm"):
+            with self.subTest(transport=transport):
+                self._check_transport(transport)
+
+    def _check_transport(self, transport: str) -> None:
+        with MDF().stack(self.files) as mdf:
+            expected = mdf.extract_bus_logging(
+                database_files={"CAN": self.dbc},
+                ignore_value2text_conversion=True,
+            )
+            expected_samples = {
+                sig.name: sig.samples.copy() for sig in expected.iter_channels()
+            }
+
+        results = {}
+        with self.assertLogs("DecodePool", level="ERROR"):
+            for tag, decoded in iter_decoded_batches(
+                [
+                    ("stacked", self.files, self.dbc),
+                    ("missing", [self.tmp / "missing.mf4"], self.dbc),
+                ],
+                processes=2,
+                spill_dir=self.tmp,
+                transport=transport,  # type: ignore[arg-type]
+            ):
+                results[tag] = (
+                    None
+                    if decoded is None
+                    else {s.name: s.samples.copy() for s in decoded.iter_channels()}
+                )
+
+        self.assertIsNone(results["missing"])
+        self.assertEqual(results["stacked"].keys(), expected_samples.keys())
+        for name, samples in expected_samples.items():
+            np.testing.assert_array_equal(results["stacked"][name], samples)
+        # Spilled MF4 files are removed once the caller moved on.
+        self.assertEqual(sorted(self.tmp.glob("vm-decode-*")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+
+from decoder.config import DBC_CACHE_DIR
+from decoder.dbc_cache import configure_dbc_cache, load_bus_database
+from decoder.ledger import IngestLedger, dbc_set_hash, local_entry, s3_entry
+from decoder.sending import SendResult
+
+DBC = """VERSION ""
+
+BU_: ECU
+
+BO_ 256 Msg: 8 ECU
+ SG_ Sig : 0|16@1+ (0.1,0) [0|6553.5] "V" Vector__XXX
+"""
+
+
+class IngestLedgerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.dbc = self.dir / "bus.dbc"
+        self.dbc.write_text(DBC)
+        self.ledger = IngestLedger(self.dir / "ledger.sqlite")
+        self.addCleanup(self.ledger.close)
+
+    def test_skips_sent_s3_objects_until_etag_or_dbc_changes(self) -> None:
+        item = {"Key": "6C1D6B77/00001/00000001.MF4", "ETag": '"abc"'}
+        entry = s3_entry("bucket", item)
+        self.assertEqual(entry, ("s3://bucket/6C1D6B77/00001/00000001.MF4", "abc"))
+
+        self.ledger.use_dbc_set("Upper", [(str(self.dbc), 0)])
+        self.assertFalse(self.ledger.is_ingested(entry, "Upper"))
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.ledger.record(entry, "Upper", {"Sig": 10}, (start, start))
+        self.assertTrue(self.ledger.is_ingested(entry, "Upper"))
+        # Same object, other job.
+        self.ledger.use_dbc_set("Lower", [(str(self.dbc), 0)])
+        self.assertFalse(self.ledger.is_ingested(entry, "Lower"))
+
+        changed = s3_entry("bucket", {**item, "ETag": '"def"'})
+        self.assertFalse(self.ledger.is_ingested(changed, "Upper"))
+
+        self.dbc.write_text(DBC.replace("0.1,0", "0.01,0"))
+        self.ledger.use_dbc_set("Upper", [(str(self.dbc), 0)])
+        self.assertFalse(self.ledger.is_ingested(entry, "Upper"))
+        self.assertEqual(self.ledger.stale, 2)
+        self.assertEqual(self.ledger.skipped, 1)
+        self.assertEqual(self.ledger.stats(), {"Upper": {"files": 1, "samples": 10}})
+
+    def test_local_files_resend_when_touched(self) -> None:
+        mf4 = self.dir / "00000001.MF4"
+        mf4.write_bytes(b"x" * 10)
+        self.ledger.use_dbc_set("B3SR", [(str(self.dbc), 0)])
+        self.ledger.record_files([mf4], "B3SR", {"Sig": 3})
+        self.assertTrue(self.ledger.is_ingested(local_entry(mf4), "B3SR"))
+
+        stat = mf4.stat()
+        os.utime(mf4, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertFalse(self.ledger.is_ingested(local_entry(mf4), "B3SR"))
+
+    def test_stack_counts_are_kept_once(self) -> None:
+        files = [self.dir / f"0000000{i}.MF4" for i in range(3)]
+        for path in files:
+            path.write_bytes(b"x")
+        self.ledger.use_dbc_set("B3SR", [(str(self.dbc), 0)])
+        self.ledger.record_files(files, "B3SR", {"Sig": 9})
+        self.assertEqual(self.ledger.stats(), {"B3SR": {"files": 3, "samples": 9}})
+
+        for path in files:
+            self.assertTrue(self.ledger.is_ingested(local_entry(path), "B3SR"))
+        self.assertEqual(self.ledger.skipped_samples, 9)
+        stacks = {
+            row[0]
+            for row in self.ledger._db.execute("SELECT stack FROM ingested")
+        }
+        self.assertEqual(stacks, {local_entry(files[0])[0]})
+
+    def test_failed_send_is_not_recorded(self) -> None:
+        entry = s3_entry("bucket", {"Key": "a.MF4", "ETag": '"abc"'})
+        self.ledger.use_dbc_set("Upper", [(str(self.dbc), 0)])
+        self.ledger.record(entry, "Upper", SendResult({"Sig": 5}, failures=1))
+        self.assertFalse(self.ledger.is_ingested(entry, "Upper"))
+        self.assertEqual(self.ledger.held_back, 1)
+        self.ledger.record(entry, "Upper", SendResult({"Sig": 10}))
+        self.assertTrue(self.ledger.is_ingested(entry, "Upper"))
+
+    def test_in_memory_dbc_hash_covers_units_and_value_tables(self) -> None:
+        configure_dbc_cache(self.dir / "cache")
+        self.addCleanup(configure_dbc_cache, DBC_CACHE_DIR)
+
+        def matrix_hash(text: str) -> str:
+            self.dbc.write_text(text)
+            return dbc_set_hash([(load_bus_database(self.dbc), 0)])
+
+        base = matrix_hash(DBC)
+        self.assertNotEqual(base, matrix_hash(DBC.replace('"V"', '"mV"')))
+        self.assertNotEqual(
+            base, matrix_hash(DBC + 'VAL_ 256 Sig 0 "Off" 1 "On" ;\n')
+        )
+
+    def test_dbc_hash_ignores_entry_order(self) -> None:
+        other = self.dir / "other.dbc"
+        other.write_text(DBC.replace("Sig", "Other"))
+        self.assertEqual(
+            dbc_set_hash([(str(self.dbc), 0), (str(other), 0)]),
+            dbc_set_hash([(str(other), 0), (str(self.dbc), 0)]),
+        )
+        self.assertNotEqual(
+            dbc_set_hash([(str(self.dbc), 0)]), dbc_set_hash([(str(self.dbc), 1)])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
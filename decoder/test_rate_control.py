@@ -0,0 +1,51 @@
+import unittest
+from unittest.mock import patch
+
+from decoder.rate_control import AIMDController, classify_status
+
+
+class AIMDControllerTest(unittest.TestCase):
+    def test_window_grows_on_fast_answers_and_is_capped(self) -> None:
+        controller = AIMDController(
+            initial_window=2, min_window=1, max_window=4, target_latency=1.0
+        )
+        for _ in range(50):
+            self.assertTrue(controller.acquire(timeout=0))
+            controller.release(0.01, "ok")
+        self.assertEqual(controller.window, 4)
+        self.assertEqual(controller.batch_size(1000), 1000)
+
+    def test_congestion_cuts_window_and_batch_once_per_interval(self) -> None:
+        controller = AIMDController(
+            initial_window=16, min_window=1, max_window=64, target_latency=1.0
+        )
+        with patch("decoder.rate_control.time.monotonic", return_value=100.0):
+            for outcome in ("throttled", "error", "ok"):
+                controller.acquire(timeout=0)
+                controller.release(5.0 if outcome == "ok" else 0.1, outcome)  # type: ignore[arg-type]
+        self.assertEqual(controller.window, 8)
+        self.assertEqual(controller.batch_size(1000), 500)
+        self.assertEqual(controller.snapshot()["slow_requests"], 1)
+
+        controller.acquire(timeout=0)
+        controller.release(0.1, "rejected")
+        self.assertEqual(controller.window, 8)
+
+    def test_window_limits_in_flight_requests(self) -> None:
+        controller = AIMDController(initial_window=2, min_window=1)
+        self.assertTrue(controller.try_acquire())
+        self.assertTrue(controller.try_acquire())
+        self.assertFalse(controller.acquire(timeout=0.01))
+        controller.release(0.01, "ok")
+        self.assertTrue(controller.try_acquire())
+
+    def test_classify_status(self) -> None:
+        self.assertEqual(classify_status(204), "ok")
+        self.assertEqual(classify_status(429), "throttled")
+        self.assertEqual(classify_status(503), "throttled")
+        self.assertEqual(classify_status(502), "error")
+        self.assertEqual(classify_status(400), "rejected")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import json
+import unittest
+from datetime import datetime, timezone
+from typing import Any
+from unittest.mock import patch
+
+import numpy as np
+from asammdf import MDF, Signal
+
+from decoder.rollups import compute_rollups, get_rollup_stats
+from decoder.sending import send_decoded
+
+
+class ComputeRollupsTest(unittest.TestCase):
+    def test_matches_per_bucket_reference(self) -> None:
+        rng = np.random.default_rng(5)
+        timestamps = np.sort(rng.integers(0, 120_000, 5_000)).astype(np.int64)
+        values = rng.normal(size=timestamps.size)
+
+        bucket_ts, aggregates = compute_rollups(values, timestamps, 10_000)
+
+        expected_ts = sorted(set((timestamps // 10_000 * 10_000).tolist()))
+        self.assertEqual(bucket_ts.tolist(), expected_ts)
+        for i, start in enumerate(expected_ts):
+            in_window = (timestamps >= start) & (timestamps < start + 10_000)
+            in_bucket = values[in_window]
+            self.assertEqual(aggregates["min"][i], in_bucket.min())
+            self.assertEqual(aggregates["max"][i], in_bucket.max())
+            self.assertAlmostEqual(aggregates["avg"][i], in_bucket.mean())
+            self.assertEqual(aggregates["last"][i], in_bucket[-1])
+
+
+class Response:
+    status_code = 204
+    text = ""
+
+
+def _speed_mdf(first: int, count: int) -> MDF:
+    mdf = MDF()
+    mdf.start_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    mdf.append(
+        [
+            Signal(
+                samples=np.arange(first, first + count, dtype=np.float64),
+                timestamps=np.arange(first, first + count, dtype=np.float64)
+                * 0.1,
+                name="Speed",
+                unit="rpm",
+                display_names={
+                    "CAN1.Msg.Speed": "bus",
+                    "Msg.Speed": "message",
+                },
+            )
+        ]
+    )
+    return mdf
+
+
+def _sent_series(post: Any) -> dict[str, dict[str, Any]]:
+    series = {}
+    for call in post.call_args_list:
+        for line in call.kwargs["data"].decode().splitlines():
+            record = json.loads(line)
+            series[record["metric"]["__name__"]] = record
+    return series
+
+
+class SendDecodedRollupsTest(unittest.TestCase):
+    def test_rollup_series_are_sent_without_touching_counts(self) -> None:
+        mdf = _speed_mdf(0, 1_200)
+
+        before = get_rollup_stats()
+        with patch(
+            "decoder.vm_client.requests.Session.post", return_value=Response()
+        ) as post:
+            counts = send_decoded(
+                mdf, server="http://vm", job="Upper", rollups=True
+            )
+
+        self.assertEqual(counts, {"Speed": 1_200})
+        series = _sent_series(post)
+        self.assertEqual(len(series), 1 + 3 * 4)
+
+        one_minute = series["Speed:1m_max"]
+        self.assertEqual(
+            one_minute["metric"],
+            {
+                "__name__": "Speed:1m_max",
+                "job": "Upper",
+                "rollup": "1m",
+                "rollup_message": "Msg",
+                "unit": "rpm",
+            },
+        )
+        self.assertEqual(one_minute["values"], [599.0, 1199.0])
+        self.assertEqual(len(series["Speed:1s_avg"]["values"]), 120)
+
+        stats = get_rollup_stats()
+        self.assertEqual(stats["series"] - before["series"], 12)
+        self.assertEqual(
+            stats["samples_out"] - before["samples_out"], 4 * (120 + 12 + 2)
+        )
+
+    def test_buckets_cut_by_file_boundaries_are_skipped(self) -> None:
+        # Two files split at 90 s: the 1m bucket at 60 s holds samples of both.
+        before = get_rollup_stats()
+        written: list[list[int]] = []
+        for first, count in ((0, 900), (900, 900)):
+            with patch(
+                "decoder.vm_client.requests.Session.post",
+                return_value=Response(),
+            ) as post:
+                send_decoded(
+                    _speed_mdf(first, count),
+                    server="http://vm",
+                    job="Upper",
+                    rollups=True,
+                )
+            series = _sent_series(post)
+            self.assertEqual(len(series["Speed:1s_avg"]["values"]), 90)
+            written.append(series.get("Speed:1m_max", {}).get("timestamps", []))
+
+        start_ms = int(_speed_mdf(0, 1).start_time.timestamp() * 1e3)
+        self.assertEqual(written, [[start_ms], [start_ms + 120_000]])
+        # 1m: the 60 s bucket in both files; 10s: 90 s is a bucket boundary.
+        stats = get_rollup_stats()
+        self.assertEqual(stats["edge_buckets"] - before["edge_buckets"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+
+from decoder.s3_pipeline import S3StreamingPipeline
+
+
+class S3StreamingPipelineTest(unittest.TestCase):
+    def test_stages_overlap_and_files_in_flight_are_bounded(self) -> None:
+        lock = threading.Lock()
+        active = {"now": 0, "peak": 0}
+
+        def download(item: int) -> str:
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(0.02)
+            return f"raw{item}"
+
+        def decode(item: int, raw: str) -> str:
+            time.sleep(0.02)
+            return raw.replace("raw", "decoded")
+
+        def send(item: int, decoded: str) -> dict[str, int]:
+            time.sleep(0.02)
+            with lock:
+                active["now"] -= 1
+            return {decoded: item}
+
+        pipeline = S3StreamingPipeline(
+            download, decode, send, max_active_files=3, download_workers=2
+        )
+        start = time.time()
+        results = list(pipeline.run(range(12)))
+        elapsed = time.time() - start
+
+        self.assertEqual(sorted(r.index for r in results), list(range(12)))
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual(
+            {r.item: r.value for r in results},
+            {item: {f"decoded{item}": item} for item in range(12)},
+        )
+        self.assertLessEqual(active["peak"], 3)
+        # Sequential would take 12 * 3 * 0.02s.
+        self.assertLess(elapsed, 0.6)
+        self.assertIn("<= 3 files in flight", pipeline.format_summary())
+
+    def test_failed_items_skip_later_stages(self) -> None:
+        sent: list[int] = []
+
+        def decode(item: int, raw: int) -> int:
+            if item == 2:
+                raise ValueError("corrupt MF4")
+            return raw
+
+        pipeline = S3StreamingPipeline(
+            download=lambda item: None if item == 1 else item,
+            decode=decode,
+            send=lambda item, decoded: sent.append(item) or {},
+        )
+        with self.assertLogs("S3StreamingPipeline", level="ERROR"):
+            results = {r.item: r for r in pipeline.run(range(4))}
+
+        self.assertEqual(sorted(sent), [0, 3])
+        self.assertEqual(
+            [item for item, r in sorted(results.items()) if r.ok], [0, 3]
+        )
+        self.assertEqual(pipeline.failed, {"download": 1, "decode": 1, "send": 0})
+
+    def test_early_stop_discards_undecoded_downloads(self) -> None:
+        discarded: list[str] = []
+        gate = threading.Event()
+
+        def decode(item: int, raw: str) -> str:
+            if item > 0:
+                gate.wait(1.0)
+            return raw
+
+        pipeline = S3StreamingPipeline(
+            download=lambda item: f"raw{item}",
+            decode=decode,
+            send=lambda item, decoded: decoded,
+            max_active_files=3,
+            discard=discarded.append,
+        )
+        results = pipeline.run(range(10))
+        first = next(results)
+        time.sleep(0.05)
+        threading.Timer(0.05, gate.set).start()
+        results.close()
+
+        # raw1 was being decoded when the run stopped, raw2 was still queued.
+        self.assertEqual(first.value, "raw0")
+        self.assertIn("raw2", discarded)
+        self.assertNotIn("raw1", discarded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import numpy as np
+from asammdf import MDF, Signal
+
+from decoder.sending import send_decoded
+
+
+def _signal(name: str, samples, timestamps) -> Signal:
+    return Signal(
+        samples=np.asarray(samples),
+        timestamps=np.asarray(timestamps, dtype=np.float64),
+        name=name,
+        unit="V",
+        display_names={f"CAN1.Msg.{name}": "bus", f"Msg.{name}": "message"},
+    )
+
+
+class Response:
+    status_code = 204
+    text = ""
+
+
+class Flags:
+    status_code = 200
+
+    def __init__(self, skip_measurement: bool):
+        self.text = (
+            '-httpListenAddr=":8428"\n'
+            f'-influxSkipMeasurement="{str(skip_measurement).lower()}"\n'
+        )
+
+
+class InfluxSinkTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mdf = MDF()
+        self.mdf.start_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        timestamps = [0.0, 0.5, 1.0]
+        self.mdf.append(
+            [
+                _signal("SigA", [1.0, np.nan, 3.0], timestamps),
+                _signal("SigB", np.array([4, 5, 6], dtype=np.uint8), timestamps),
+            ]
+        )
+        checks = patch.dict("decoder.sending._influx_checks", clear=True)
+        checks.start()
+        self.addCleanup(checks.stop)
+        flags = patch(
+            "decoder.vm_client.requests.Session.get", return_value=Flags(True)
+        )
+        flags.start()
+        self.addCleanup(flags.stop)
+
+    def test_counts_match_json_sink(self) -> None:
+        with patch("decoder.vm_client.requests.Session.post", return_value=Response()):
+            json_counts = send_decoded(
+                self.mdf, server="http://vm", job="Upper", sink="json"
+            )
+        with patch(
+            "decoder.vm_client.requests.Session.post", return_value=Response()
+        ) as post:
+            influx_counts = send_decoded(
+                self.mdf, server="http://vm", job="Upper", sink="influx"
+            )
+
+        self.assertEqual(json_counts, {"SigA": 2, "SigB": 3})
+        self.assertEqual(influx_counts, json_counts)
+        post.assert_called_once()
+        self.assertTrue(post.call_args.args[0].endswith("/influx/write"))
+        self.assertEqual(post.call_args.kwargs["params"], {"precision": "ms"})
+        self.assertEqual(
+            post.call_args.kwargs["data"].decode().splitlines(),
+            [
+                "Msg,job=Upper,message=Msg,unit=V SigA=1.0,SigB=4.0 1767225600000",
+                "Msg,job=Upper,message=Msg,unit=V SigB=5.0 1767225600500",
+                "Msg,job=Upper,message=Msg,unit=V SigA=3.0,SigB=6.0 1767225601000",
+            ],
+        )
+
+    def test_falls_back_to_json_without_skip_measurement(self) -> None:
+        with patch(
+            "decoder.vm_client.requests.Session.get", return_value=Flags(False)
+        ), patch(
+            "decoder.vm_client.requests.Session.post", return_value=Response()
+        ) as post:
+            counts = send_decoded(
+                self.mdf, server="http://vm", job="Upper", sink="influx"
+            )
+
+        self.assertEqual(counts, {"SigA": 2, "SigB": 3})
+        self.assertEqual(
+            {call.args[0] for call in post.call_args_list},
+            {"http://vm/api/v1/import"},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
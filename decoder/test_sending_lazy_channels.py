@@ -0,0 +1,104 @@
+import tempfile
+import threading
+import time
+import unittest
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+from asammdf import MDF, Signal
+
+from decoder.sending import decoded_has_channels, probe_decoded_span, send_decoded
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class CountingSignals:
+    """
+    DecodedSignals that builds its signals on demand and tracks how many
+    were handed out but not yet released.
+    """
+
+    def __init__(self, count: int):
+        self.name = Path("counting.mf4")
+        self.start_time = START
+        self.count = count
+        self.live = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _signal(self, index: int) -> Signal:
+        with self._lock:
+            self.live += 1
+            self.peak = max(self.peak, self.live)
+        return Signal(
+            samples=np.arange(10, dtype=np.float64),
+            timestamps=np.arange(10, dtype=np.float64),
+            name=f"Sig{index}",
+            display_names={f"CAN1.Msg.Sig{index}": "bus", "Msg.Sig": "message"},
+        )
+
+    def iter_channels(self) -> Iterator[Signal]:
+        for index in range(self.count):
+            yield self._signal(index)
+
+    def iter_channel_groups(self) -> Iterator[list[Signal]]:
+        for index in range(self.count):
+            yield [self._signal(index)]
+
+    def release_signals(self, signals: list[Signal]) -> None:
+        with self._lock:
+            self.live -= len(signals)
+
+
+def _slow_send(signal: Signal, **kwargs: object) -> int:
+    time.sleep(0.002)
+    return len(signal.samples)
+
+
+class LazyChannelSchedulingTest(unittest.TestCase):
+    def test_signals_in_flight_are_bounded(self) -> None:
+        decoded = CountingSignals(200)
+        with patch(
+            "decoder.sending.send_signal_using_json_lines", side_effect=_slow_send
+        ), patch("decoder.sending._pending_per_worker", 2):
+            counts = send_decoded(
+                decoded,  # type: ignore[arg-type]
+                server="http://127.0.0.1:1",
+                job="Upper",
+                max_thread_workers=4,
+                engine="threads",
+            )
+
+        self.assertEqual(len(counts), 200)
+        self.assertEqual(sum(counts.values()), 2000)
+        self.assertEqual(decoded.live, 0)
+        self.assertLessEqual(decoded.peak, 4 * 2 + 1)
+
+    def test_probe_matches_channel_scan(self) -> None:
+        mdf = MDF()
+        mdf.start_time = START
+        mdf.append(
+            [Signal(np.arange(5.0), np.arange(5.0) + 2, name="A")], comment="A"
+        )
+        mdf.append(
+            [Signal(np.arange(3.0), np.arange(3.0) + 0.5, name="B")],
+            comment="B",
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = mdf.save(Path(tmp) / "probe.mf4", overwrite=True)
+            with MDF(path) as saved:
+                self.assertTrue(decoded_has_channels(saved))
+                self.assertEqual(
+                    probe_decoded_span(saved),
+                    (START + timedelta(seconds=0.5), START + timedelta(seconds=6)),
+                )
+
+        self.assertFalse(decoded_has_channels(MDF()))
+        self.assertIsNone(probe_decoded_span(MDF()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import numpy as np
+from asammdf import Signal
+
+from decoder.sending import send_signal
+
+
+class SendSignalTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.start_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.signal = Signal(
+            samples=np.arange(10, dtype=np.float64),
+            timestamps=np.arange(10, dtype=np.float64),
+            name="Sig",
+            display_names={"CAN1.Msg.Sig": "bus", "Msg.Sig": "message"},
+        )
+
+    def _send(self, **kwargs) -> int:
+        return send_signal(
+            self.signal,
+            self.start_time,
+            job="Upper",
+            server="http://vm",
+            skip_signal_range_check=True,
+            batch_size=4,
+            **kwargs,
+        )
+
+    def test_counts_only_accepted_batches(self) -> None:
+        with patch(
+            "decoder.sending._post_import_batch", side_effect=[True, False, True]
+        ) as post:
+            self.assertEqual(self._send(), 4 + 2)
+        self.assertEqual(post.call_count, 3)
+
+    def test_print_only_run_counts_every_sample(self) -> None:
+        with patch("decoder.sending._post_import_batch") as post:
+            self.assertEqual(self._send(send_signal=False), 10)
+        post.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+from asammdf import Signal
+
+from decoder.sending import signal_to_vm_arrays, is_valid_sample
+
+
+def _reference(signal: Signal, start_time: datetime):
+    values: list[float] = []
+    timestamps: list[int] = []
+    for sample, ts in zip(signal.samples, signal.timestamps):
+        if not is_valid_sample(sample) or float(sample) != float(sample):
+            continue
+        values.append(float(sample))
+        timestamps.append(
+            int((start_time + timedelta(seconds=ts)).timestamp() * 1e3)
+        )
+    return values, timestamps
+
+
+class SignalToVmArraysTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.start_time = datetime(
+            2026, 1, 1, 8, 30, 12, 345678, tzinfo=timezone.utc
+        )
+
+    def test_matches_per_sample_conversion(self) -> None:
+        rng = np.random.default_rng(7)
+        timestamps = np.cumsum(rng.uniform(0.0001, 0.02, 20_000))
+        for samples in (
+            rng.normal(size=timestamps.size),
+            rng.integers(0, 255, timestamps.size).astype(np.uint8),
+            rng.normal(size=timestamps.size).astype(np.float32),
+        ):
+            signal = Signal(samples=samples, timestamps=timestamps, name="Sig")
+            values, ts_ms = signal_to_vm_arrays(signal, self.start_time)
+            ref_values, ref_ts = _reference(signal, self.start_time)
+            self.assertEqual(values.tolist(), ref_values)
+            self.assertEqual(ts_ms.tolist(), ref_ts)
+
+    def test_masks_nan_and_non_numeric(self) -> None:
+        signal = Signal(
+            samples=np.array([1.0, np.nan, 3.0]),
+            timestamps=np.array([0.0, 1.0, 2.0]),
+            name="Sig",
+        )
+        values, ts_ms = signal_to_vm_arrays(signal, self.start_time)
+        self.assertEqual(values.tolist(), [1.0, 3.0])
+        self.assertEqual(len(ts_ms), 2)
+
+        signal = Signal(
+            samples=np.array([b"on", b"1.5", b"off"]),
+            timestamps=np.array([0.0, 1.0, 2.0]),
+            name="Text",
+        )
+        values, ts_ms = signal_to_vm_arrays(signal, self.start_time)
+        self.assertEqual(values.tolist(), [1.5])
+        self.assertEqual(
+            ts_ms.tolist(), [int(self.start_time.timestamp() * 1e3) + 1000]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,20 @@
+import json
 import unittest
 from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock, patch
 
-from asammdf import Signal
+import numpy as np
+from asammdf import MDF, Signal
 
-from decoder.sending import _apply_job_watermark
+from decoder.rate_control import AIMDController
+from decoder.sending import (
+    IngestWatermark,
+    SendResult,
+    SeriesWatermarks,
+    _apply_job_watermark,
+    check_signal_range,
+    send_decoded,
+)
 
 
 class SignalWatermarkTest(unittest.TestCase):
@@ -14,6 +25,7 @@ class SignalWatermarkTest(unittest.TestCase):
             timestamps=[0.0, 1.0, 2.0, 3.0],
             name="TestSignal",
             unit="u",
+            display_names={"CAN1.Msg.TestSignal": "bus", "Msg.TestSignal": "message"},
         )
 
     def test_returns_none_when_watermark_covers_signal(self) -> None:
@@ -43,6 +55,207 @@ class SignalWatermarkTest(unittest.TestCase):
         self.assertEqual(list(result.timestamps), [2.0, 3.0])
         self.assertEqual(list(result.samples), [3, 4])
 
+    def test_series_watermarks_trim_each_series_on_its_own(self) -> None:
+        watermarks = SeriesWatermarks(
+            {
+                ("TestSignal", "Msg"): self.start_time + timedelta(seconds=0.5),
+                ("Other", "Msg"): self.start_time + timedelta(seconds=10),
+            }
+        )
+        result = _apply_job_watermark(self.signal, self.start_time, watermarks)
+        self.assertIsNotNone(result)
+        self.assertEqual(list(result.timestamps), [1.0, 2.0, 3.0])
+
+        # A series VM has never seen is sent in full.
+        result = _apply_job_watermark(
+            self.signal, self.start_time, SeriesWatermarks({})
+        )
+        self.assertIs(result, self.signal)
+
+    def test_range_probe_keeps_samples_outside_coverage(self) -> None:
+        start_s = self.start_time.timestamp()
+        response = MagicMock(status_code=200)
+        response.json.return_value = {
+            "data": {
+                "result": [
+                    {"metric": {"bound": "first"}, "value": [0, str(start_s + 1)]},
+                    {"metric": {"bound": "last"}, "value": [0, str(start_s + 2)]},
+                ]
+            }
+        }
+        with patch(
+            "decoder.vm_client.requests.Session.get", return_value=response
+        ) as get:
+            result = check_signal_range(self.signal, self.start_time, "http://vm")
+
+        self.assertEqual(list(result.timestamps), [0.0, 3.0])
+        self.assertEqual(list(result.samples), [1, 4])
+        self.assertIn("tlast_over_time", get.call_args.kwargs["params"]["query"])
+
+        response.json.return_value = {"data": {"result": []}}
+        with patch("decoder.vm_client.requests.Session.get", return_value=response):
+            result = check_signal_range(self.signal, self.start_time, "http://vm")
+        self.assertIs(result, self.signal)
+
+
+class IngestWatermarkTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.start_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.mdf = self._mdf(0)
+        controller = patch("decoder.rate_control._controller", AIMDController())
+        controller.start()
+        self.addCleanup(controller.stop)
+        self.ingest_watermark: float | None = None
+        self.series_watermarks: dict[str, float] = {}
+        self.get = patch(
+            "decoder.vm_client.requests.Session.get", side_effect=self._query
+        ).start()
+        self.post = patch(
+            "decoder.vm_client.requests.Session.post",
+            return_value=MagicMock(status_code=204),
+        ).start()
+        self.addCleanup(patch.stopall)
+
+    def _mdf(self, offset_s: float) -> MDF:
+        mdf = MDF()
+        mdf.start_time = self.start_time + timedelta(seconds=offset_s)
+        mdf.append(
+            [
+                Signal(
+                    samples=np.arange(10, dtype=np.float64),
+                    timestamps=np.arange(10, dtype=np.float64),
+                    name="Sig",
+                    display_names={"CAN1.Msg.Sig": "bus", "Msg.Sig": "message"},
+                )
+            ]
+        )
+        return mdf
+
+    def _query(self, *args, **kwargs) -> MagicMock:
+        query = kwargs["params"]["query"]
+        start_s = self.start_time.timestamp()
+        if "ingest_watermark" in query:
+            result = (
+                [{"value": [0, str(start_s + self.ingest_watermark)]}]
+                if self.ingest_watermark is not None
+                else []
+            )
+        else:
+            result = [
+                {
+                    "metric": {"__name__": name, "message": "Msg"},
+                    "value": [0, str(start_s + offset)],
+                }
+                for name, offset in self.series_watermarks.items()
+            ]
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"data": {"result": result}}
+        return response
+
+    def _send(self, mdf: MDF | None = None) -> SendResult:
+        return send_decoded(
+            mdf or self.mdf,
+            server="http://vm",
+            job="Upper",
+            device="6C1D6B77",
+            skip_signal_range_check=False,
+            engine="threads",
+        )
+
+    def _watermark_lines(self) -> list[dict]:
+        lines = [
+            json.loads(call.kwargs["data"]) for call in self.post.call_args_list
+        ]
+        return [
+            line
+            for line in lines
+            if line["metric"]["__name__"] == "ingest_watermark"
+        ]
+
+    def test_file_ending_before_ingest_watermark_is_skipped(self) -> None:
+        self.ingest_watermark = 9.5
+        self.assertEqual(self._send(), {})
+        self.assertEqual(self.get.call_count, 1)
+        self.assertEqual(
+            self.get.call_args.kwargs["params"]["query"],
+            'max(timestamp(ingest_watermark{job="Upper",device="6C1D6B77"}))',
+        )
+
+    def test_file_starting_after_ingest_watermark_is_not_scanned(self) -> None:
+        self.ingest_watermark = -5.0
+        self.series_watermarks = {"Sig": 3.5}
+        self.assertEqual(self._send(), {"Sig": 10})
+        self.assertEqual(self.get.call_count, 1)
+        self.assertIn(
+            "ingest_watermark", self.get.call_args.kwargs["params"]["query"]
+        )
+
+    def test_later_file_uses_series_watermarks(self) -> None:
+        # The device watermark is behind the file: each series is trimmed
+        # against its own watermark, not the device's.
+        self.ingest_watermark = 6.5
+        self.series_watermarks = {"Sig": 3.5}
+        self.assertEqual(self._send(), {"Sig": 6})
+        self.assertIn("by (__name__, message)", self.get.call_args.kwargs["params"]["query"])
+
+    def test_out_of_order_files_move_watermark_in_order(self) -> None:
+        later = self._mdf(100)
+        tracker = IngestWatermark("http://vm", "Upper", "6C1D6B77", ["A", "B"])
+
+        # B (later) finishes first: the watermark must not pass A.
+        result_b = self._send(later)
+        self.assertEqual(result_b, {"Sig": 10})
+        tracker.finish("B", result_b)
+        self.assertEqual(self._watermark_lines(), [])
+
+        # A is still sent in full, then the watermark covers both.
+        result_a = self._send()
+        self.assertEqual(result_a, {"Sig": 10})
+        tracker.finish("A", result_a)
+        (line,) = self._watermark_lines()
+        self.assertEqual(
+            line["metric"],
+            {"__name__": "ingest_watermark", "job": "Upper", "device": "6C1D6B77"},
+        )
+        self.assertEqual(
+            line["timestamps"], [int(self.start_time.timestamp() + 109) * 1000]
+        )
+        self.assertEqual(line["values"], [20])
+
+    def test_failed_file_holds_the_watermark(self) -> None:
+        tracker = IngestWatermark("http://vm", "Upper", "6C1D6B77", ["A", "B"])
+        with patch(
+            "decoder.sending.send_signal_using_json_lines",
+            side_effect=RuntimeError("down"),
+        ):
+            result_a = self._send()
+        self.assertFalse(result_a.ok)
+        tracker.finish("A", result_a)
+        tracker.finish("B", self._send(self._mdf(100)))
+        self.assertEqual(self._watermark_lines(), [])
+
+    def test_failed_batch_is_reported_in_the_result(self) -> None:
+        with patch(
+            "decoder.vm_client.VMClient.post_import", return_value=False
+        ), patch(
+            "decoder.sending.spool_failed_batch", return_value=False
+        ) as spool:
+            result = self._send()
+        self.assertFalse(result.ok)
+        self.assertEqual(result.failures, 1)
+        spool.assert_called_once()
+
+    def test_spooled_batch_does_not_hold_the_file_back(self) -> None:
+        tracker = IngestWatermark("http://vm", "Upper", "6C1D6B77", ["A"])
+        with patch(
+            "decoder.vm_client.VMClient.post_import", return_value=False
+        ), patch("decoder.sending.spool_failed_batch", return_value=True):
+            result = self._send()
+        self.assertTrue(result.ok)
+        self.assertEqual((result.failures, result.deferred), (0, 1))
+        tracker.finish("A", result)
+        self.assertEqual(len(self._watermark_lines()), 1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from pathlib import Path
+from datetime import datetime, timezone
+from multiprocessing.shared_memory import SharedMemory
+from unittest.mock import patch
+
+import numpy as np
+from asammdf import MDF, Signal
+
+from decoder.rate_control import AIMDController
+from decoder.sending import send_decoded
+from decoder.shm_transport import (
+    SharedDecodedBatch,
+    export_decoded_to_shm,
+    new_shm_prefix,
+    sweep_shm_blocks,
+)
+
+
+def _make_mdf() -> MDF:
+    mdf = MDF()
+    mdf.start_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for group, dtype in enumerate((np.float64, np.uint8)):
+        timestamps = np.arange(20, dtype=np.float64) * (0.1 + group)
+        mdf.append(
+            [
+                Signal(
+                    samples=(np.arange(20) + idx).astype(dtype),
+                    timestamps=timestamps,
+                    name=f"Sig{group}_{idx}",
+                    unit="V",
+                    display_names={
+                        f"CAN1.Msg{group}.Sig{group}_{idx}": "bus",
+                        f"Msg{group}.Sig{group}_{idx}": "message",
+                    },
+                )
+                for idx in range(2)
+            ]
+        )
+    return mdf
+
+
+def _exists(block: str) -> bool:
+    try:
+        SharedMemory(name=block).close()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+class Response:
+    status_code = 204
+    text = ""
+
+
+class SharedMemoryTransportTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mdf = _make_mdf()
+        self.manifest = export_decoded_to_shm(self.mdf)
+        assert self.manifest is not None
+        self.blocks = [group["block"] for group in self.manifest["groups"]]
+
+    def test_views_match_signals_and_blocks_free_per_message(self) -> None:
+        batch = SharedDecodedBatch(self.manifest)
+        signals = {sig.name: sig for sig in batch.iter_channels()}
+        for expected in self.mdf.iter_channels():
+            signal = signals[expected.name]
+            np.testing.assert_array_equal(signal.samples, expected.samples)
+            np.testing.assert_array_equal(signal.timestamps, expected.timestamps)
+            self.assertEqual(signal.samples.dtype, expected.samples.dtype)
+            self.assertEqual(signal.display_names, expected.display_names)
+        self.assertIs(
+            signals["Sig0_0"].timestamps, signals["Sig0_1"].timestamps
+        )
+
+        batch.release_signals([signals["Sig0_0"]])
+        self.assertTrue(_exists(self.blocks[0]))
+        batch.release_signals([signals["Sig0_1"]])
+        self.assertFalse(_exists(self.blocks[0]))
+        self.assertTrue(_exists(self.blocks[1]))
+
+        del signals, signal, expected
+        batch.close()
+        self.assertFalse(_exists(self.blocks[1]))
+
+    def test_send_decoded_frees_blocks_as_signals_are_sent(self) -> None:
+        with patch(
+            "decoder.vm_client.requests.Session.post", return_value=Response()
+        ), patch("decoder.rate_control._controller", AIMDController()):
+            expected = send_decoded(self.mdf, server="http://vm-shm-test:8428")
+            with SharedDecodedBatch(self.manifest) as batch:
+                counts = send_decoded(batch, server="http://vm-shm-test:8428")
+                self.assertEqual(batch.freed_early, 2)
+                self.assertFalse(any(_exists(b) for b in self.blocks))
+
+        self.assertEqual(counts, expected)
+        self.assertEqual(sum(counts.values()), 80)
+
+    @unittest.skipUnless(Path("/dev/shm").is_dir(), "needs /dev/shm")
+    def test_sweep_frees_only_blocks_of_its_run(self) -> None:
+        prefix = new_shm_prefix()
+        # As left behind by a worker killed before returning its manifest.
+        orphaned = export_decoded_to_shm(self.mdf, prefix)
+        assert orphaned is not None
+        names = [group["block"] for group in orphaned["groups"]]
+        self.assertTrue(all(name.startswith(prefix) for name in names))
+
+        self.assertEqual(sweep_shm_blocks(prefix), 2)
+        self.assertFalse(any(_exists(name) for name in names))
+        self.assertTrue(all(_exists(block) for block in self.blocks))
+        SharedDecodedBatch(self.manifest).close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from decoder.sending import _post_import_batch
+from decoder.spool import (
+    CLAIMED_SUFFIX,
+    ImportSpool,
+    configure_spool,
+    directory_lock,
+    get_spool,
+    iter_segment_records,
+)
+from decoder.vm_client import ImportRejected
+
+
+class ImportSpoolTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = Path(self.tmp.name)
+
+    def test_append_and_replay(self) -> None:
+        spool = ImportSpool(self.directory, segment_max_bytes=200)
+        for i in range(4):
+            spool.append(
+                server="http://vm:8428",
+                path="/api/v1/import",
+                body=f'{{"batch": {i}}}\n' * 5,
+                label=f"Sig{i}",
+                headers={"Content-Encoding": "gzip"} if i == 0 else None,
+            )
+        self.assertGreater(len(spool.segments()), 1)
+        self.assertEqual(spool.stats()["records"], 4)
+
+        posted: list[tuple] = []
+
+        def post(server, path, body, params, headers, label) -> bool:
+            posted.append((server, path, body, headers, label))
+            return label != "Sig3"
+
+        self.assertEqual(spool.replay(post), (3, 1))
+        self.assertEqual(posted[0][3], {"Content-Encoding": "gzip"})
+        self.assertEqual(posted[1][2], b'{"batch": 1}\n' * 5)
+        self.assertEqual(spool.stats()["records"], 1)
+
+        self.assertEqual(spool.replay(lambda *args: True), (1, 0))
+        self.assertEqual(spool.segments(), [])
+
+    def test_rejected_and_exhausted_batches_are_quarantined(self) -> None:
+        spool = ImportSpool(self.directory, max_replays=2)
+        for label in ("Bad", "Flaky"):
+            spool.append(server="http://vm", path="/p", body=b"x", label=label)
+
+        def post(server, path, body, params, headers, label) -> bool:
+            if label == "Bad":
+                raise ImportRejected(400, "cannot parse")
+            return False
+
+        self.assertEqual(spool.replay(post), (0, 1))
+        self.assertEqual(spool.stats()["records"], 1)
+        # The second failed replay of Flaky is its last.
+        self.assertEqual(spool.replay(post), (0, 0))
+        self.assertEqual(spool.segments(), [])
+        self.assertEqual(spool.quarantined, 2)
+
+        (rejected,) = spool.rejected_directory.glob("*.spool")
+        reasons = {
+            meta["label"]: meta["rejected"]
+            for meta, _ in iter_segment_records(rejected)
+        }
+        self.assertEqual(
+            reasons,
+            {
+                "Bad": "HTTP 400 - cannot parse",
+                "Flaky": "still failing after 2 replays",
+            },
+        )
+
+    def test_replay_waits_for_writers_holding_the_lock(self) -> None:
+        spool = ImportSpool(self.directory)
+        spool.append(server="http://vm", path="/p", body=b"x", label="A")
+        replayed: list[tuple[int, int]] = []
+        replayer = threading.Thread(
+            target=lambda: replayed.append(spool.replay(lambda *args: True))
+        )
+        # Another process appending to the segment holds this lock.
+        with directory_lock(self.directory):
+            replayer.start()
+            replayer.join(0.2)
+            self.assertTrue(replayer.is_alive())
+            self.assertEqual(len(spool.segments()), 1)
+        replayer.join()
+        self.assertEqual(replayed, [(1, 0)])
+        self.assertEqual(spool.segments(), [])
+
+    def test_segments_of_a_dead_replayer_are_recovered(self) -> None:
+        spool = ImportSpool(self.directory)
+        for label in ("A", "B"):
+            spool.append(server="http://vm", path="/p", body=b"x", label=label)
+            spool._segment = None
+        dead, live = spool.segments()
+        # A replayer killed mid-replay left its claim (and owner file) behind.
+        (self.directory / "1-999.replayer").touch()
+        dead.rename(dead.with_name(f"{dead.stem}.1-999{CLAIMED_SUFFIX}"))
+
+        with spool._replayer() as owner:
+            # A live replayer's claim stays with it.
+            claimed = live.with_name(f"{live.stem}.{owner}{CLAIMED_SUFFIX}")
+            live.rename(claimed)
+            self.assertEqual(spool.recover_claimed(), 1)
+            self.assertEqual(spool.segments(), [dead])
+            self.assertTrue(claimed.exists())
+        self.assertFalse((self.directory / "1-999.replayer").exists())
+
+        # Its owner is gone now too, so the next replay takes both.
+        labels: list[str] = []
+        replayed = spool.replay(lambda *args: labels.append(args[-1]) or True)
+        self.assertEqual(replayed, (2, 0))
+        self.assertEqual(labels, ["A", "B"])
+        self.assertEqual(list(self.directory.glob("*.replayer")), [])
+
+    def test_corrupt_tail_is_ignored(self) -> None:
+        spool = ImportSpool(self.directory)
+        spool.append(server="http://vm", path="/p", body=b"good", label="A")
+        spool.append(server="http://vm", path="/p", body=b"lost", label="B")
+        segment = spool.segments()[0]
+        data = segment.read_bytes()
+        segment.write_bytes(data[:-2] + b"XX")
+
+        records = list(iter_segment_records(segment))
+        self.assertEqual([body for _, body in records], [b"good"])
+
+    def test_failed_import_batch_is_spooled(self) -> None:
+        configure_spool(self.directory)
+        self.addCleanup(configure_spool, None)
+        client = MagicMock()
+        client.post_import.return_value = False
+        with patch("decoder.sending.get_vm_client", return_value=client):
+            ok = _post_import_batch(
+                server="http://vm",
+                path="/influx/write",
+                data=b"line",
+                label="Msg",
+                logger=MagicMock(),
+                params={"precision": "ms"},
+            )
+        self.assertFalse(ok)
+        spool = get_spool()
+        assert spool is not None
+        [(meta, body)] = list(iter_segment_records(spool.segments()[0]))
+        self.assertEqual(body, b"line")
+        self.assertEqual(meta["params"], {"precision": "ms"})
+        self.assertEqual(meta["server"], "http://vm")
+
+    def test_rejected_import_batch_is_quarantined(self) -> None:
+        configure_spool(self.directory)
+        self.addCleanup(configure_spool, None)
+        client = MagicMock()
+        client.post_import.side_effect = ImportRejected(400, "bad line")
+        with patch("decoder.sending.get_vm_client", return_value=client):
+            ok = _post_import_batch(
+                server="http://vm",
+                path="/api/v1/import",
+                data=b"line",
+                label="Msg",
+                logger=MagicMock(),
+            )
+        self.assertFalse(ok)
+        spool = get_spool()
+        assert spool is not None
+        self.assertEqual(spool.segments(), [])
+        self.assertEqual(spool.quarantined, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+from datetime import datetime, timezone
+
+from decoder.utils import OrderedCompletions
+
+
+def _at(hour: int, key: str) -> tuple[datetime, str]:
+    return datetime(2026, 6, 18, hour, tzinfo=timezone.utc), key
+
+
+class OrderedCompletionsTest(unittest.TestCase):
+    def test_cursor_waits_for_older_items(self) -> None:
+        cursor = OrderedCompletions([_at(1, "a"), _at(2, "b"), _at(2, "c")])
+        # Newest first, as the S3 pipeline sends them.
+        self.assertEqual(cursor.finish(_at(2, "c")), [])
+        self.assertEqual(cursor.finish(_at(2, "b")), [])
+        self.assertIsNone(cursor.last)
+        self.assertEqual(
+            cursor.finish(_at(1, "a")), [_at(1, "a"), _at(2, "b"), _at(2, "c")]
+        )
+        self.assertEqual(cursor.last, _at(2, "c"))
+
+    def test_cursor_stops_before_the_first_failure(self) -> None:
+        cursor = OrderedCompletions([_at(1, "a"), _at(2, "b"), _at(3, "c")])
+        self.assertEqual(cursor.finish(_at(1, "a")), [_at(1, "a")])
+        self.assertEqual(cursor.finish(_at(3, "c")), [])
+        # Its batches failed: nothing after it moves the cursor.
+        self.assertEqual(cursor.finish(_at(2, "b"), ok=False), [])
+        self.assertTrue(cursor.failed)
+        self.assertEqual(cursor.last, _at(1, "a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from decoder.utils import (
+    iter_prometheus_line_chunks,
+    make_metric_line,
+    offsets_to_epoch_seconds,
+)
+
+
+class PrometheusLineChunksTest(unittest.TestCase):
+    def test_matches_make_metric_line(self) -> None:
+        start_time = datetime(
+            2026, 1, 1, 8, 30, 12, 345678, tzinfo=timezone.utc
+        )
+        rng = np.random.default_rng(3)
+        offsets = np.cumsum(rng.uniform(0.0001, 0.02, 5_000))
+        values = rng.normal(size=offsets.size) * 1e3
+
+        expected = "".join(
+            make_metric_line(
+                "Sig",
+                "Msg",
+                "V",
+                value,
+                start_time + timedelta(seconds=ts),
+                job="Upper rig",
+            )
+            for value, ts in zip(values, offsets)
+        )
+        chunks = list(
+            iter_prometheus_line_chunks(
+                metric_name="Sig",
+                message="Msg",
+                unit="V",
+                values=values,
+                timestamps_in_s=offsets_to_epoch_seconds(start_time, offsets),
+                job="Upper rig",
+                batch_size=1_000,
+            )
+        )
+
+        self.assertEqual([count for _, count in chunks], [1_000] * 5)
+        self.assertEqual(
+            b"".join(chunk for chunk, _ in chunks).decode(), expected
+        )
+
+    def test_empty_series(self) -> None:
+        self.assertEqual(
+            list(iter_prometheus_line_chunks("Sig", "Msg", "", [], [], "")), []
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
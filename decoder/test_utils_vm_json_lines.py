@@ -0,0 +1,114 @@
+import json
+import unittest
+
+import numpy as np
+
+from datetime import datetime, timezone
+
+from decoder.utils import (
+    SharedTimestamps,
+    iter_vm_json_line_chunks,
+    make_list_of_vm_json_line_format,
+)
+
+
+def _reference_line(values: list[float], timestamps: list[int]) -> str:
+    return json.dumps(
+        {
+            "metric": {
+                "__name__": "Sig",
+                "job": "Upper_rig",
+                "message": "Msg",
+                "unit": "°C",
+            },
+            "values": values,
+            "timestamps": timestamps,
+        }
+    )
+
+
+class VmJsonLineChunksTest(unittest.TestCase):
+    def test_chunks_match_json_dumps(self) -> None:
+        rng = np.random.default_rng(3)
+        values = rng.normal(size=25).tolist() + [1.0, 0.1, 1e-7, 123456789.0]
+        timestamps = list(range(1_700_000_000_000, 1_700_000_000_000 + 29))
+
+        chunks = list(
+            iter_vm_json_line_chunks(
+                metric_name="Sig",
+                message="Msg",
+                unit="°C",
+                values=np.array(values),
+                timestamps_in_ms=np.array(timestamps, dtype=np.int64),
+                job="Upper rig",
+                batch_size=10,
+            )
+        )
+
+        self.assertEqual([count for _, count in chunks], [10, 10, 9])
+        for idx, (line, _) in enumerate(chunks):
+            self.assertEqual(
+                line.decode(),
+                _reference_line(
+                    values[idx * 10 : (idx + 1) * 10],
+                    timestamps[idx * 10 : (idx + 1) * 10],
+                ),
+            )
+
+    def test_list_helper_keeps_non_finite_spelling(self) -> None:
+        lines, counts = make_list_of_vm_json_line_format(
+            metric_name="Sig",
+            message="Msg",
+            unit="°C",
+            values=[1.0, float("nan")],
+            timestamps_in_ms=[1, 2],
+            job="Upper rig",
+        )
+        self.assertEqual(counts, [2])
+        self.assertEqual(lines[0], _reference_line([1.0, float("nan")], [1, 2]))
+
+    def test_shared_timestamps_match_and_are_dropped_after_use(self) -> None:
+        shared = SharedTimestamps(
+            datetime(2026, 1, 1, tzinfo=timezone.utc),
+            np.arange(25, dtype=np.float64) * 0.01,
+            users=2,
+        )
+        chunks = [
+            list(
+                iter_vm_json_line_chunks(
+                    metric_name="Sig",
+                    message="Msg",
+                    unit="°C",
+                    values=np.arange(25, dtype=np.float64) + idx,
+                    timestamps_in_ms=shared.ms,
+                    job="Upper rig",
+                    batch_size=10,
+                    shared_timestamps=shared,
+                )
+            )
+            for idx in range(2)
+        ]
+
+        timestamps = shared.ms.tolist()
+        for idx in range(2):
+            self.assertEqual(
+                [line.decode() for line, _ in chunks[idx]],
+                [
+                    _reference_line(
+                        [float(v + idx) for v in range(25)][i : i + 10],
+                        timestamps[i : i + 10],
+                    )
+                    for i in range(0, 25, 10)
+                ],
+            )
+        self.assertEqual((shared.misses, shared.hits), (3, 3))
+        self.assertEqual(shared._encoded, {})
+
+    def test_empty_series_yields_nothing(self) -> None:
+        self.assertEqual(
+            list(iter_vm_json_line_chunks("Sig", "Msg", "", [], [], "job")), []
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 from datetime import datetime, timezone
 from unittest.mock import patch
 
-from decoder.utils import get_latest_vm_job_timestamp
+from decoder.utils import get_latest_vm_job_timestamp, get_vm_series_watermarks
 
 
 class LatestVmJobTimestampTest(unittest.TestCase):
@@ -22,7 +22,7 @@ class LatestVmJobTimestampTest(unittest.TestCase):
                     }
                 }
 
-        with patch("decoder.utils.requests.get", return_value=Response()) as get:
+        with patch("decoder.vm_client.requests.Session.get", return_value=Response()) as get:
             result = get_latest_vm_job_timestamp(
                 "http://victoriametrics",
                 "B3SR",
@@ -49,7 +49,7 @@ class LatestVmJobTimestampTest(unittest.TestCase):
             def json(self):
                 return {"data": {"result": []}}
 
-        with patch("decoder.utils.requests.get", return_value=Response()):
+        with patch("decoder.vm_client.requests.Session.get", return_value=Response()):
             result = get_latest_vm_job_timestamp(
                 "http://victoriametrics",
                 "B3SR",
@@ -58,6 +58,43 @@ class LatestVmJobTimestampTest(unittest.TestCase):
         self.assertFalse(result["has_data"])
         self.assertIsNone(result["timestamp"])
 
+    def test_series_watermarks_from_one_grouped_query(self) -> None:
+        class Response:
+            status_code = 200
+
+            def json(self):
+                return {
+                    "data": {
+                        "result": [
+                            {
+                                "metric": {"__name__": "Speed", "message": "Drive"},
+                                "value": [1710000000, "1719999999"],
+                            },
+                            {
+                                "metric": {"__name__": "Temp", "message": "Pack"},
+                                "value": [1710000000, "1719990000.5"],
+                            },
+                        ]
+                    }
+                }
+
+        with patch("decoder.vm_client.requests.Session.get", return_value=Response()) as get:
+            result = get_vm_series_watermarks("http://victoriametrics", "Upper")
+
+        self.assertTrue(result["has_data"])
+        self.assertEqual(
+            result["watermarks"],
+            {
+                ("Speed", "Drive"): datetime.fromtimestamp(1719999999, tz=timezone.utc),
+                ("Temp", "Pack"): datetime.fromtimestamp(1719990000.5, tz=timezone.utc),
+            },
+        )
+        self.assertEqual(
+            result["query"],
+            'max(timestamp({job="Upper"}) keep_metric_names) by (__name__, message)',
+        )
+        get.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()
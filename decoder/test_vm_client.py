@@ -0,0 +1,64 @@
+import logging
+import unittest
+from unittest.mock import MagicMock, patch
+
+from decoder.rate_control import AIMDController
+from decoder.vm_client import ImportRejected, VMClient, get_vm_client
+
+
+class VMClientTest(unittest.TestCase):
+    def test_registry_reuses_client_and_grows_pool(self) -> None:
+        client = get_vm_client("http://vm-client-test:8428/", pool_size=2)
+        self.assertIs(get_vm_client("http://vm-client-test:8428"), client)
+        self.assertEqual(client.pool_size, 2)
+
+        get_vm_client("http://vm-client-test:8428", pool_size=16)
+        self.assertEqual(client.pool_size, 16)
+        get_vm_client("http://vm-client-test:8428", pool_size=4)
+        self.assertEqual(client.pool_size, 16)
+
+    def test_post_import_retries_until_accepted(self) -> None:
+        client = VMClient("http://vm-client-test:8428", pool_size=1)
+        failed = MagicMock(status_code=500, text="busy")
+        accepted = MagicMock(status_code=204)
+        with patch.object(
+            client.session, "post", side_effect=[failed, accepted]
+        ) as post, patch("decoder.vm_client.time.sleep"), patch(
+            "decoder.rate_control._controller", AIMDController()
+        ):
+            ok = client.post_import(
+                "/api/v1/import",
+                data=b"{}\n",
+                label="Sig",
+                logger=logging.getLogger("test_vm_client"),
+            )
+
+        self.assertTrue(ok)
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(
+            post.call_args.args[0], "http://vm-client-test:8428/api/v1/import"
+        )
+        self.assertEqual(post.call_args.kwargs["timeout"], client.timeout)
+
+    def test_rejected_batch_is_not_retried(self) -> None:
+        client = VMClient("http://vm-client-test:8428", pool_size=1)
+        rejected = MagicMock(status_code=400, text="cannot parse")
+        with patch.object(
+            client.session, "post", return_value=rejected
+        ) as post, patch("decoder.vm_client.time.sleep"), patch(
+            "decoder.rate_control._controller", AIMDController()
+        ):
+            with self.assertRaises(ImportRejected) as raised:
+                client.post_import(
+                    "/api/v1/import",
+                    data=b"{}\n",
+                    label="Sig",
+                    logger=logging.getLogger("test_vm_client"),
+                )
+
+        self.assertEqual(raised.exception.status, 400)
+        self.assertEqual(post.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
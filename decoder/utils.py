@@ -8,6 +8,7 @@ import shutil
 from pathlib import Path
 
 from datetime import datetime, timedelta, timezone
+import numpy as np
 from asammdf import MDF
 from asammdf.blocks.v4_blocks import HeaderBlock
 from asammdf.blocks.types import StrPath
@@ -18,12 +19,14 @@ from itertools import chain
 from can import LogReader, Logger
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock
-from typing import Any
+from typing import Any, Iterable, Iterator
+from functools import lru_cache
 
 if __name__ == "__main__":
     sys.path.append(str(Path(__file__).parent.parent))
 
 from decoder.config import *
+from decoder.vm_client import get_vm_client
 
 
 SUMMARY: int = 25
@@ -115,6 +118,43 @@ def format_time_span(start: datetime, end: datetime) -> str:
     )
 
 
+class OrderedCompletions:
+    """
+    Items of a known order (e.g. files by time) that finish in any order.
+    finish() returns the items that just joined the finished-ok prefix, so
+    progress marks (cursors, watermarks) only move past an item once every
+    item before it made it. A failed item ends the prefix for the run.
+    Not thread-safe; finish() from one thread or under a lock.
+    """
+
+    def __init__(self, items: Iterable[Any]):
+        self.order = list(items)
+        self.done = 0
+        self.failed = False
+        self._finished: dict[Any, bool] = {}
+
+    def finish(self, item: Any, ok: bool = True) -> list[Any]:
+        self._finished[item] = ok
+        advanced = []
+        while not self.failed and self.done < len(self.order):
+            next_item = self.order[self.done]
+            if next_item not in self._finished:
+                break
+            if not self._finished.pop(next_item):
+                self.failed = True
+                break
+            advanced.append(next_item)
+            self.done += 1
+        return advanced
+
+    @property
+    def last(self) -> Any:
+        """
+        Last item of the finished-ok prefix, None before the first.
+        """
+        return self.order[self.done - 1] if self.done else None
+
+
 def format_bytes(value: int | None) -> str:
     if value is None:
         return "n/a"
@@ -286,6 +326,280 @@ def get_trc_start_time(
     return None
 
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _offsets_to_epoch_us(start_time: datetime, offsets: Any) -> np.ndarray:
+    offsets = np.asarray(offsets, dtype=np.float64)
+    if start_time.tzinfo is None:
+        # Naive datetimes go through local time, like datetime.timestamp().
+        start_us = (
+            int(start_time.replace(microsecond=0).timestamp()) * 1_000_000
+            + start_time.microsecond
+        )
+    else:
+        start_us = (start_time - _EPOCH) // timedelta(microseconds=1)
+
+    whole = np.trunc(offsets)
+    offsets_us = whole.astype(np.int64) * 1_000_000 + np.rint(
+        (offsets - whole) * 1e6
+    ).astype(np.int64)
+    return offsets_us + start_us
+
+
+def offsets_to_epoch_ms(start_time: datetime, offsets: Any) -> np.ndarray:
+    """
+    Convert MDF-relative offsets (seconds) to int64 epoch milliseconds.
+
+    Matches `int((start_time + timedelta(seconds=ts)).timestamp() * 1e3)` for
+    every offset: the offset is rounded to whole microseconds the same way
+    `timedelta` does it, added to the start time in integer microseconds and
+    then truncated to milliseconds.
+    """
+    epoch_s = _offsets_to_epoch_us(start_time, offsets) / 1e6
+    return np.trunc(epoch_s * 1e3).astype(np.int64)
+
+
+def offsets_to_epoch_seconds(start_time: datetime, offsets: Any) -> np.ndarray:
+    """
+    Convert MDF-relative offsets (seconds) to float64 epoch seconds, equal to
+    `(start_time + timedelta(seconds=ts)).timestamp()` for every offset.
+    """
+    return _offsets_to_epoch_us(start_time, offsets) / 1e6
+
+
+class SharedTimestamps:
+    """
+    Epoch-ms timestamps of one channel group. After extract_bus_logging all
+    signals of a CAN message share one master channel, so the conversion is
+    done once per message and the JSON text of each batch is encoded by the
+    first signal that needs it and reused by the others. A batch's text is
+    dropped once `users` signals have taken it.
+    """
+
+    def __init__(self, start_time: datetime, offsets: Any, users: int = 0):
+        self.ms = offsets_to_epoch_ms(start_time, offsets)
+        self.users = users
+        self.offset = 0
+        self.hits = 0
+        self.misses = 0
+        self._encoded: dict[tuple[int, int], tuple[bytes, int]] = {}
+        self._lock = Lock()
+        self._root = self
+
+    def __len__(self) -> int:
+        return len(self.ms)
+
+    def window(self, start: int, stop: int) -> "SharedTimestamps":
+        """
+        self.ms[start:stop], sharing this cache, for a sample-range slice of
+        a signal. Slices starting at a multiple of the batch size reuse the
+        batches encoded for the whole signal.
+        """
+        view = object.__new__(SharedTimestamps)
+        view.__dict__.update(self.__dict__)
+        view.ms = self.ms[start:stop]
+        view.offset = self.offset + start
+        return view
+
+    def encoded(self, start: int, stop: int) -> bytes:
+        """
+        JSON text (", "-joined) of self.ms[start:stop].
+        """
+        key = (self.offset + start, self.offset + stop)
+        root = self._root
+        with self._lock:
+            entry = self._encoded.get(key)
+        if entry is None:
+            # Encoded outside the lock; signals racing here get equal bytes.
+            text = ", ".join(map(str, self.ms[start:stop].tolist())).encode()
+        else:
+            text = entry[0]
+        with self._lock:
+            if entry is None:
+                root.misses += 1
+            else:
+                root.hits += 1
+            taken = self._encoded.get(key, (text, 0))[1] + 1
+            if 0 < self.users <= taken:
+                self._encoded.pop(key, None)
+            else:
+                self._encoded[key] = (text, taken)
+        return text
+
+
+def _format_json_floats(values: np.ndarray) -> str:
+    if np.isfinite(values).all():
+        return ", ".join(map(float.__repr__, values.tolist()))
+    # json.dumps spells non-finite floats as NaN/Infinity.
+    return ", ".join(map(json.dumps, values.tolist()))
+
+
+def iter_vm_json_line_chunks(
+    metric_name: str,
+    message: str,
+    unit: str,
+    values: Any,
+    timestamps_in_ms: Any,
+    job: str,
+    batch_size: int = 10_000,
+    shared_timestamps: SharedTimestamps | None = None,
+) -> Iterator[tuple[bytes, int]]:
+    """
+    Yield (json_line_bytes, sample_count) for one series, batch_size samples
+    at a time, in the VictoriaMetrics JSON line format.
+
+    The metric header is serialized once per series and each batch is joined
+    from it and the batch's value and timestamp text. Output is identical to
+    json.dumps() of the equivalent dict.
+    `values` and `timestamps_in_ms` may be NumPy arrays or lists (timestamps
+    may also be datetimes). When timestamps_in_ms is shared_timestamps.ms,
+    the timestamp text of each batch comes from its cache.
+    """
+    return iter_vm_json_series_chunks(
+        labels={
+            "__name__": metric_name,
+            "job": job.replace(" ", "_"),
+            "message": message,
+            "unit": unit,
+        },
+        values=values,
+        timestamps_in_ms=timestamps_in_ms,
+        batch_size=batch_size,
+        shared_timestamps=shared_timestamps,
+    )
+
+
+def iter_vm_json_series_chunks(
+    labels: dict[str, str],
+    values: Any,
+    timestamps_in_ms: Any,
+    batch_size: int = 10_000,
+    shared_timestamps: SharedTimestamps | None = None,
+) -> Iterator[tuple[bytes, int]]:
+    """
+    iter_vm_json_line_chunks() for an arbitrary label set (`__name__` first).
+    """
+    if len(values) != len(timestamps_in_ms):
+        raise ValueError("Values and timestamps must have the same length.")
+    if batch_size <= 0:
+        raise ValueError("Batch size must be a positive integer.")
+
+    if len(values) == 0:
+        return
+
+    _values = np.asarray(values, dtype=np.float64)
+    _timestamps = np.asarray(timestamps_in_ms)
+    if _timestamps.dtype.kind not in "iu":
+        _timestamps = np.fromiter(
+            (
+                int(ts.timestamp() * 1e3) if isinstance(ts, datetime) else ts
+                for ts in timestamps_in_ms
+            ),
+            dtype=np.int64,
+            count=len(timestamps_in_ms),
+        )
+    if shared_timestamps is not None and _timestamps is not shared_timestamps.ms:
+        shared_timestamps = None
+
+    metric = json.dumps(labels)
+    header = f'{{"metric": {metric}, "values": ['.encode()
+    middle = b'], "timestamps": ['
+    tail = b"]}"
+
+    for i in range(0, len(_values), batch_size):
+        batch_values = _values[i : i + batch_size]
+        if shared_timestamps is not None:
+            timestamps = shared_timestamps.encoded(i, i + len(batch_values))
+        else:
+            batch_timestamps = _timestamps[i : i + batch_size]
+            timestamps = ", ".join(map(str, batch_timestamps.tolist())).encode()
+        chunk = b"".join(
+            (
+                header,
+                _format_json_floats(batch_values).encode(),
+                middle,
+                timestamps,
+                tail,
+            )
+        )
+        yield chunk, len(batch_values)
+
+
+def _escape_influx_key(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(",", "\\,")
+        .replace("=", "\\=")
+        .replace(" ", "\\ ")
+    )
+
+
+def iter_influx_line_chunks(
+    message: str,
+    unit: str,
+    fields: dict[str, tuple[np.ndarray, np.ndarray]],
+    timestamps_in_ms: np.ndarray,
+    job: str,
+    batch_size: int = 10_000,
+) -> Iterator[tuple[bytes, dict[str, int]]]:
+    """
+    Yield (line_protocol_bytes, {field: sample_count}) for one CAN message.
+
+    Every field shares `timestamps_in_ms`, so each timestamp is written once
+    per line instead of once per signal:
+        <message>,job=<job>,message=<message>,unit=<unit> SigA=1.0,SigB=2.0 <ts>
+    `fields` maps field (signal) name -> (float64 values, valid mask); masked
+    samples are left out of their line. batch_size counts samples (fields x
+    rows) per chunk, like the JSON line path.
+    Timestamps are in ms, so POST with `precision=ms`.
+    """
+    if batch_size <= 0:
+        raise ValueError("Batch size must be a positive integer.")
+    if not fields or len(timestamps_in_ms) == 0:
+        return
+
+    tags = ",".join(
+        f"{key}={_escape_influx_key(value)}"
+        for key, value in (
+            ("job", job.replace(" ", "_")),
+            ("message", message),
+            ("unit", unit),
+        )
+        if value
+    )
+    head = _escape_influx_key(message) + (f",{tags}" if tags else "")
+    names = list(fields.keys())
+    prefixes = [f"{_escape_influx_key(name)}=" for name in names]
+    rows_per_chunk = max(1, batch_size // len(names))
+
+    for i in range(0, len(timestamps_in_ms), rows_per_chunk):
+        columns: list[list[str]] = []
+        counts: dict[str, int] = {}
+        for name, prefix in zip(names, prefixes):
+            values, valid = fields[name]
+            batch_values = values[i : i + rows_per_chunk].tolist()
+            batch_valid = valid[i : i + rows_per_chunk].tolist()
+            columns.append(
+                [
+                    f"{prefix}{value!r}" if ok else ""
+                    for value, ok in zip(batch_values, batch_valid)
+                ]
+            )
+            counts[name] = sum(batch_valid)
+
+        lines = [
+            f"{head} {row_fields} {ts}"
+            for row_fields, ts in zip(
+                (",".join(filter(None, row)) for row in zip(*columns)),
+                timestamps_in_ms[i : i + rows_per_chunk].tolist(),
+            )
+            if row_fields
+        ]
+        if lines:
+            yield ("\n".join(lines) + "\n").encode(), counts
+
+
 def make_list_of_vm_json_line_format(
     metric_name: str,
     message: str,
@@ -314,45 +628,43 @@ def make_list_of_vm_json_line_format(
     VictoriaMetrics suggest a max of 1k to 10k samples per batch for optimal performance.
     See: https://docs.victoriametrics.com/victoriametrics/single-server-victoriametrics/#json-line-format
 
+    Prefer iter_vm_json_line_chunks() when sending, it avoids holding every
+    line of a series in memory at once.
+
     Returns a tuple of two lists:
     - List of JSON lines as strings.
     - List of counts of samples in each JSON line.
     """
 
-    if len(values) != len(timestamps_in_ms):
-        raise ValueError("Values and timestamps must have the same length.")
-    if batch_size <= 0:
-        raise ValueError("Batch size must be a positive integer.")
-
-    if len(values) == 0:
-        return [], []
-
-    def make_line(start_idx: int, end_idx: int) -> tuple[str, int]:
-        json_line = {
-            "metric": {
-                "__name__": metric_name,
-                "job": job.replace(" ", "_"),
-                "message": message,
-                "unit": unit,
-            },
-            "values": values[start_idx:end_idx],
-            "timestamps": [
-                int(ts.timestamp() * 1e3) if isinstance(ts, datetime) else ts
-                for ts in timestamps_in_ms[start_idx:end_idx]
-            ],
-        }
-        return json.dumps(json_line), len(values[start_idx:end_idx])
-
     lines: list[str] = []
     counts: list[int] = []
-    for i in range(0, len(values), batch_size):
-        line, count = make_line(i, min(i + batch_size, len(values)))
-        lines.append(line)
+    for line, count in iter_vm_json_line_chunks(
+        metric_name=metric_name,
+        message=message,
+        unit=unit,
+        values=values,
+        timestamps_in_ms=timestamps_in_ms,
+        job=job,
+        batch_size=batch_size,
+    ):
+        lines.append(line.decode())
         counts.append(count)
 
     return lines, counts
 
 
+@lru_cache(maxsize=4096)
+def prometheus_series_prefix(
+    metric_name: str, message: str, unit: str, job: str = ""
+) -> str:
+    """
+    `<metric>{job="...",message="...",unit="..."} ` for one series, cached so
+    live senders only build it once per series.
+    """
+    job_underscored = job.replace(" ", "_")
+    return f'{metric_name}{{job="{job_underscored}",message="{message}",unit="{unit}"}} '
+
+
 def make_metric_line(
     metric_name: str,
     message: str,
@@ -362,8 +674,51 @@ def make_metric_line(
     job: str = "",
 ) -> str:
     # Format the metric line for Prometheus
-    job_underscored = job.replace(" ", "_")
-    return f'{metric_name}{{job="{job_underscored}",message="{message}",unit="{unit}"}} {value} {timestamp.timestamp() if type(timestamp) is datetime else timestamp}\n'
+    prefix = prometheus_series_prefix(metric_name, message, unit, job)
+    return f"{prefix}{value} {timestamp.timestamp() if type(timestamp) is datetime else timestamp}\n"
+
+
+def iter_prometheus_line_chunks(
+    metric_name: str,
+    message: str,
+    unit: str,
+    values: Any,
+    timestamps_in_s: Any,
+    job: str,
+    batch_size: int = 250_000,
+) -> Iterator[tuple[bytes, int]]:
+    """
+    Yield (exposition_text_bytes, sample_count) for one series, batch_size
+    samples at a time, for `vmapi_import_prometheus`.
+
+    Same lines as make_metric_line() per sample (epoch seconds timestamps),
+    but the label prefix is built once and every batch is joined from the
+    `tolist()` of the value/timestamp arrays in one pass.
+    """
+    if len(values) != len(timestamps_in_s):
+        raise ValueError("Values and timestamps must have the same length.")
+    if batch_size <= 0:
+        raise ValueError("Batch size must be a positive integer.")
+    if len(values) == 0:
+        return
+
+    _values = np.asarray(values, dtype=np.float64)
+    _timestamps = np.asarray(timestamps_in_s, dtype=np.float64)
+    prefix = prometheus_series_prefix(metric_name, message, unit, job)
+    separator = "\n" + prefix
+
+    for i in range(0, len(_values), batch_size):
+        batch_values = _values[i : i + batch_size].tolist()
+        batch_timestamps = _timestamps[i : i + batch_size].tolist()
+        samples = map(
+            " ".join,
+            zip(
+                map(float.__repr__, batch_values),
+                map(float.__repr__, batch_timestamps),
+            ),
+        )
+        text = prefix + separator.join(samples) + "\n"
+        yield text.encode(), len(batch_values)
 
 
 def is_victoriametrics_online(server: str, timeout: float = 3.0) -> bool:
@@ -373,8 +728,8 @@ def is_victoriametrics_online(server: str, timeout: float = 3.0) -> bool:
     resp_status_code = 404
 
     try:
-        resp = requests.get(
-            server + vmapi_query, params={"query": "up"}, timeout=timeout
+        resp = get_vm_client(server).get(
+            vmapi_query, params={"query": "up"}, timeout=timeout
         )
         resp_status_code = resp.status_code
         if resp.status_code != 200:
@@ -417,8 +772,8 @@ def delete_series_from_vm(
     setup_simple_logger(logger, level=logging.INFO, format=LOG_FORMAT)
 
     try:
-        resp = requests.post(
-            server + vmapi_delete_series,
+        resp = get_vm_client(server).post(
+            vmapi_delete_series,
             params={"match[]": match},
             timeout=timeout,
         )
@@ -455,8 +810,8 @@ def get_metrics_from_vm(
         )
 
         try:
-            resp = requests.get(
-                server + vmapi_query_range,
+            resp = client.get(
+                vmapi_query_range,
                 params={
                     "query": f"{{{match}}}",
                     "start": day_start.timestamp(),
@@ -484,6 +839,7 @@ def get_metrics_from_vm(
             return day_start.isoformat(), None
 
     total_hours = (end_date - start_date).days * 24 + 1
+    client = get_vm_client(server, pool_size=8)
     ret_lock = Lock()
     with ThreadPoolExecutor(max_workers=8) as executor:
         futures = [executor.submit(query_vm, h) for h in range(total_hours)]
@@ -535,8 +891,8 @@ def get_latest_vm_job_timestamp(
     query = f"max(timestamp({selector}))"
 
     try:
-        resp = requests.get(
-            server + vmapi_query,
+        resp = get_vm_client(server).get(
+            vmapi_query,
             params={"query": query, "step": lookback},
             timeout=timeout,
         )
@@ -574,6 +930,140 @@ def get_latest_vm_job_timestamp(
         }
 
 
+def get_vm_ingest_watermark(
+    server: str,
+    job: str,
+    device: str = "",
+    lookback: str = "365d",
+    timeout: float = 10.0,
+) -> dict[str, Any]:
+    """
+    End of the newest fully sent file of a job (and device), read from the
+    VM_INGEST_WATERMARK_METRIC series the senders write after each file.
+    Only that one series is searched, unlike get_latest_vm_job_timestamp()
+    over every series of the job. Same result dict as the latter.
+    """
+    return get_latest_vm_job_timestamp(
+        server=server,
+        job=job.replace(" ", "_"),
+        metric_name=VM_INGEST_WATERMARK_METRIC,
+        label_filters={"device": device},
+        lookback=lookback,
+        timeout=timeout,
+    )
+
+
+def make_ingest_watermark_line(
+    job: str, device: str, watermark: datetime, samples: int
+) -> str:
+    """
+    JSON line (/api/v1/import) of one ingest watermark sample: at the end of
+    the file's span, with the number of samples sent as value.
+    """
+    metric = {"__name__": VM_INGEST_WATERMARK_METRIC, "job": job.replace(" ", "_")}
+    if device:
+        metric["device"] = device
+    return json.dumps(
+        {
+            "metric": metric,
+            "values": [samples],
+            "timestamps": [int(watermark.timestamp() * 1000)],
+        }
+    )
+
+
+def get_vm_series_watermarks(
+    server: str,
+    job: str,
+    lookback: str = "365d",
+    timeout: float = 10.0,
+) -> dict[str, Any]:
+    """
+    Newest sample time of every series of one VM job, from one grouped
+    instant query: {"has_data", "watermarks": {(metric_name, message):
+    datetime}, "query"[, "error"]}.
+    """
+    selector = _build_vm_selector(job=job)
+    query = (
+        f"max(timestamp({selector}) keep_metric_names) by (__name__, message)"
+    )
+
+    try:
+        resp = get_vm_client(server).get(
+            vmapi_query,
+            params={"query": query, "step": lookback},
+            timeout=timeout,
+        )
+        if resp.status_code != 200:
+            return {
+                "has_data": False,
+                "watermarks": {},
+                "query": query,
+                "error": f"status_code={resp.status_code}",
+            }
+
+        watermarks: dict[tuple[str, str], datetime] = {}
+        for series in resp.json().get("data", {}).get("result", []):
+            metric = series.get("metric", {})
+            raw_value = series.get("value", [None, None])[1]
+            if "__name__" not in metric or raw_value in (None, ""):
+                continue
+            watermarks[(metric["__name__"], metric.get("message", ""))] = (
+                datetime.fromtimestamp(float(raw_value), tz=timezone.utc)
+            )
+        return {
+            "has_data": bool(watermarks),
+            "watermarks": watermarks,
+            "query": query,
+        }
+    except Exception as e:
+        return {
+            "has_data": False,
+            "watermarks": {},
+            "query": query,
+            "error": str(e),
+        }
+
+
+def get_vm_series_coverage(
+    server: str,
+    metric_name: str,
+    start: float,
+    end: float,
+    label_filters: dict[str, str] | None = None,
+    timeout: float = 10.0,
+) -> tuple[float, float] | None:
+    """
+    (first, last) sample time in epoch seconds of a series within [start,
+    end], or None when VM has no sample there. One instant query for the
+    two boundaries (tfirst/tlast_over_time), so none of the samples
+    themselves are downloaded. Raises on request errors.
+    """
+    selector = _build_vm_selector(
+        job="", metric_name=metric_name, label_filters=label_filters
+    )
+    window = max(1, int(np.ceil(end - start)) + 1)
+    query = (
+        f'label_set(tfirst_over_time({selector}[{window}s]), "bound", "first")'
+        f' or label_set(tlast_over_time({selector}[{window}s]), "bound", "last")'
+    )
+    resp = get_vm_client(server).get(
+        vmapi_query,
+        params={"query": query, "time": f"{end:.3f}"},
+        timeout=timeout,
+    )
+    resp.raise_for_status()
+    bounds: dict[str, list[float]] = {"first": [], "last": []}
+    for series in resp.json().get("data", {}).get("result", []):
+        bound = series.get("metric", {}).get("bound")
+        raw_value = series.get("value", [None, None])[1]
+        if bound in bounds and raw_value not in (None, ""):
+            bounds[bound].append(float(raw_value))
+    if not bounds["first"] or not bounds["last"]:
+        return None
+    return min(bounds["first"]), max(bounds["last"])
+
+
 def convert_mf4_to_trc(
     paths: list[Path | str], output_name: str | Path
 ) -> None:
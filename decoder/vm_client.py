@@ -0,0 +1,317 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from typing import Any
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from decoder.config import VM_CLIENT_POOL_SIZE, VM_CLIENT_TIMEOUT
+from decoder.rate_control import classify_status, get_rate_controller
+
+
+def _extend_no_proxy(entries: list[str]) -> None:
+    # Preserve existing NO_PROXY/no_proxy values and append entries needed for local/tailnet VM access.
+    existing_raw = (
+        os.environ.get("NO_PROXY") or os.environ.get("no_proxy") or ""
+    )
+    existing = [e.strip() for e in existing_raw.split(",") if e.strip()]
+    merged: list[str] = []
+
+    for value in [*existing, *entries]:
+        if value and value not in merged:
+            merged.append(value)
+
+    no_proxy_value = ",".join(merged)
+    os.environ["NO_PROXY"] = no_proxy_value
+    os.environ["no_proxy"] = no_proxy_value
+
+
+_extend_no_proxy(
+    [
+        "localhost",
+        "127.0.0.1",
+        "::1",
+        ".ts.net",
+        ".tailnet",
+    ]
+)
+
+
+class ImportRejected(Exception):
+    """
+    VictoriaMetrics refused an import batch with a 4xx other than 429: the
+    batch itself is bad, so neither retrying nor spooling it ever helps.
+    """
+
+    def __init__(self, status: int, text: str):
+        super().__init__(f"HTTP {status} - {text}")
+        self.status = status
+
+
+def is_rejected_status(status_code: int) -> bool:
+    return 400 <= status_code < 500 and status_code != 429
+
+
+class VMClient:
+    """
+    Keep-alive HTTP client for one VictoriaMetrics server.
+
+    Owns a requests.Session whose connection pool is sized to the number of
+    sender threads, and holds the shared timeout and import retry policy.
+    NO_PROXY is extended for localhost/tailnet at import time, and the
+    session honours it (trust_env), so VM traffic never goes via a proxy.
+    Use get_vm_client(server) instead of creating instances directly.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        pool_size: int = VM_CLIENT_POOL_SIZE,
+        timeout: float = VM_CLIENT_TIMEOUT,
+        max_retries: int = 5,
+    ):
+        self.server = server.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.pool_size = 0
+        self.session = requests.Session()
+        self._lock = Lock()
+        self._adapters: list[HTTPAdapter] = []
+        self.ensure_pool_size(pool_size)
+
+    def ensure_pool_size(self, pool_size: int) -> None:
+        """
+        Grow the connection pool to at least pool_size connections.
+        """
+        with self._lock:
+            if pool_size <= self.pool_size:
+                return
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            self._adapters.append(adapter)
+            self.pool_size = pool_size
+
+    def url(self, path: str) -> str:
+        return path if path.startswith("http") else self.server + path
+
+    def get(self, path: str, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(self.url(path), **kwargs)
+
+    def post(self, path: str, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(self.url(path), **kwargs)
+
+    def post_import(
+        self,
+        path: str,
+        data: bytes | str,
+        label: str,
+        logger: logging.Logger,
+        params: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> bool:
+        """
+        POST one import batch, retrying with exponential backoff.
+        Returns True once VictoriaMetrics answers 204. Each attempt holds a
+        slot of the shared rate controller and reports its latency/status.
+        Raises ImportRejected, without retrying, when the batch is refused
+        with a 4xx other than 429.
+        """
+        controller = get_rate_controller()
+        for retries in range(self.max_retries):
+            controller.acquire()
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                resp = self.post(path, data=data, params=params, headers=headers)
+                outcome = classify_status(resp.status_code)
+                if resp.status_code == 204:
+                    return True
+                if is_rejected_status(resp.status_code):
+                    raise ImportRejected(resp.status_code, resp.text)
+                logger.error(
+                    f"‼️ {label}: Error sending batch (attempt {retries + 1}): HTTP {resp.status_code} - {resp.text}"
+                )
+            except requests.RequestException as e:
+                logger.error(
+                    f"‼️ {label}: Exception sending batch (attempt {retries + 1}): {e}"
+                )
+            finally:
+                controller.release(time.perf_counter() - start, outcome)
+            time.sleep(controller.retry_delay(retries))
+        return False
+
+    def connection_stats(self) -> dict[str, int]:
+        """
+        {"requests": ..., "connections": ..., "reused": ...} over all pools.
+        """
+        requests_made = 0
+        connections = 0
+        for adapter in self._adapters:
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_made += pool.num_requests
+                connections += pool.num_connections
+        return {
+            "requests": requests_made,
+            "connections": connections,
+            "reused": max(requests_made - connections, 0),
+        }
+
+
+_clients: dict[str, VMClient] = {}
+_clients_lock = Lock()
+
+
+def get_vm_client(server: str, pool_size: int | None = None) -> VMClient:
+    """
+    Shared VMClient for a server, created on first use. pool_size (usually
+    the sender thread count) grows the pool of an existing client.
+    """
+    key = server.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = VMClient(key, pool_size=pool_size or VM_CLIENT_POOL_SIZE)
+            _clients[key] = client
+    if pool_size:
+        client.ensure_pool_size(pool_size)
+    return client
+
+
+def format_vm_client_summary() -> str:
+    """
+    One-line connection reuse summary for the run totals.
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+    totals = {"requests": 0, "connections": 0, "reused": 0}
+    for client in clients:
+        for key, value in client.connection_stats().items():
+            totals[key] += value
+    if not totals["requests"]:
+        return ""
+    return (
+        f"{totals['requests']} requests over {totals['connections']} connections "
+        f"({100.0 * totals['reused'] / totals['requests']:.1f}% reused)"
+    )
+
+
+class AsyncVMClient:
+    """
+    asyncio front of the pooled VMClient of one server.
+
+    Each request runs on the VMClient's requests.Session in a thread of the
+    client's own executor, so at most max_connections are in flight and
+    proxies (HTTP(S)_PROXY/NO_PROXY), credentials in the server URL, TLS
+    and response framing are handled by requests exactly as for the threads
+    engine. Retries and rate controller waits happen on the event loop
+    without holding a thread. Must be used inside one running event loop.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        max_connections: int,
+        timeout: float = VM_CLIENT_TIMEOUT,
+        max_retries: int = 5,
+    ):
+        max_connections = max(1, max_connections)
+        self.client = get_vm_client(server, pool_size=max_connections)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_connections, thread_name_prefix="vm-async"
+        )
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        data: bytes | str = b"",
+        params: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> requests.Response:
+        """
+        Send one request and return its response.
+        """
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                partial(
+                    self.client.session.request,
+                    method,
+                    self.client.url(path),
+                    data=data,
+                    params=params,
+                    headers=headers,
+                    timeout=self.timeout,
+                ),
+            )
+            self.requests += 1
+            return response
+        finally:
+            self.in_flight -= 1
+
+    async def post_import(
+        self,
+        path: str,
+        data: bytes | str,
+        label: str,
+        logger: logging.Logger,
+        params: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> bool:
+        """
+        Async twin of VMClient.post_import(): same retry policy and shared
+        rate controller, but waiting never blocks the other requests in flight.
+        """
+        controller = get_rate_controller()
+        for retries in range(self.max_retries):
+            await controller.acquire_async()
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                resp = await self.request(
+                    "POST", path, data=data, params=params, headers=headers
+                )
+                outcome = classify_status(resp.status_code)
+                if resp.status_code == 204:
+                    return True
+                if is_rejected_status(resp.status_code):
+                    raise ImportRejected(resp.status_code, resp.text)
+                logger.error(
+                    f"‼️ {label}: Error sending batch (attempt {retries + 1}): HTTP {resp.status_code} - {resp.text}"
+                )
+            except requests.RequestException as e:
+                logger.error(
+                    f"‼️ {label}: Exception sending batch (attempt {retries + 1}): {e}"
+                )
+            finally:
+                controller.release(time.perf_counter() - start, outcome)
+            await asyncio.sleep(controller.retry_delay(retries))
+        return False
+
+    async def close(self) -> None:
+        # Every request was awaited, so no thread is busy any more.
+        self._executor.shutdown(wait=False)
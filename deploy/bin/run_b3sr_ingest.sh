@@ -41,4 +41,6 @@ exec docker run "${docker_args[@]}" \
   --cursor-key "{cursor_key}" \
   --cursor-out "{cursor_out}" \
   --verbosity "minimal" \
+  --ledger "/state/b3sr_ledger.sqlite" \
+  --spool-dir "/state/b3sr_spool" \
   --streaming-strategy "${B3SR_S3_STREAMING_STRATEGY:-auto}"
@@ -40,4 +40,6 @@ exec docker run "${docker_args[@]}" \
   --cursor-key "{cursor_key}" \
   --cursor-out "{cursor_out}" \
   --verbosity "minimal" \
+  --ledger "/state/d65_ledger.sqlite" \
+  --spool-dir "/state/d65_spool" \
   --s3-streaming-strategy "${D65_S3_STREAMING_STRATEGY:-auto}"